@@ -1,85 +1,282 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog
 import os
+import sys
 import copy
+import hashlib
+import io
+import json
+from difflib import SequenceMatcher
 from pptx import Presentation
 
+import imgio
+import jobs
+import tracing
+
 
 # === 内部逻辑 ===
 
-def _duplicate_slide(pres, index):
+def _duplicate_slide(pres, index, source_slide=None):
     """
     深度复制幻灯片，解决新建页面为空白的问题。
+    source_slide 可以来自另一个 Presentation (增量生成时从模板复制)，此时版式取 pres 第 index 页的版式。
     """
-    source_slide = pres.slides[index]
-    slide_layout = source_slide.slide_layout
-    dest_slide = pres.slides.add_slide(slide_layout)
+    if source_slide is None:
+        source_slide = pres.slides[index]
+    slide_layout = pres.slides[index].slide_layout
+    with tracing.span("a0.add_slide", "a0"):
+        dest_slide = pres.slides.add_slide(slide_layout)
 
-    for shape in source_slide.shapes:
-        try:
-            new_el = copy.deepcopy(shape.element)
-            dest_slide.shapes._spTree.insert_element_before(new_el, 'p:extLst')
-        except Exception as e:
-            print(f"复制形状警告: {e}")
+    with tracing.span("a0.deepcopy_shapes", "a0"):
+        for shape in source_slide.shapes:
+            try:
+                new_el = copy.deepcopy(shape.element)
+                dest_slide.shapes._spTree.insert_element_before(new_el, 'p:extLst')
+            except Exception as e:
+                print(f"复制形状警告: {e}", file=sys.stderr)
 
     return dest_slide
 
 
-def _process_ppt_generation(template_path, txt_path, output_path, placeholder):
+def _fill_slide(slide, placeholder, text_content):
+    with tracing.span("a0.replace_text", "a0"):
+        for shape in slide.shapes:
+            if not shape.has_text_frame: continue
+            for paragraph in shape.text_frame.paragraphs:
+                for run in paragraph.runs:
+                    if placeholder in run.text:
+                        run.text = run.text.replace(placeholder, text_content)
+
+
+def _reset_shapes(slide, source_slide):
+    """把 slide 的形状整体换成 source_slide 形状的副本 (页面本身及其关系保持不变)"""
+    with tracing.span("a0.reset_shapes", "a0"):
+        sp_tree = slide.shapes._spTree
+        for shape in list(slide.shapes):
+            sp_tree.remove(shape.element)
+        for shape in source_slide.shapes:
+            sp_tree.insert_element_before(copy.deepcopy(shape.element), 'p:extLst')
+
+
+def _save_atomic(prs, output_path):
+    """先保存到内存再原子写入，保存中途失败不会破坏上一次的输出 (增量生成依赖它)"""
+    buffer = io.BytesIO()
+    with tracing.span("a0.save", "a0"):
+        prs.save(buffer)
+    imgio.atomic_write_bytes(output_path, buffer.getbuffer())
+
+
+# === 增量生成 ===
+# 输出旁边保存 <输出>.rows.json，记录每行数据的哈希与对应页面的 slide id。
+# 再次生成时用 SequenceMatcher 对比新旧数据行：不变的行直接沿用上次输出中的页面，
+# 改动的行在原页面上重新填充，新增的行新建页面，删除的行移除页面，最后按新顺序重排 sldIdLst。
+# 模板 / 占位符变化、输出文件被手动改过、清单缺失或模板不止一页时回退为完整重建。
+MANIFEST_VERSION = 1
+FULL_REBUILD_RATIO = 0.5  # 超过一半的行有变化时直接完整重建
+
+
+def _manifest_path(output_path):
+    return output_path + ".rows.json"
+
+
+def _row_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load_manifest(output_path, template_sha, placeholder):
+    """清单有效 (与当前模板、占位符、输出文件一致) 时返回 dict，否则返回 None"""
     try:
-        # 1. 校验输入
-        if not template_path or not txt_path or not output_path:
-            messagebox.showwarning("提示", "请填写所有路径！")
-            return
+        with open(_manifest_path(output_path), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        st = os.stat(output_path)
+    except (OSError, ValueError):
+        return None
+    if (manifest.get("version") != MANIFEST_VERSION or manifest.get("template") != template_sha
+            or manifest.get("placeholder") != placeholder
+            or manifest.get("output") != [st.st_size, st.st_mtime_ns]):
+        return None
+    return manifest
 
-        # 2. 读取 TXT
-        with open(txt_path, 'r', encoding='utf-8') as f:
-            lines = [line.strip() for line in f.readlines() if line.strip()]
 
-        if not lines:
-            messagebox.showwarning("警告", "TXT 数据文件为空！")
-            return
+def _write_manifest(output_path, template_sha, placeholder, hashes, slide_ids):
+    st = os.stat(output_path)
+    manifest = {"version": MANIFEST_VERSION, "template": template_sha, "placeholder": placeholder,
+                "output": [st.st_size, st.st_mtime_ns], "rows": [list(r) for r in zip(hashes, slide_ids)]}
+    with open(_manifest_path(output_path), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
 
-        # 3. 加载模板
+
+def _update_ppt(template_path, lines, hashes, output_path, placeholder, manifest, progress, cancel_token):
+    """
+    在上次的输出上增量更新，返回 (改动页数, 新的 slide id 列表)；
+    变化太多时返回 None (由调用方完整重建)。
+    """
+    old_hashes = [h for h, _ in manifest["rows"]]
+    old_ids = [sid for _, sid in manifest["rows"]]
+    opcodes = [op for op in SequenceMatcher(None, old_hashes, hashes, autojunk=False).get_opcodes()
+               if op[0] != "equal"]
+    changed = sum(max(i2 - i1, j2 - j1) for _, i1, i2, j1, j2 in opcodes)
+    if changed > len(hashes) * FULL_REBUILD_RATIO:
+        return None
+
+    with tracing.span("a0.load_template", "a0"):
+        template_slide = Presentation(template_path).slides[0]
+    with tracing.span("a0.load_previous", "a0"):
+        prs = Presentation(output_path)
+    sld_id_lst = prs.slides._sldIdLst
+    id_elements = {el.id: el for el in sld_id_lst}
+    if any(sid not in id_elements for sid in old_ids):
+        return None
+    slides_by_id = {sid: prs.slides.get(sid) for sid in set(old_ids)}
+
+    order = list(old_ids)  # 新的页面顺序 (逐段替换)
+    offset = 0
+    done = 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        reuse = old_ids[i1:i2]
+        new_ids = []
+        for k, j in enumerate(range(j1, j2)):
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+            if k < len(reuse):
+                slide = slides_by_id[reuse[k]]
+                _reset_shapes(slide, template_slide)
+            else:
+                with tracing.span("a0.duplicate_slide", "a0"):
+                    slide = _duplicate_slide(prs, 0, template_slide)
+                id_elements[slide.slide_id] = sld_id_lst[-1]
+            _fill_slide(slide, placeholder, lines[j])
+            new_ids.append(slide.slide_id)
+            done += 1
+            if progress:
+                progress(done, changed + 1, "更新幻灯片")
+        for sid in reuse[len(new_ids):]:
+            el = id_elements.pop(sid)
+            sld_id_lst.remove(el)
+            prs.part.drop_rel(el.rId)
+        order[i1 + offset:i2 + offset] = new_ids
+        offset += len(new_ids) - (i2 - i1)
+
+    # 按新顺序重排 (append 会把已有元素移动到末尾)，再按顺序重新编号 slideN.xml
+    # (删除后新建的页面会沿用已存在的部件名，不重新编号会在包内重名)
+    for sid in order:
+        sld_id_lst.append(id_elements[sid])
+    prs.part.rename_slide_parts([el.rId for el in sld_id_lst])
+    _save_atomic(prs, output_path)
+    if progress:
+        progress(changed + 1, changed + 1, "已保存")
+    return changed, order
+
+
+def generate_ppt(template_path, txt_path, output_path, placeholder, progress=None, cancel_token=None,
+                 incremental=True):
+    """
+    按 TXT 每行生成一页并替换占位符，返回生成的页数。
+    incremental=True 时若存在有效的 <输出>.rows.json 清单，只改写数据有变化的页面。
+    输入有误时抛出 ValueError；progress(done, total, message) / cancel_token 由任务管理器传入。
+    """
+    # 1. 校验输入
+    if not template_path or not txt_path or not output_path:
+        raise ValueError("请填写所有路径！")
+
+    # 2. 读取 TXT
+    with open(txt_path, 'r', encoding='utf-8') as f:
+        lines = [line.strip() for line in f.readlines() if line.strip()]
+
+    if not lines:
+        raise ValueError("TXT 数据文件为空！")
+
+    hashes = [_row_hash(line) for line in lines]
+    template_sha = _file_sha1(template_path)
+    manifest = _load_manifest(output_path, template_sha, placeholder) if incremental else None
+    if manifest is not None:
+        try:
+            updated = _update_ppt(template_path, lines, hashes, output_path, placeholder, manifest,
+                                  progress, cancel_token)
+        except jobs.JobCancelled:
+            raise
+        except Exception as e:
+            print(f"增量更新失败，改为完整重建: {e}", file=sys.stderr)
+            updated = None
+        if updated is not None:
+            _write_manifest(output_path, template_sha, placeholder, hashes, updated[1])
+            return len(lines)
+
+    # 3. 加载模板
+    with tracing.span("a0.load_template", "a0"):
         prs = Presentation(template_path)
-        if len(prs.slides) == 0:
-            messagebox.showerror("错误", "PPT 模板为空！")
-            return
+    if len(prs.slides) == 0:
+        raise ValueError("PPT 模板为空！")
 
-        # 4. 复制幻灯片
-        target_count = len(lines)
-        if target_count > 1:
-            for _ in range(target_count - 1):
-                _duplicate_slide(prs, 0)
+    # 4. 复制幻灯片
+    target_count = len(lines)
+    total_steps = target_count * 2
+    for n in range(target_count - 1):
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        with tracing.span("a0.duplicate_slide", "a0"):
+            _duplicate_slide(prs, 0)
+        if progress:
+            progress(n + 1, total_steps, "复制幻灯片")
 
-        # 5. 替换文本
-        for i, text_content in enumerate(lines):
-            if i >= len(prs.slides): break
-            slide = prs.slides[i]
+    # 5. 替换文本
+    for i, text_content in enumerate(lines):
+        if i >= len(prs.slides): break
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        _fill_slide(prs.slides[i], placeholder, text_content)
+        if progress:
+            progress(target_count + i, total_steps, "替换文本")
 
-            for shape in slide.shapes:
-                if not shape.has_text_frame: continue
-                for paragraph in shape.text_frame.paragraphs:
-                    for run in paragraph.runs:
-                        if placeholder in run.text:
-                            run.text = run.text.replace(placeholder, text_content)
+    # 6. 保存 (模板只有一页时记录清单，供下次增量生成)
+    template_pages = len(prs.slides) - (target_count - 1)
+    _save_atomic(prs, output_path)
+    if template_pages == 1:
+        _write_manifest(output_path, template_sha, placeholder, hashes, [s.slide_id for s in prs.slides])
+    elif os.path.exists(_manifest_path(output_path)):
+        os.remove(_manifest_path(output_path))
+    if progress:
+        progress(total_steps, total_steps, "已保存")
+    return len(lines)
 
-        # 6. 保存并打开
-        prs.save(output_path)
-        messagebox.showinfo("成功", f"生成完毕！\n共 {len(lines)} 页。")
-        os.startfile(output_path)
 
-    except Exception as e:
-        messagebox.showerror("运行错误", f"发生错误：{str(e)}")
+def _process_ppt_generation(top, status_label, template_path, txt_path, output_path, placeholder, incremental=True):
+    """提交后台任务，完成后在主线程弹窗并打开结果"""
+
+    def on_progress(job):
+        if status_label.winfo_exists():
+            status_label.config(text=f"{job.message} {job.percent:.0f}%")
+
+    def on_done(job):
+        parent = jobs.callback_parent(top)
+        if status_label.winfo_exists():
+            status_label.config(text={"done": "完成", "failed": "失败", "cancelled": "已取消"}[job.state])
+        if job.state == "done":
+            messagebox.showinfo("成功", f"生成完毕！\n共 {job.result} 页。", parent=parent)
+            os.startfile(output_path)
+        elif job.state == "failed":
+            messagebox.showerror("运行错误", f"发生错误：{job.error}", parent=parent)
+
+    jobs.submit(generate_ppt, template_path, txt_path, output_path, placeholder, incremental=incremental,
+                tool="PPT生成器", title=os.path.basename(output_path) or "PPT 生成",
+                widget=top, on_progress=on_progress, on_done=on_done)
+    status_label.config(text="已加入任务队列")
 
 
 # === 对外接口 ===
 def show_ui(parent):
     top = tk.Toplevel(parent)
     top.title("PPT 批量生成器")
-    top.geometry("500x400")
+    top.geometry("500x460")
     top.transient(parent) # 修改点
-    top.grab_set()        # 修改点
 
     # 居中
     top.update_idletasks()
@@ -131,9 +328,19 @@ def show_ui(parent):
     tk.Button(top, text="浏览",
               command=lambda: select_save_file(entry_out)).pack(anchor="e", padx=10)
 
+    var_incremental = tk.BooleanVar(value=True)
+    tk.Checkbutton(top, text="增量更新 (输出已存在时只重写数据有变化的页)",
+                   variable=var_incremental).pack(anchor="w", padx=10)
+
     # 执行
     def run():
-        _process_ppt_generation(entry_tmpl.get(), entry_txt.get(), entry_out.get(), entry_placeholder.get())
+        if not entry_tmpl.get() or not entry_txt.get() or not entry_out.get():
+            messagebox.showwarning("提示", "请填写所有路径！", parent=top)
+            return
+        _process_ppt_generation(top, lbl_status, entry_tmpl.get(), entry_txt.get(), entry_out.get(),
+                                entry_placeholder.get(), var_incremental.get())
 
     tk.Button(top, text="开始生成", bg="#4CAF50", fg="white", font=("Arial", 12, "bold"),
-              command=run).pack(pady=20, fill="x", padx=20)
\ No newline at end of file
+              command=run).pack(pady=(20, 5), fill="x", padx=20)
+    lbl_status = tk.Label(top, text="", fg="gray")
+    lbl_status.pack()
\ No newline at end of file
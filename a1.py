@@ -6,71 +6,120 @@ import subprocess
 from pptx import Presentation
 from pptx.dml.color import RGBColor
 
+import jobs
+import tracing
+
 
 # === 内部逻辑 ===
-def _process_modify_ppt(input_path, output_path, rgb_str, do_color, remove_spaces, remove_empty_boxes):
+def parse_rgb(rgb_str):
+    """解析 "r,g,b" (兼容中文逗号与空格)，格式错误时抛出 ValueError"""
     try:
-        if not input_path or not output_path:
-            messagebox.showwarning("提示", "路径不能为空！")
-            return
-
-        # 颜色解析
-        r, g, b = 0, 0, 0
-        if do_color:
-            try:
-                rgb_clean = rgb_str.replace("，", ",").replace(" ", "")
-                r, g, b = map(int, rgb_clean.split(','))
-            except:
-                messagebox.showerror("错误", "RGB颜色格式不正确！")
-                return
-
+        rgb_clean = rgb_str.replace("，", ",").replace(" ", "")
+        r, g, b = map(int, rgb_clean.split(','))
+    except ValueError:
+        raise ValueError("RGB颜色格式不正确！")
+    return r, g, b
+
+
+def _process_slide(slide, rgb, do_color, remove_spaces, remove_empty_boxes):
+    r, g, b = rgb
+    shapes_to_delete = []
+
+    for shape in slide.shapes:
+        if not shape.has_text_frame: continue
+
+        # 功能C：检测空白文本框
+        text_content = shape.text_frame.text.strip()
+        if remove_empty_boxes:
+            if not text_content:
+                shapes_to_delete.append(shape)
+                continue
+
+                # 功能A & B
+        for p in shape.text_frame.paragraphs:
+            for run in p.runs:
+                if do_color:
+                    run.font.color.rgb = RGBColor(r, g, b)
+                if remove_spaces and run.text:
+                    run.text = "".join(run.text.split())
+
+    # 执行删除
+    for shape in shapes_to_delete:
+        sp = shape._element
+        sp.getparent().remove(sp)
+
+
+def modify_ppt(input_path, output_path, rgb, do_color, remove_spaces, remove_empty_boxes,
+               progress=None, cancel_token=None):
+    """改色 / 去空格 / 删除空白文本框并另存，返回处理的页数；rgb 为 (r, g, b)"""
+    if not input_path or not output_path:
+        raise ValueError("路径不能为空！")
+
+    with tracing.span("a1.load", "a1"):
         prs = Presentation(input_path)
+    total = len(prs.slides)
 
-        for slide in prs.slides:
-            shapes_to_delete = []
-
-            for shape in slide.shapes:
-                if not shape.has_text_frame: continue
-
-                # 功能C：检测空白文本框
-                text_content = shape.text_frame.text.strip()
-                if remove_empty_boxes:
-                    if not text_content:
-                        shapes_to_delete.append(shape)
-                        continue
-
-                        # 功能A & B
-                for p in shape.text_frame.paragraphs:
-                    for run in p.runs:
-                        if do_color:
-                            run.font.color.rgb = RGBColor(r, g, b)
-                        if remove_spaces and run.text:
-                            run.text = "".join(run.text.split())
-
-            # 执行删除
-            for shape in shapes_to_delete:
-                sp = shape._element
-                sp.getparent().remove(sp)
+    for index, slide in enumerate(prs.slides):
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        with tracing.span("a1.process_slide", "a1", index=index):
+            _process_slide(slide, rgb, do_color, remove_spaces, remove_empty_boxes)
+        if progress:
+            progress(index + 1, total, f"第 {index + 1} 页")
 
+    with tracing.span("a1.save", "a1"):
         prs.save(output_path)
+    return total
+
+
+def _open_file(path):
+    if platform.system() == 'Windows':
+        os.startfile(path)
+    else:
+        subprocess.call(('open', path))
+
+
+def _process_modify_ppt(top, status_label, input_path, output_path, rgb_str, do_color, remove_spaces,
+                        remove_empty_boxes):
+    """校验输入后提交后台任务，完成后自动打开结果"""
+    if not input_path or not output_path:
+        messagebox.showwarning("提示", "路径不能为空！", parent=top)
+        return
+
+    # 颜色解析
+    rgb = (0, 0, 0)
+    if do_color:
+        try:
+            rgb = parse_rgb(rgb_str)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e), parent=top)
+            return
+
+    def on_progress(job):
+        if status_label.winfo_exists():
+            status_label.config(text=f"处理中 {job.message} ({job.percent:.0f}%)")
 
-        # 自动打开
-        if platform.system() == 'Windows':
-            os.startfile(output_path)
-        else:
-            subprocess.call(('open', output_path))
+    def on_done(job):
+        if status_label.winfo_exists():
+            status_label.config(text={"done": "完成", "failed": "失败", "cancelled": "已取消"}[job.state])
+        if job.state == "done":
+            # 自动打开
+            _open_file(output_path)
+        elif job.state == "failed":
+            messagebox.showerror("错误", f"处理失败：{job.error}", parent=jobs.callback_parent(top))
 
-    except Exception as e:
-        messagebox.showerror("错误", f"处理失败：{str(e)}")
+    jobs.submit(modify_ppt, input_path, output_path, rgb, do_color, remove_spaces, remove_empty_boxes,
+                tool="PPT改色/去空", title=os.path.basename(input_path), widget=top,
+                on_progress=on_progress, on_done=on_done)
+    status_label.config(text="已加入任务队列")
 
 
 # === 对外接口 ===
 def show_ui(parent):
     top = tk.Toplevel(parent)
     top.title("PPT 改色与清理工具")
-    top.geometry("500x450")
+    top.geometry("500x480")
     top.transient(parent) # 修改点
-    top.grab_set()        # 修改点
 
     top.update_idletasks()
     x = (top.winfo_screenwidth() - top.winfo_width()) // 2
@@ -135,8 +184,10 @@ def show_ui(parent):
               command=lambda: select_save(entry_out)).pack(anchor="e", padx=10)
 
     def run():
-        _process_modify_ppt(entry_in.get(), entry_out.get(), entry_rgb.get(),
+        _process_modify_ppt(top, lbl_status, entry_in.get(), entry_out.get(), entry_rgb.get(),
                             var_do_color.get(), var_space.get(), var_empty_box.get())
 
     tk.Button(top, text="执行并打开", bg="#2196F3", fg="white", font=("Arial", 12, "bold"),
-              command=run).pack(pady=15, fill="x", padx=20)
\ No newline at end of file
+              command=run).pack(pady=(15, 5), fill="x", padx=20)
+    lbl_status = tk.Label(top, text="", fg="gray")
+    lbl_status.pack()
\ No newline at end of file
@@ -3,10 +3,17 @@ from tkinter import messagebox, filedialog, ttk
 import os
 import platform
 import re
+import sys
 import cv2
 import numpy as np
 
+import batchfs
+import imgio
+import jobs
+import tracing
+
 try:
+    import pythoncom
     import win32com.client
 
     HAS_WIN32 = True
@@ -14,86 +21,211 @@ except ImportError:
     HAS_WIN32 = False
 
 
+# ==============================================================================
+# 通用工具
+# ==============================================================================
+RESULT_TEXT = {"done": "完成", "failed": "失败", "cancelled": "已取消"}
+
+
+def _save_as_png(file_path, img, journal=None, rel=None):
+    """
+    覆盖保存为 PNG (原子写入)；非 PNG 源文件另存为同名 .png 并删除原文件。
+    给出 journal 时，在替换目标文件之前把结果记入断点日志 (见 batchfs.BatchJournal)。
+    """
+    name_part, ext_part = os.path.splitext(file_path)
+    out_path = file_path if ext_part.lower() == '.png' else name_part + ".png"
+    before_replace = None
+    if journal is not None:
+        out_rel = rel if out_path == file_path else os.path.splitext(rel)[0] + ".png"
+        before_replace = lambda tmp: journal.commit(rel, out_rel, tmp)
+    imgio.write_image(out_path, img, before_replace=before_replace)
+    if out_path != file_path:
+        os.remove(file_path)
+
+
+def _run_batch(folder_path, exts, op_key, process, include=(), exclude=(), recursive=False,
+               progress=None, cancel_token=None):
+    """
+    就地批处理的公共流程：流式发现文件 -> 线程池处理 -> 原子覆盖 + 断点日志。
+    process(img) 返回处理后的 BGRA，返回 None 表示跳过该文件。
+    上次同参数的批次中途中断时，已完成的文件直接跳过 (不会重复处理)。返回 (成功数, 总数, 失败数)
+    """
+    if not folder_path or not os.path.isdir(folder_path):
+        raise ValueError("请选择有效的文件夹！")
+    journal = batchfs.BatchJournal(folder_path, op_key)
+
+    def work(path, rel):
+        if journal.is_done(rel):
+            return True
+        img = process(imgio.read_bgra(path, cache=False))
+        if img is None:
+            return False
+        _save_as_png(path, img, journal, rel)
+        return True
+
+    complete = False
+    try:
+        files = batchfs.iter_files(folder_path, exts, include, exclude, recursive)
+        success_count, total, failed = batchfs.run_streaming(files, work, progress=progress,
+                                                             cancel_token=cancel_token)
+        complete = failed == 0
+    finally:
+        journal.close(complete)
+    if total == 0:
+        raise ValueError("没有找到图片。")
+    return success_count, total, failed
+
+
+def parse_rgb(rgb_str):
+    try:
+        rgb_clean = rgb_str.replace("，", ",").replace(" ", "")
+        r, g, b = map(int, rgb_clean.split(','))
+    except ValueError:
+        raise ValueError("RGB 格式错误。")
+    return r, g, b
+
+
+def _submit_job(top, status_label, fn, *args, tool, title, exclusive=None, on_success=None, error_title="错误"):
+    """提交后台任务：进度写到状态栏，完成后在主线程回调 on_success(result, parent)"""
+
+    def on_progress(job):
+        if status_label.winfo_exists():
+            status_label.config(text=f"{job.message} ({job.done}/{job.total})")
+
+    def on_done(job):
+        parent = jobs.callback_parent(top)
+        if status_label.winfo_exists():
+            status_label.config(text=RESULT_TEXT[job.state])
+        if job.state == "done" and on_success:
+            on_success(job.result, parent)
+        elif job.state == "failed":
+            messagebox.showerror(error_title, f"发生错误：\n{job.error}", parent=parent)
+
+    jobs.submit(fn, *args, tool=tool, title=title, exclusive=exclusive, widget=top,
+                on_progress=on_progress, on_done=on_done)
+    status_label.config(text="已加入任务队列")
+
+
 # ==============================================================================
 # 功能模块 1: PPT 逐页导出 (全新 Slide.Export 方式)
 # ==============================================================================
-def _process_export_transparent_png(input_path, output_dir, dpi_str, target_ratio_mode,
-                                    enable_exp, exp_w, exp_h, exp_anchor):
+def parse_dpi(dpi_str):
+    """从 "300 (打印)" 这类文本中取出 DPI，范围 30~3000，否则抛出 ValueError"""
+    target_dpi = 216  # 默认值
+    nums = re.findall(r"\d+", str(dpi_str))
+    if nums:
+        target_dpi = int(nums[0])
+    if target_dpi < 30 or target_dpi > 3000:
+        raise ValueError("DPI 必须是 30 到 3000 之间的整数。")
+    return target_dpi
+
+
+def parse_dpi_list(dpi_str):
+    """"96, 150, 300" -> [300, 150, 96] (去重，从高到低)；只有一个数时等同 parse_dpi"""
+    nums = re.findall(r"\d+", str(dpi_str))
+    if len(nums) <= 1:
+        return [parse_dpi(dpi_str)]
+    return sorted({parse_dpi(n) for n in nums}, reverse=True)
+
+
+def _export_size(slide_w_points, slide_h_points, target_dpi, target_ratio_mode):
+    """PowerPoint 导出的像素尺寸 (按 DPI 换算后再套用强制比例)"""
+    scale_factor = target_dpi / 72.0
+    base_px_w = int(slide_w_points * scale_factor)
+    base_px_h = int(slide_h_points * scale_factor)
+
+    export_h = base_px_h
+    if target_ratio_mode == "16:9":
+        export_h = int(base_px_w * 9 / 16)
+    elif target_ratio_mode == "4:3":
+        export_h = int(base_px_w * 3 / 4)
+    elif target_ratio_mode == "1:1":
+        export_h = base_px_w
+    return base_px_w, export_h
+
+
+def _fit_canvas(img, final_target_w, final_target_h, exp_anchor):
+    """按锚点把图片裁切/填充到固定尺寸 (透明填充)"""
+    h, w = img.shape[:2]
+    canvas = np.zeros((final_target_h, final_target_w, 4), dtype=np.uint8)
+
+    if "左" in exp_anchor:
+        x_offset = 0
+    elif "右" in exp_anchor:
+        x_offset = final_target_w - w
+    else:
+        x_offset = (final_target_w - w) // 2
+
+    if "上" in exp_anchor:
+        y_offset = 0
+    elif "下" in exp_anchor:
+        y_offset = final_target_h - h
+    else:
+        y_offset = (final_target_h - h) // 2
+
+    x1_c = max(0, x_offset)
+    y1_c = max(0, y_offset)
+    x2_c = min(final_target_w, x_offset + w)
+    y2_c = min(final_target_h, y_offset + h)
+
+    x1_img = max(0, -x_offset)
+    y1_img = max(0, -y_offset)
+
+    w_slice = x2_c - x1_c
+    h_slice = y2_c - y1_c
+
+    if w_slice > 0 and h_slice > 0:
+        canvas[y1_c:y2_c, x1_c:x2_c] = img[y1_img:y1_img + h_slice, x1_img:x1_img + w_slice]
+    return canvas
+
+
+def export_slides_png(input_path, output_dir, target_dpi, target_ratio_mode, target_size=None, exp_anchor="",
+                      progress=None, cancel_token=None):
+    """
+    用 PowerPoint 逐页导出透明 PNG。
+    target_size=(w, h) 时启用实验性的二次裁切/填充。
+    返回 {"success", "total", "output_dir", "size"}；环境或输入有误时抛出异常。
+    """
     # 1. 环境检查
     if platform.system() != 'Windows':
-        messagebox.showerror("系统不支持", "PPT 导出功能仅支持 Windows 系统。")
-        return
+        raise RuntimeError("PPT 导出功能仅支持 Windows 系统。")
     if not HAS_WIN32:
-        messagebox.showerror("缺少依赖", "请安装: pip install pywin32")
-        return
+        raise RuntimeError("缺少依赖，请安装: pip install pywin32")
     if not input_path or not output_dir:
-        messagebox.showwarning("提示", "路径不能为空！")
-        return
-
-    # 2. 解析 DPI
-    target_dpi = 216  # 默认值
-    try:
-        nums = re.findall(r"\d+", str(dpi_str))
-        if nums:
-            target_dpi = int(nums[0])
-        if target_dpi < 30 or target_dpi > 3000:
-            raise ValueError
-    except:
-        messagebox.showerror("错误", "DPI 必须是 30 到 3000 之间的整数。")
-        return
-
-    # 3. 检查实验性参数
-    final_target_w = 0
-    final_target_h = 0
-    if enable_exp:
-        try:
-            final_target_w = int(exp_w)
-            final_target_h = int(exp_h)
-            if final_target_w <= 0 or final_target_h <= 0: raise ValueError
-        except:
-            messagebox.showerror("输入错误", "实验性功能的宽/高必须为正整数。")
-            return
+        raise ValueError("路径不能为空！")
 
     abs_output = os.path.abspath(output_dir)
     if not os.path.exists(abs_output):
-        try:
-            os.makedirs(abs_output)
-        except Exception as e:
-            messagebox.showerror("路径错误", f"无法创建输出文件夹:\n{e}")
-            return
+        os.makedirs(abs_output)
 
     abs_input = os.path.abspath(input_path)
     ppt_app = None
     pres = None
 
+    # 后台线程使用 COM 前必须先初始化
+    pythoncom.CoInitialize()
     try:
-        ppt_app = win32com.client.DispatchEx("PowerPoint.Application")
-        ppt_app.Visible = True
-        ppt_app.WindowState = 2  # 最小化
+        with tracing.span("a2.com_start", "a2"):
+            ppt_app = win32com.client.DispatchEx("PowerPoint.Application")
+            ppt_app.Visible = True
+            ppt_app.WindowState = 2  # 最小化
 
-        pres = ppt_app.Presentations.Open(abs_input, WithWindow=False)
+        with tracing.span("a2.com_open", "a2"):
+            pres = ppt_app.Presentations.Open(abs_input, WithWindow=False)
 
         slide_w_points = pres.PageSetup.SlideWidth
         slide_h_points = pres.PageSetup.SlideHeight
 
-        # === 计算目标分辨率 ===
-        scale_factor = target_dpi / 72.0
-        base_px_w = int(slide_w_points * scale_factor)
-        base_px_h = int(slide_h_points * scale_factor)
-
-        # 处理比例
-        export_h = base_px_h
-        if target_ratio_mode == "16:9":
-            export_h = int(base_px_w * 9 / 16)
-        elif target_ratio_mode == "4:3":
-            export_h = int(base_px_w * 3 / 4)
-        elif target_ratio_mode == "1:1":
-            export_h = base_px_w
+        # === 计算目标分辨率 (含强制比例) ===
+        base_px_w, export_h = _export_size(slide_w_points, slide_h_points, target_dpi, target_ratio_mode)
 
         total_slides = pres.Slides.Count
         success_count = 0
+        failed_count = 0
 
         for i in range(1, total_slides + 1):
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
             slide = pres.Slides(i)
             save_name = f"slide_{i}.png"
             save_full_path = os.path.join(abs_output, save_name)
@@ -116,61 +248,23 @@ def _process_export_transparent_png(input_path, output_dir, dpi_str, target_rati
                 # 2. 原生导出
                 # Export(FileName, FilterName, ScaleWidth, ScaleHeight)
                 # 直接传入计算好的整数宽高
-                slide.Export(save_full_path, "PNG", int(base_px_w), int(export_h))
+                with tracing.span("a2.com_export", "a2", slide=i):
+                    slide.Export(save_full_path, "PNG", int(base_px_w), int(export_h))
 
                 # 3. === 实验性功能：OpenCV 二次处理 ===
-                if enable_exp:
-                    img = cv2.imdecode(np.fromfile(save_full_path, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
-                    if img is not None:
-                        if len(img.shape) == 2:
-                            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGRA)
-                        elif img.shape[2] == 3:
-                            img = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
-
-                        h, w = img.shape[:2]
-
-                        if w != final_target_w or h != final_target_h:
-                            canvas = np.zeros((final_target_h, final_target_w, 4), dtype=np.uint8)
-
-                            x_offset = 0
-                            y_offset = 0
-
-                            if "左" in exp_anchor:
-                                x_offset = 0
-                            elif "右" in exp_anchor:
-                                x_offset = final_target_w - w
-                            else:
-                                x_offset = (final_target_w - w) // 2
-
-                            if "上" in exp_anchor:
-                                y_offset = 0
-                            elif "下" in exp_anchor:
-                                y_offset = final_target_h - h
-                            else:
-                                y_offset = (final_target_h - h) // 2
-
-                            x1_c = max(0, x_offset)
-                            y1_c = max(0, y_offset)
-                            x2_c = min(final_target_w, x_offset + w)
-                            y2_c = min(final_target_h, y_offset + h)
-
-                            x1_img = max(0, -x_offset)
-                            y1_img = max(0, -y_offset)
-
-                            w_slice = x2_c - x1_c
-                            h_slice = y2_c - y1_c
-
-                            if w_slice > 0 and h_slice > 0:
-                                canvas[y1_c:y2_c, x1_c:x2_c] = img[y1_img:y1_img + h_slice, x1_img:x1_img + w_slice]
-
-                            is_success, buffer = cv2.imencode(".png", canvas)
-                            if is_success:
-                                buffer.tofile(save_full_path)
+                if target_size:
+                    img = imgio.read_bgra(save_full_path, cache=False)
+                    h, w = img.shape[:2]
+                    if (w, h) != tuple(target_size):
+                        with tracing.span("a2.fit_canvas", "a2"):
+                            canvas = _fit_canvas(img, target_size[0], target_size[1], exp_anchor)
+                        imgio.write_image(save_full_path, canvas)
 
                 success_count += 1
 
             except Exception as e:
-                print(f"Page {i} error: {e}")
+                failed_count += 1
+                print(f"Page {i} error: {e}", file=sys.stderr)
 
             finally:
                 # 恢复背景设置 (以免用户保存 PPT 后发现背景没了)
@@ -180,20 +274,12 @@ def _process_export_transparent_png(input_path, output_dir, dpi_str, target_rati
                 except:
                     pass
 
-        msg = f"导出成功: {success_count}/{total_slides} 页\n保存位置: {abs_output}"
-        if enable_exp:
-            msg += f"\n\n已强制调整为: {final_target_w}x{final_target_h}"
-        else:
-            msg += f"\n\n当前DPI: {target_dpi} (尺寸 {base_px_w}x{export_h})"
+            if progress:
+                progress(i, total_slides, f"导出第 {i} 页")
 
-        messagebox.showinfo("完成", msg)
-        try:
-            os.startfile(abs_output)
-        except:
-            pass
+        return {"success": success_count, "total": total_slides, "failed": failed_count, "output_dir": abs_output,
+                "size": (base_px_w, export_h), "slide_points": (slide_w_points, slide_h_points)}
 
-    except Exception as e:
-        messagebox.showerror("错误", f"发生错误：\n{str(e)}")
     finally:
         if pres: pres.Close()
         if ppt_app:
@@ -201,119 +287,266 @@ def _process_export_transparent_png(input_path, output_dir, dpi_str, target_rati
                 ppt_app.Quit()
             except:
                 pass
+        pythoncom.CoUninitialize()
+
+
+# ----------------------------------------------------------------
+# 多分辨率导出：PowerPoint 只按最高 DPI 导出一次，其余 DPI 由它面积平均缩小得到
+# ----------------------------------------------------------------
+def downsample_bgra(img, size):
+    """
+    面积平均 (INTER_AREA) 缩小 BGRA 图片到 size=(w, h)。
+    有透明像素时先预乘 Alpha 再缩放，避免透明区域的底色渗到边缘形成黑边 / 白边。
+    """
+    w, h = size
+    if img.shape[2] < 4 or img.dtype != np.uint8 or img[:, :, 3].min() == 255:
+        return cv2.resize(img, (w, h), interpolation=cv2.INTER_AREA)
+    # 预乘、缩放、反预乘都在 float32 中进行，最后只取整一次 (uint8 预乘在低 Alpha 处会丢失颜色精度)
+    src = img.astype(np.float32)
+    alpha = src[:, :, 3:4]
+    premul = np.concatenate([src[:, :, :3] * alpha, alpha], axis=2)
+    small = cv2.resize(premul, (w, h), interpolation=cv2.INTER_AREA)
+    small_a = small[:, :, 3:4]
+    # 完全透明的像素颜色取 0
+    color = np.divide(small[:, :, :3], small_a, out=np.zeros_like(small[:, :, :3]), where=small_a > 0)
+    out = np.concatenate([color, small_a], axis=2)
+    return np.clip(np.rint(out), 0, 255).astype(np.uint8)
+
+
+def _pyramid_size(src_size, src_dpi, dpi, slide_points=None, ratio_mode="", target_size=None):
+    """
+    某一 DPI 的目标尺寸：
+    已知幻灯片尺寸 (磅) 且未强制分辨率时与直接按该 DPI 导出的尺寸完全一致；
+    强制分辨率 (target_size 对应最高 DPI) 或只有现成 PNG 时按 DPI 比例换算。
+    """
+    if slide_points and not target_size:
+        return _export_size(slide_points[0], slide_points[1], dpi, ratio_mode)
+    w, h = target_size or src_size
+    return max(1, int(round(w * dpi / src_dpi))), max(1, int(round(h * dpi / src_dpi)))
+
+
+def derive_dpi_pyramid(src_dir, src_dpi, dpis, output_dir, slide_points=None, ratio_mode="", target_size=None,
+                       progress=None, cancel_token=None):
+    """
+    把 src_dir 中按 src_dpi 导出的 PNG 缩小为其余各 DPI，分别写入 output_dir/<dpi>dpi/ (多线程并行)。
+    不依赖 PowerPoint，可直接对已有的导出结果运行。返回 {"success", "total", "dirs": {dpi: 文件夹}}
+    """
+    lower = [d for d in sorted(set(dpis), reverse=True) if d < src_dpi]
+    if not lower:
+        raise ValueError(f"没有低于 {src_dpi} 的 DPI 需要生成。")
+    dirs = {d: os.path.join(output_dir, f"{d}dpi") for d in lower}
+    for d in dirs.values():
+        os.makedirs(d, exist_ok=True)
+
+    def work(path, rel):
+        img = imgio.read_bgra(path, cache=False)
+        for dpi in lower:
+            size = _pyramid_size((img.shape[1], img.shape[0]), src_dpi, dpi, slide_points, ratio_mode, target_size)
+            with tracing.span("a2.downsample", "a2", dpi=dpi):
+                small = downsample_bgra(img, size)
+            imgio.write_image(os.path.join(dirs[dpi], rel), small)
+        return True
+
+    files = batchfs.iter_files(src_dir, ('.png',))
+    success, total, failed = batchfs.run_streaming(files, work, progress=progress, cancel_token=cancel_token)
+    if total == 0:
+        raise ValueError("没有找到图片。")
+    return {"success": success, "total": total, "failed": failed, "dirs": dirs}
+
+
+def export_slides_pyramid(input_path, output_dir, dpis, target_ratio_mode, target_size=None, exp_anchor="",
+                          progress=None, cancel_token=None):
+    """
+    多分辨率导出：按最高 DPI 调用一次 export_slides_png (输出到 output_dir/<最高dpi>dpi/)，
+    再由 derive_dpi_pyramid 并行生成其余 DPI。target_size 为最高 DPI 下的强制分辨率，其余 DPI 等比换算。
+    """
+    dpis = sorted(set(dpis), reverse=True)
+    top_dpi = dpis[0]
+
+    def export_progress(done, total, msg):
+        if progress:
+            progress(done, total * 2, msg)
+
+    result = export_slides_png(input_path, os.path.join(output_dir, f"{top_dpi}dpi"), top_dpi, target_ratio_mode,
+                               target_size, exp_anchor, export_progress, cancel_token)
+    total = result["total"]
+    dirs = {top_dpi: result["output_dir"]}
+    if len(dpis) > 1:
+        def derive_progress(done, _, msg):
+            if progress:
+                progress(total + done, total * 2, f"缩放 {msg}")
+
+        derived = derive_dpi_pyramid(result["output_dir"], top_dpi, dpis[1:], os.path.abspath(output_dir),
+                                     result["slide_points"], target_ratio_mode, target_size,
+                                     derive_progress, cancel_token)
+        dirs.update(derived["dirs"])
+        result["failed"] += derived["failed"]
+    result["dirs"] = dirs
+    result["output_dir"] = os.path.abspath(output_dir)
+    return result
+
+
+def _process_export_transparent_png(top, status_label, input_path, output_dir, dpi_str, target_ratio_mode,
+                                    enable_exp, exp_w, exp_h, exp_anchor):
+    # 1. 环境检查
+    if platform.system() != 'Windows':
+        messagebox.showerror("系统不支持", "PPT 导出功能仅支持 Windows 系统。", parent=top)
+        return
+    if not HAS_WIN32:
+        messagebox.showerror("缺少依赖", "请安装: pip install pywin32", parent=top)
+        return
+    if not input_path or not output_dir:
+        messagebox.showwarning("提示", "路径不能为空！", parent=top)
+        return
+
+    # 2. 解析 DPI (填多个数值时为多分辨率导出)
+    try:
+        dpis = parse_dpi_list(dpi_str)
+    except ValueError as e:
+        messagebox.showerror("错误", str(e), parent=top)
+        return
+
+    # 3. 检查实验性参数
+    target_size = None
+    if enable_exp:
+        try:
+            final_target_w = int(exp_w)
+            final_target_h = int(exp_h)
+            if final_target_w <= 0 or final_target_h <= 0: raise ValueError
+        except:
+            messagebox.showerror("输入错误", "实验性功能的宽/高必须为正整数。", parent=top)
+            return
+        target_size = (final_target_w, final_target_h)
+
+    def on_success(result, parent):
+        msg = f"导出成功: {result['success']}/{result['total']} 页\n保存位置: {result['output_dir']}"
+        if result['failed']:
+            msg += f"\n失败: {result['failed']} 页"
+        if len(dpis) > 1:
+            msg += "\n\n已生成: " + ", ".join(f"{d}dpi" for d in sorted(result['dirs']))
+        elif target_size:
+            msg += f"\n\n已强制调整为: {target_size[0]}x{target_size[1]}"
+        else:
+            msg += f"\n\n当前DPI: {dpis[0]} (尺寸 {result['size'][0]}x{result['size'][1]})"
+
+        messagebox.showinfo("完成", msg, parent=parent)
+        try:
+            os.startfile(result['output_dir'])
+        except:
+            pass
+
+    # PowerPoint 同一时间只跑一个导出任务
+    if len(dpis) > 1:
+        fn, dpi_arg = export_slides_pyramid, dpis
+    else:
+        fn, dpi_arg = export_slides_png, dpis[0]
+    _submit_job(top, status_label, fn, input_path, output_dir, dpi_arg, target_ratio_mode,
+                target_size, exp_anchor, tool="导出透明PNG", title=os.path.basename(input_path),
+                exclusive="powerpoint", on_success=on_success)
 
 
 # ==============================================================================
 # 功能模块 2: 批量裁切/扩展
 # ==============================================================================
-def _process_batch_crop_extend(folder_path, val_top, val_bottom, val_left, val_right):
+def crop_extend_image(img, v_t, v_b, v_l, v_r):
+    """img 为 BGRA。正数向内裁切，负数向外扩展 (透明填充)；裁切量超过图片尺寸时返回 None"""
+    h, w = img.shape[:2]
+    crop_t, crop_b = max(0, v_t), max(0, v_b)
+    crop_l, crop_r = max(0, v_l), max(0, v_r)
+
+    if (crop_t + crop_b >= h) or (crop_l + crop_r >= w): return None
+
+    if crop_t > 0 or crop_b > 0 or crop_l > 0 or crop_r > 0:
+        end_y = -crop_b if crop_b > 0 else None
+        end_x = -crop_r if crop_r > 0 else None
+        img = img[crop_t: end_y, crop_l: end_x]
+
+    pad_t, pad_b = abs(min(0, v_t)), abs(min(0, v_b))
+    pad_l, pad_r = abs(min(0, v_l)), abs(min(0, v_r))
+
+    if pad_t > 0 or pad_b > 0 or pad_l > 0 or pad_r > 0:
+        img = cv2.copyMakeBorder(img, pad_t, pad_b, pad_l, pad_r, cv2.BORDER_CONSTANT, value=(0, 0, 0, 0))
+    return img
+
+
+def batch_crop_extend(folder_path, v_t, v_b, v_l, v_r, include=(), exclude=(), recursive=False,
+                      progress=None, cancel_token=None):
+    """批量裁切/扩展并覆盖源文件 (非 PNG 转为 PNG)，返回 (成功数, 总数, 失败数)"""
+
+    def process(img):
+        with tracing.span("a2.crop_extend", "a2"):
+            return crop_extend_image(img, v_t, v_b, v_l, v_r)
+
+    return _run_batch(folder_path, ('.jpg', '.jpeg', '.png', '.bmp', '.tiff'), f"crop:{v_t},{v_b},{v_l},{v_r}",
+                      process, include, exclude, recursive, progress, cancel_token)
+
+
+def _process_batch_crop_extend(top, status_label, folder_path, val_top, val_bottom, val_left, val_right, scan_opts):
     if not folder_path or not os.path.exists(folder_path):
-        messagebox.showerror("错误", "请选择有效的文件夹！")
+        messagebox.showerror("错误", "请选择有效的文件夹！", parent=top)
         return
     try:
         v_t, v_b, v_l, v_r = int(val_top), int(val_bottom), int(val_left), int(val_right)
     except:
-        messagebox.showerror("错误", "裁切数值必须是整数。")
+        messagebox.showerror("错误", "裁切数值必须是整数。", parent=top)
         return
 
-    valid_exts = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
-    files = [f for f in os.listdir(folder_path) if f.lower().endswith(valid_exts)]
-    if not files:
-        messagebox.showwarning("提示", "没有找到图片。")
-        return
+    def on_success(result, parent):
+        msg = f"批量处理完成！共 {result[0]} 张。"
+        if result[2]:
+            msg += f"\n{result[2]} 张处理失败，重新运行会从断点继续。"
+        messagebox.showinfo("完成", msg, parent=parent)
 
-    success_count = 0
-    for filename in files:
-        file_path = os.path.join(folder_path, filename)
-        try:
-            img = cv2.imdecode(np.fromfile(file_path, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
-            if img is None: continue
-            if len(img.shape) == 2:
-                img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGRA)
-            elif img.shape[2] == 3:
-                img = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
-
-            h, w = img.shape[:2]
-            crop_t, crop_b = max(0, v_t), max(0, v_b)
-            crop_l, crop_r = max(0, v_l), max(0, v_r)
-
-            if (crop_t + crop_b >= h) or (crop_l + crop_r >= w): continue
-
-            if crop_t > 0 or crop_b > 0 or crop_l > 0 or crop_r > 0:
-                end_y = -crop_b if crop_b > 0 else None
-                end_x = -crop_r if crop_r > 0 else None
-                img = img[crop_t: end_y, crop_l: end_x]
-
-            pad_t, pad_b = abs(min(0, v_t)), abs(min(0, v_b))
-            pad_l, pad_r = abs(min(0, v_l)), abs(min(0, v_r))
-
-            if pad_t > 0 or pad_b > 0 or pad_l > 0 or pad_r > 0:
-                img = cv2.copyMakeBorder(img, pad_t, pad_b, pad_l, pad_r, cv2.BORDER_CONSTANT, value=(0, 0, 0, 0))
-
-            name_part, ext_part = os.path.splitext(filename)
-            if ext_part.lower() == '.png':
-                is_success, buffer = cv2.imencode(".png", img)
-                if is_success: buffer.tofile(file_path); success_count += 1
-            else:
-                new_path = os.path.join(folder_path, name_part + ".png")
-                is_success, buffer = cv2.imencode(".png", img)
-                if is_success: buffer.tofile(new_path); os.remove(file_path); success_count += 1
-        except Exception as e:
-            print(f"Error {filename}: {e}")
-    messagebox.showinfo("完成", f"批量处理完成！共 {success_count} 张。")
+    _submit_job(top, status_label, batch_crop_extend, folder_path, v_t, v_b, v_l, v_r, *scan_opts,
+                tool="批量裁切/扩展", title=os.path.basename(os.path.normpath(folder_path)), on_success=on_success)
 
 
 # ==============================================================================
 # 功能模块 3: 图片批量去底
 # ==============================================================================
-def _process_batch_remove_bg(folder_path, rgb_str, tolerance):
+def remove_bg_image(img, rgb, tolerance):
+    """把与背景色相差不超过 tolerance 的像素设为透明 (就地修改 BGRA 的 Alpha 通道)"""
+    r, g, b = rgb
+    bgr = img[:, :, :3]
+    lower_bgr = np.array([max(0, b - tolerance), max(0, g - tolerance), max(0, r - tolerance)])
+    upper_bgr = np.array([min(255, b + tolerance), min(255, g + tolerance), min(255, r + tolerance)])
+    mask = cv2.inRange(bgr, lower_bgr, upper_bgr)
+
+    img[:, :, 3] = np.where(mask == 255, 0, img[:, :, 3])
+    return img
+
+
+def batch_remove_bg(folder_path, rgb, tolerance, include=(), exclude=(), recursive=False,
+                    progress=None, cancel_token=None):
+    """批量去底并覆盖源文件 (非 PNG 转为 PNG)，返回 (成功数, 总数, 失败数)"""
+
+    def process(img):
+        with tracing.span("a2.remove_bg", "a2"):
+            return remove_bg_image(img, rgb, tolerance)
+
+    r, g, b = rgb
+    return _run_batch(folder_path, ('.jpg', '.png', '.jpeg', '.bmp'), f"key:{r},{g},{b},{tolerance}",
+                      process, include, exclude, recursive, progress, cancel_token)
+
+
+def _process_batch_remove_bg(top, status_label, folder_path, rgb_str, tolerance, scan_opts):
     if not folder_path or not os.path.exists(folder_path):
-        messagebox.showerror("错误", "请选择有效的文件夹！")
+        messagebox.showerror("错误", "请选择有效的文件夹！", parent=top)
         return
     try:
-        rgb_clean = rgb_str.replace("，", ",").replace(" ", "")
-        r, g, b = map(int, rgb_clean.split(','))
-    except:
-        messagebox.showerror("错误", "RGB 格式错误。")
+        rgb = parse_rgb(rgb_str)
+    except ValueError as e:
+        messagebox.showerror("错误", str(e), parent=top)
         return
 
-    files = [f for f in os.listdir(folder_path) if f.lower().endswith(('.jpg', '.png', '.jpeg', '.bmp'))]
-    if not files:
-        messagebox.showwarning("提示", "没有找到图片。")
-        return
+    def on_success(result, parent):
+        msg = f"去底完成！共 {result[0]} 张。"
+        if result[2]:
+            msg += f"\n{result[2]} 张处理失败，重新运行会从断点继续。"
+        messagebox.showinfo("完成", msg, parent=parent)
 
-    success_count = 0
-    for filename in files:
-        file_path = os.path.join(folder_path, filename)
-        try:
-            img = cv2.imdecode(np.fromfile(file_path, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
-            if img is None: continue
-            if len(img.shape) == 2:
-                img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGRA)
-            elif img.shape[2] == 3:
-                img = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
-
-            lower = np.array([max(0, b - tolerance), max(0, g - tolerance), max(0, r - tolerance), 0])
-            upper = np.array([min(255, b + tolerance), min(255, g + tolerance), min(255, r + tolerance), 255])
-
-            bgr = img[:, :, :3]
-            lower_bgr = np.array([max(0, b - tolerance), max(0, g - tolerance), max(0, r - tolerance)])
-            upper_bgr = np.array([min(255, b + tolerance), min(255, g + tolerance), min(255, r + tolerance)])
-            mask = cv2.inRange(bgr, lower_bgr, upper_bgr)
-
-            img[:, :, 3] = np.where(mask == 255, 0, img[:, :, 3])
-
-            name_part, ext_part = os.path.splitext(filename)
-            if ext_part.lower() == '.png':
-                is_success, buffer = cv2.imencode(".png", img)
-                if is_success: buffer.tofile(file_path); success_count += 1
-            else:
-                new_path = os.path.join(folder_path, name_part + ".png")
-                is_success, buffer = cv2.imencode(".png", img)
-                if is_success: buffer.tofile(new_path); os.remove(file_path); success_count += 1
-        except Exception as e:
-            print(f"Error {filename}: {e}")
-    messagebox.showinfo("完成", f"去底完成！共 {success_count} 张。")
+    _submit_job(top, status_label, batch_remove_bg, folder_path, rgb, tolerance, *scan_opts,
+                tool="批量去底", title=os.path.basename(os.path.normpath(folder_path)), on_success=on_success)
 
 
 # ==============================================================================
@@ -322,9 +555,8 @@ def _process_batch_remove_bg(folder_path, rgb_str, tolerance):
 def show_ui(parent):
     top = tk.Toplevel(parent)
     top.title("图片处理工具箱")
-    top.geometry("520x620")
+    top.geometry("520x790")
     top.transient(parent)
-    top.grab_set()
 
     top.update_idletasks()
     x = (top.winfo_screenwidth() - top.winfo_width()) // 2
@@ -377,10 +609,12 @@ def _init_ppt_ui(frame, parent_win):
     tk.Frame(frame, height=2, bd=1, relief="sunken").pack(fill="x", padx=10, pady=10)
 
     tk.Label(frame, text="DPI 设置 (清晰度):").pack(anchor="w", padx=10, pady=(5, 0))
-    dpi_values = ["72 (屏幕)", "96", "150", "288", "300 (打印)", "600"]
-    combo_dpi = ttk.Combobox(frame, values=dpi_values, width=15)
+    dpi_values = ["72 (屏幕)", "96", "150", "288", "300 (打印)", "600", "96, 150, 300 (多分辨率)"]
+    combo_dpi = ttk.Combobox(frame, values=dpi_values, width=24)
     combo_dpi.current(3)  # 默认 216
     combo_dpi.pack(anchor="w", padx=10, pady=2)
+    tk.Label(frame, text="填多个 DPI 时只按最高 DPI 导出一次，其余缩放生成，分别存入 <DPI>dpi 子文件夹",
+             fg="gray").pack(anchor="w", padx=10)
 
     tk.Label(frame, text="强制比例 (PPT导出阶段):").pack(anchor="w", padx=10, pady=(5, 0))
     combo_ratio = ttk.Combobox(frame, values=["原比例", "16:9", "4:3"], width=15, state="readonly")
@@ -427,13 +661,38 @@ def _init_ppt_ui(frame, parent_win):
 
     def run():
         _process_export_transparent_png(
-            entry_in.get(), entry_out.get(), combo_dpi.get(), combo_ratio.get(),
+            parent_win, lbl_status, entry_in.get(), entry_out.get(), combo_dpi.get(), combo_ratio.get(),
             var_enable.get(), e_w.get(), e_h.get(), cb_anchor.get()
         )
 
-    tk.Button(frame, text="开始导出", bg="#FF9800", fg="white", font=("Arial", 12, "bold"), command=run).pack(pady=20,
+    tk.Button(frame, text="开始导出", bg="#FF9800", fg="white", font=("Arial", 12, "bold"), command=run).pack(pady=(20, 5),
                                                                                                               fill="x",
                                                                                                               padx=20)
+    lbl_status = tk.Label(frame, text="", fg="gray")
+    lbl_status.pack()
+
+
+# -----------------------------------------------------------
+# 批处理公共选项
+# -----------------------------------------------------------
+def _add_scan_options(frame):
+    """子文件夹 / 包含 / 排除 选项；返回取值函数 -> (include, exclude, recursive)"""
+    opt_frame = tk.Frame(frame)
+    opt_frame.pack(fill="x", padx=10)
+    var_recursive = tk.BooleanVar(value=False)
+    tk.Checkbutton(opt_frame, text="包含子文件夹", variable=var_recursive).grid(row=0, column=0, columnspan=2, sticky="w")
+    tk.Label(opt_frame, text="仅处理:").grid(row=1, column=0, sticky="e")
+    e_include = tk.Entry(opt_frame, width=30)
+    e_include.grid(row=1, column=1, sticky="w", padx=5, pady=2)
+    tk.Label(opt_frame, text="排除:").grid(row=2, column=0, sticky="e")
+    e_exclude = tk.Entry(opt_frame, width=30)
+    e_exclude.grid(row=2, column=1, sticky="w", padx=5, pady=2)
+    tk.Label(opt_frame, text="(通配符，分号分隔，如 *.png; backup/*)", fg="gray").grid(row=3, column=1, sticky="w")
+
+    def get():
+        return batchfs.split_globs(e_include.get()), batchfs.split_globs(e_exclude.get()), var_recursive.get()
+
+    return get
 
 
 # -----------------------------------------------------------
@@ -450,6 +709,7 @@ def _init_crop_extend_ui(frame, parent_win):
     entry_folder = tk.Entry(frame);
     entry_folder.pack(fill="x", **pad_opts)
     tk.Button(frame, text="浏览文件夹", command=lambda: select_dir(entry_folder)).pack(anchor="e", padx=10)
+    get_scan_opts = _add_scan_options(frame)
 
     tk.Frame(frame, height=2, bd=1, relief="sunken").pack(fill="x", padx=10, pady=10)
 
@@ -484,10 +744,13 @@ def _init_crop_extend_ui(frame, parent_win):
              relief="groove").pack(fill="x", padx=10, pady=20, ipady=5)
 
     def run():
-        _process_batch_crop_extend(entry_folder.get(), e_top.get(), e_btm.get(), e_lft.get(), e_rgt.get())
+        _process_batch_crop_extend(parent_win, lbl_status, entry_folder.get(), e_top.get(), e_btm.get(), e_lft.get(),
+                                   e_rgt.get(), get_scan_opts())
 
+    lbl_status = tk.Label(frame, text="", fg="gray")
+    lbl_status.pack(side="bottom", pady=(0, 10))
     tk.Button(frame, text="开始批量处理", bg="#673AB7", fg="white", font=("Arial", 12, "bold"), command=run).pack(
-        side="bottom", pady=20, fill="x", padx=20)
+        side="bottom", pady=(20, 5), fill="x", padx=20)
 
 
 # -----------------------------------------------------------
@@ -504,6 +767,7 @@ def _init_bg_remove_ui(frame, parent_win):
     entry_folder = tk.Entry(frame);
     entry_folder.pack(fill="x", **pad_opts)
     tk.Button(frame, text="浏览文件夹", command=lambda: select_dir(entry_folder)).pack(anchor="e", padx=10)
+    get_scan_opts = _add_scan_options(frame)
 
     tk.Frame(frame, height=2, bd=1, relief="sunken").pack(fill="x", padx=10, pady=10)
 
@@ -524,7 +788,10 @@ def _init_bg_remove_ui(frame, parent_win):
              relief="groove").pack(fill="x", padx=10, pady=20)
 
     def run():
-        _process_batch_remove_bg(entry_folder.get(), entry_rgb.get(), scale_tol.get())
+        _process_batch_remove_bg(parent_win, lbl_status, entry_folder.get(), entry_rgb.get(), scale_tol.get(),
+                                 get_scan_opts())
 
+    lbl_status = tk.Label(frame, text="", fg="gray")
+    lbl_status.pack(side="bottom", pady=(0, 10))
     tk.Button(frame, text="开始去底", bg="#2196F3", fg="white", font=("Arial", 12, "bold"), command=run).pack(
-        side="bottom", pady=20, fill="x", padx=20)
\ No newline at end of file
+        side="bottom", pady=(20, 5), fill="x", padx=20)
\ No newline at end of file
@@ -0,0 +1,386 @@
+import os
+import struct
+import zlib
+from fractions import Fraction
+
+import cv2
+import numpy as np
+
+
+# ===========================
+# 公共工具
+# ===========================
+def _changed_bbox(mask):
+    """返回布尔掩码中 True 区域的包围盒 (x1, y1, x2, y2)，没有变化时返回 None"""
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def _union_bbox(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def _frame_time(fps):
+    """单帧时长 (秒)，fps 可以是 60 或 "60/4" 这样的分数字符串"""
+    return 1 / Fraction(str(fps))
+
+
+# ===========================
+# APNG
+# ===========================
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def _png_idat_payload(img_bgra, compression):
+    """用 OpenCV 把一块 BGRA 区域编码为 PNG，再取出其中 IDAT 的压缩数据"""
+    is_success, buffer = cv2.imencode(".png", img_bgra, [cv2.IMWRITE_PNG_COMPRESSION, compression])
+    if not is_success:
+        raise RuntimeError("PNG 编码失败")
+    data = buffer.tobytes()
+    pos, payload = 8, []
+    while pos < len(data):
+        length = struct.unpack(">I", data[pos:pos + 4])[0]
+        kind = data[pos + 4:pos + 8]
+        if kind == b"IDAT":
+            payload.append(data[pos + 8:pos + 8 + length])
+        pos += 12 + length
+    return b"".join(payload)
+
+
+class APNGWriter:
+    """
+    APNG 输出：每帧只保存与上一帧相比发生变化的矩形 (fcTL 偏移 + fdAT)。
+    使用 dispose_op=NONE / blend_op=SOURCE，矩形内像素 (含透明) 原样覆盖，
+    因此任意 Alpha 变化都能精确表达。
+    重复帧只延长上一帧的延时；帧数在结束时回填到 acTL。
+    """
+
+    def __init__(self, output_path, size, fps, compression=3, telemetry=None):
+        self.output_path = output_path
+        self.telemetry = telemetry
+        self.width, self.height = size
+        self.frame_time = _frame_time(fps)
+        self.compression = compression
+        self.f = open(output_path, 'wb')
+        self.seq = 0
+        self.frame_count = 0
+        self.prev = None
+        self.pending = None  # [bbox, BGRA 区域, 帧数]
+
+        self.f.write(b"\x89PNG\r\n\x1a\n")
+        self.f.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", self.width, self.height, 8, 6, 0, 0, 0)))
+        self._actl_pos = self.f.tell()
+        self.f.write(_png_chunk(b"acTL", struct.pack(">II", 0, 0)))
+
+    def _flush_pending(self):
+        if self.pending is None:
+            return
+        (x1, y1, x2, y2), region, count = self.pending
+        delay = (self.frame_time * count).limit_denominator(65535)
+        self.f.write(_png_chunk(b"fcTL", struct.pack(">IIIIIHHBB", self.seq, x2 - x1, y2 - y1, x1, y1,
+                                                     delay.numerator, delay.denominator, 0, 0)))
+        self.seq += 1
+        payload = _png_idat_payload(region, self.compression)
+        if self.frame_count == 0:
+            # 第一帧即默认图像，必须是完整画布并写成 IDAT
+            self.f.write(_png_chunk(b"IDAT", payload))
+        else:
+            self.f.write(_png_chunk(b"fdAT", struct.pack(">I", self.seq) + payload))
+            self.seq += 1
+        self.frame_count += 1
+        self.pending = None
+
+    def write(self, frame):
+        self._flush_pending()
+        if self.prev is None:
+            bbox = (0, 0, self.width, self.height)
+        else:
+            bbox = _changed_bbox(np.any(frame != self.prev, axis=2)) or (0, 0, 1, 1)
+        x1, y1, x2, y2 = bbox
+        self.pending = [bbox, np.ascontiguousarray(frame[y1:y2, x1:x2]), 1]
+        self.prev = frame
+        if self.telemetry:
+            self.telemetry.frame_encoded()
+
+    def write_repeat(self):
+        self.pending[2] += 1
+        if self.telemetry:
+            self.telemetry.frame_encoded()
+
+    def close(self):
+        self._flush_pending()
+        self.f.write(_png_chunk(b"IEND", b""))
+        self.f.seek(self._actl_pos)
+        self.f.write(_png_chunk(b"acTL", struct.pack(">II", self.frame_count, 0)))
+        self.f.close()
+
+    def abort(self):
+        self.f.close()
+        try:
+            os.remove(self.output_path)
+        except OSError:
+            pass
+
+
+# ===========================
+# GIF: 全局调色板 + 向量化映射
+# ===========================
+_BAYER_4X4 = np.array([[0, 8, 2, 10],
+                       [12, 4, 14, 6],
+                       [3, 11, 1, 9],
+                       [15, 7, 13, 5]], dtype=np.int16)
+
+
+def build_global_palette(frames, colors=255, iterations=4, alpha_threshold=128):
+    """
+    从采样帧计算全局调色板 (RGB, 最多 colors 色，索引 0 另留给透明)。
+    先按 5 bit/通道做直方图，以出现最多的颜色为初值，
+    再在直方图桶上做几轮加权 k-means 细化，全部为数组运算。
+    """
+    bins = np.zeros(32768, dtype=np.int64)
+    for frame in frames:
+        opaque = frame[frame[:, :, 3] >= alpha_threshold][:, :3].astype(np.int32) >> 3
+        if opaque.size:
+            codes = (opaque[:, 2] << 10) | (opaque[:, 1] << 5) | opaque[:, 0]
+            bins += np.bincount(codes, minlength=32768)
+
+    used = np.flatnonzero(bins)
+    if used.size == 0:
+        return np.zeros((1, 3), dtype=np.uint8)
+    weights = bins[used].astype(np.float64)
+    points = np.stack([(used >> 10) & 31, (used >> 5) & 31, used & 31], axis=1).astype(np.float64) * 8 + 4
+
+    k = min(colors, used.size)
+    centers = points[np.argsort(-weights, kind='stable')[:k]].copy()
+    for _ in range(iterations):
+        labels = _nearest(points, centers)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, points * weights[:, None])
+        counts = np.bincount(labels, weights=weights, minlength=k)
+        nonzero = counts > 0
+        centers[nonzero] = sums[nonzero] / counts[nonzero, None]
+    return np.clip(np.rint(centers), 0, 255).astype(np.uint8)
+
+
+def _nearest(points, centers, chunk=4096):
+    """分块计算每个点最近的调色板颜色下标"""
+    out = np.empty(len(points), dtype=np.int64)
+    c = centers.astype(np.float64)
+    c_sq = (c ** 2).sum(axis=1)
+    for start in range(0, len(points), chunk):
+        p = points[start:start + chunk].astype(np.float64)
+        d = c_sq[None, :] - 2 * p @ c.T
+        out[start:start + chunk] = np.argmin(d, axis=1)
+    return out
+
+
+def build_palette_lut(palette_rgb):
+    """对 32768 个 5 bit 颜色预先求最近调色板下标 (+1，索引 0 为透明)"""
+    codes = np.arange(32768)
+    points = np.stack([(codes >> 10) & 31, (codes >> 5) & 31, codes & 31], axis=1) * 8 + 4
+    return (_nearest(points, palette_rgb) + 1).astype(np.uint8)
+
+
+def map_to_palette(frame_bgra, lut, dither=False, alpha_threshold=128):
+    """把 BGRA 帧映射为调色板下标图 (uint8)，可选 4x4 有序抖动"""
+    bgr = frame_bgra[:, :, :3].astype(np.int16)
+    if dither:
+        h, w = bgr.shape[:2]
+        tile = np.tile(_BAYER_4X4, ((h + 3) // 4, (w + 3) // 4))[:h, :w]
+        bgr = bgr + ((tile - 7.5) * 0.5).astype(np.int16)[:, :, None]
+        np.clip(bgr, 0, 255, out=bgr)
+    q = bgr >> 3
+    codes = (q[:, :, 2] << 10) | (q[:, :, 1] << 5) | q[:, :, 0]
+    indices = lut[codes]
+    indices[frame_bgra[:, :, 3] < alpha_threshold] = 0
+    return indices
+
+
+# ===========================
+# GIF: LZW 与容器
+# ===========================
+def _lzw_encode(indices, min_code_size=8):
+    """GIF 变长 LZW 编码，返回按 255 字节分块后的数据子块"""
+    clear = 1 << min_code_size
+    eoi = clear + 1
+    out = bytearray()
+    bit_buf = 0
+    bit_len = 0
+
+    def emit(code, size):
+        nonlocal bit_buf, bit_len
+        bit_buf |= code << bit_len
+        bit_len += size
+        while bit_len >= 8:
+            out.append(bit_buf & 0xFF)
+            bit_buf >>= 8
+            bit_len -= 8
+
+    table = {}
+    next_code = eoi + 1
+    code_size = min_code_size + 1
+    emit(clear, code_size)
+
+    data = indices.tobytes()
+    prefix = data[0]
+    for byte in data[1:]:
+        key = (prefix << 8) | byte
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        emit(prefix, code_size)
+        if next_code < 4096:
+            table[key] = next_code
+            next_code += 1
+            if next_code > (1 << code_size) and code_size < 12:
+                code_size += 1
+        else:
+            emit(clear, code_size)
+            table.clear()
+            next_code = eoi + 1
+            code_size = min_code_size + 1
+        prefix = byte
+    emit(prefix, code_size)
+    emit(eoi, code_size)
+    if bit_len:
+        out.append(bit_buf & 0xFF)
+
+    blocks = bytearray()
+    for i in range(0, len(out), 255):
+        chunk = out[i:i + 255]
+        blocks.append(len(chunk))
+        blocks += chunk
+    blocks.append(0)
+    return bytes(blocks)
+
+
+class GIFWriter:
+    """
+    GIF 输出：全局调色板由采样帧一次性计算 (prime)，逐帧做向量化查表映射 / 有序抖动。
+    每帧只写入与当前显示内容相比发生变化的矩形；未变化像素写透明索引以利于压缩。
+    GIF 无法用透明像素 "擦除" 已显示内容，因此当下一帧需要把不透明像素变为透明时，
+    把上一帧的处置方式改为 "恢复背景" 并扩大其矩形覆盖这些像素 (上一帧始终缓存一帧再写出)。
+    GIF 延时单位为 1/100 秒且浏览器会把小于 2 的延时放慢，
+    不足最小延时的帧会被后续帧替换，以保持总时长不变。
+    """
+
+    MIN_DELAY_CS = 2
+
+    def __init__(self, output_path, size, fps, dither=False, telemetry=None):
+        self.output_path = output_path
+        self.telemetry = telemetry
+        self.width, self.height = size
+        self.frame_time = _frame_time(fps)
+        self.dither = dither
+        self.lut = None
+        self.palette = None
+        self.f = open(output_path, 'wb')
+        self.header_written = False
+
+        self.display = np.zeros((self.height, self.width), dtype=np.uint8)  # 上一帧画完后的显示内容
+        self.pending = None  # dict: base, image, bbox, start, count, dispose
+        self.time_cursor = Fraction(0)
+
+    def prime(self, sample_frames):
+        """用采样帧计算全局调色板"""
+        self.palette = build_global_palette(sample_frames)
+        self.lut = build_palette_lut(self.palette)
+
+    def _write_header(self):
+        if self.lut is None:
+            raise RuntimeError("GIF 写入前必须先调用 prime() 计算调色板")
+        table = np.zeros((256, 3), dtype=np.uint8)
+        table[1:1 + len(self.palette)] = self.palette
+        self.f.write(b"GIF89a")
+        self.f.write(struct.pack("<HHBBB", self.width, self.height, 0xF7, 0, 0))
+        self.f.write(table.tobytes())
+        # NETSCAPE2.0 无限循环
+        self.f.write(b"\x21\xFF\x0BNETSCAPE2.0\x03\x01\x00\x00\x00")
+        self.header_written = True
+
+    def _delay_cs(self, start, count):
+        end = start + self.frame_time * count
+        return int(round(end * 100)) - int(round(start * 100))
+
+    def _emit(self, p):
+        x1, y1, x2, y2 = p["bbox"]
+        region = p["image"][y1:y2, x1:x2].copy()
+        base = p["base"][y1:y2, x1:x2]
+        region[region == base] = 0  # 未变化像素写透明，保留已显示内容
+        delay = self._delay_cs(p["start"], p["count"])
+        packed = (p["dispose"] << 2) | 0x01
+        self.f.write(struct.pack("<BBBBHBB", 0x21, 0xF9, 4, packed, delay, 0, 0))
+        self.f.write(struct.pack("<BHHHHB", 0x2C, x1, y1, x2 - x1, y2 - y1, 0))
+        self.f.write(b"\x08")
+        self.f.write(_lzw_encode(region))
+
+    def write(self, frame):
+        if not self.header_written:
+            self._write_header()
+        target = map_to_palette(frame, self.lut, self.dither)
+        p = self.pending
+
+        if (p is not None and self._delay_cs(p["start"], p["count"]) < self.MIN_DELAY_CS
+                and not np.any((p["base"] != 0) & (target == 0))):
+            # 上一帧显示时间不足最小延时：直接用新帧替换它 (起始时间不变)。
+            # 新帧需要擦除 base 上的像素时不能替换，仍按正常流程写出上一帧
+            base = p["base"]
+            bbox = _changed_bbox(base != target) or (0, 0, 1, 1)
+            self.pending = {"base": base, "image": target, "bbox": bbox, "start": p["start"],
+                            "count": p["count"] + 1, "dispose": 1}
+            if self.telemetry:
+                self.telemetry.frame_encoded()
+            return
+
+        base = self.display
+        if p is not None:
+            # 需要被擦成透明的像素：交给上一帧的 "恢复背景" 处理
+            clear = (p["image"] != 0) & (target == 0)
+            clear_box = _changed_bbox(clear)
+            if clear_box is not None:
+                p["bbox"] = _union_bbox(p["bbox"], clear_box)
+                p["dispose"] = 2
+            self._emit(p)
+            base = p["image"].copy()
+            if p["dispose"] == 2:
+                x1, y1, x2, y2 = p["bbox"]
+                base[y1:y2, x1:x2] = 0
+            start = p["start"] + self.frame_time * p["count"]
+        else:
+            start = Fraction(0)
+
+        self.display = base
+        bbox = _changed_bbox(base != target) or (0, 0, 1, 1)
+        self.pending = {"base": base, "image": target, "bbox": bbox, "start": start, "count": 1, "dispose": 1}
+        if self.telemetry:
+            self.telemetry.frame_encoded()
+
+    def write_repeat(self):
+        self.pending["count"] += 1
+        if self.telemetry:
+            self.telemetry.frame_encoded()
+
+    def close(self):
+        if not self.header_written:
+            self._write_header()
+        if self.pending is not None:
+            self._emit(self.pending)
+            self.pending = None
+        self.f.write(b"\x3B")
+        self.f.close()
+
+    def abort(self):
+        self.f.close()
+        try:
+            os.remove(self.output_path)
+        except OSError:
+            pass
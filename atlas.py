@@ -0,0 +1,271 @@
+import json
+import os
+import re
+import threading
+
+import cv2
+import numpy as np
+
+import batchfs
+import imgio
+import tracing
+
+# ===========================
+# 图集 (sprite sheet) 打包
+# ===========================
+# 把一个文件夹中的 PNG (如 a2 导出的 slide_N.png) 打包成一张或多张图集 + 一份 JSON 帧索引，
+# 播放端只需加载 / 上传少量大图。
+#
+# 流程:
+#   1. 并行解码每张图，裁掉四周完全透明的像素，只记录裁切矩形 (不保留像素，内存只与线程数有关)；
+#   2. 按高度从大到小用 skyline (bottom-left) 算法排进 max_size x max_size 的图集，放不下时开新图集；
+#   3. 每张图集并行解码对应的源图，用 numpy 切片整块拷贝到图集中 (各帧区域互不重叠，无需加锁)。
+#
+# 清单 <name>.json:
+# {
+#   "meta": {"version": 1, "max_size": 4096, "padding": 2, "trim": true},
+#   "atlases": [{"file": "atlas_0.png", "size": [w, h]}],
+#   "frames": {
+#     "slide_1.png": {"atlas": 0, "frame": {"x", "y", "w", "h"},          图集中的位置
+#                     "spriteSourceSize": {"x", "y", "w", "h"},          裁切矩形在原图中的位置
+#                     "sourceSize": {"w", "h"}, "trimmed": true}
+#   }
+# }
+# frames 按文件名自然排序 (slide_2 在 slide_10 之前)。
+
+DEFAULT_MAX_SIZE = 4096
+MANIFEST_VERSION = 1
+
+
+def natural_key(text):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", text)]
+
+
+def _to_uint8(img):
+    if img.dtype == np.uint8:
+        return img
+    return cv2.convertScaleAbs(img, alpha=255.0 / np.iinfo(img.dtype).max)
+
+
+def trim_rect(img):
+    """去掉四周完全透明的像素后的矩形 (x, y, w, h)；整张透明时保留左上角 1x1"""
+    if img.shape[2] < 4:
+        return 0, 0, img.shape[1], img.shape[0]
+    alpha = img[:, :, 3]
+    if alpha.dtype != np.uint8:
+        alpha = (alpha > 0).astype(np.uint8)
+    x, y, w, h = cv2.boundingRect(alpha)
+    if w == 0 or h == 0:
+        return 0, 0, 1, 1
+    return x, y, w, h
+
+
+# ===========================
+# Skyline 装箱
+# ===========================
+class SkylinePacker:
+    """
+    Skyline bottom-left：维护每一段 x 区间当前的顶部高度，新矩形放在使其顶边最低的位置 (相同时取最左)。
+    插入 n 个矩形的代价约为 O(n * 段数)，数千张图也在秒级以内。
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.skyline = [[0, 0, width]]  # [x, y, 段宽]
+        self.used_w = 0
+        self.used_h = 0
+
+    def _fit(self, index, w, h):
+        """矩形左边对齐第 index 段时能放下的最低 y；放不下返回 None"""
+        x = self.skyline[index][0]
+        if x + w > self.width:
+            return None
+        y = 0
+        width_left = w
+        i = index
+        while width_left > 0:
+            y = max(y, self.skyline[i][1])
+            if y + h > self.height:
+                return None
+            width_left -= self.skyline[i][2]
+            i += 1
+        return y
+
+    def insert(self, w, h):
+        """放入 w x h 的矩形，返回左上角 (x, y)；放不下返回 None"""
+        best = None
+        for i in range(len(self.skyline)):
+            y = self._fit(i, w, h)
+            if y is not None and (best is None or (y + h, self.skyline[i][0]) < best[0]):
+                best = ((y + h, self.skyline[i][0]), i, y)
+        if best is None:
+            return None
+        _, index, y = best
+        x = self.skyline[index][0]
+        self._add_level(index, x, y, w, h)
+        self.used_w = max(self.used_w, x + w)
+        self.used_h = max(self.used_h, y + h)
+        return x, y
+
+    def _add_level(self, index, x, y, w, h):
+        skyline = self.skyline
+        skyline.insert(index, [x, y + h, w])
+        # 新段覆盖掉的后续段向右收缩 / 删除
+        i = index + 1
+        while i < len(skyline):
+            node = skyline[i]
+            shrink = x + w - node[0]
+            if shrink <= 0:
+                break
+            node[0] += shrink
+            node[2] -= shrink
+            if node[2] > 0:
+                break
+            del skyline[i]
+        # 合并相邻的同高段
+        i = 0
+        while i < len(skyline) - 1:
+            if skyline[i][1] == skyline[i + 1][1]:
+                skyline[i][2] += skyline[i + 1][2]
+                del skyline[i + 1]
+            else:
+                i += 1
+
+
+def pack_rects(sizes, max_size=DEFAULT_MAX_SIZE, padding=2):
+    """
+    sizes: {key: (w, h)}。返回 (placements {key: (图集序号, x, y)}, 各图集使用的 (w, h))。
+    大的先放；每个矩形依次尝试已有图集，都放不下时新开一张。
+    """
+    packers = []
+    placements = {}
+    order = sorted(sizes, key=lambda k: (sizes[k][1], sizes[k][0]), reverse=True)
+    for key in order:
+        w, h = sizes[key]
+        if w > max_size or h > max_size:
+            raise ValueError(f"图片超过图集最大尺寸 {max_size}: {key} ({w}x{h})")
+        pw, ph = min(w + padding, max_size), min(h + padding, max_size)
+        for index, packer in enumerate(packers):
+            pos = packer.insert(pw, ph)
+            if pos is not None:
+                break
+        else:
+            packers.append(SkylinePacker(max_size, max_size))
+            index = len(packers) - 1
+            pos = packers[index].insert(pw, ph)
+        placements[key] = (index, pos[0], pos[1])
+    sizes_used = [(min(p.used_w, max_size), min(p.used_h, max_size)) for p in packers]
+    return placements, sizes_used
+
+
+def _pot(n):
+    return 1 << max(0, (n - 1).bit_length())
+
+
+# ===========================
+# 打包
+# ===========================
+def build_atlas(folder, output_dir, name="atlas", max_size=DEFAULT_MAX_SIZE, padding=2, trim=True, pot=False,
+                include=(), exclude=(), recursive=False, progress=None, cancel_token=None):
+    """
+    打包 folder 中的 PNG，写出 <name>_<i>.png 与 <name>.json。
+    pot=True 时图集边长取 2 的幂，max_size 也必须是 2 的幂 (否则向上取整后会超过 max_size)。
+    任何一张图读取 / 合成失败都会抛出 ValueError，不会写出缺帧的图集。
+    返回 {"frames", "atlases": [文件路径...], "manifest", "fill"} (fill 为像素占用率)。
+    """
+    if not folder or not os.path.isdir(folder):
+        raise ValueError("请选择有效的文件夹！")
+    if pot and max_size & (max_size - 1):
+        raise ValueError(f"图集尺寸取 2 的幂时，最大尺寸也必须是 2 的幂: {max_size}")
+    os.makedirs(output_dir, exist_ok=True)
+    out_abs = os.path.normcase(os.path.abspath(output_dir))
+
+    # 1. 裁切矩形 (并行)
+    infos = {}
+    lock = threading.Lock()
+
+    def measure(path, rel):
+        img = imgio.read_bgra(path, cache=False)
+        with tracing.span("atlas.trim", "atlas"):
+            rect = trim_rect(img) if trim else (0, 0, img.shape[1], img.shape[0])
+        with lock:
+            infos[rel] = {"path": path, "rect": rect, "source": (img.shape[1], img.shape[0])}
+        return True
+
+    def measure_progress(done, total, rel):
+        if progress:
+            progress(done, total, f"分析 {rel}")
+
+    files = (item for item in batchfs.iter_files(folder, ('.png',), include, exclude, recursive)
+             # 输出目录在源文件夹内时不把上一次的图集也打包进去
+             if os.path.normcase(os.path.dirname(os.path.abspath(item[0]))) != out_abs)
+    _, total, failed = batchfs.run_streaming(files, measure, progress=measure_progress, cancel_token=cancel_token)
+    if total == 0:
+        raise ValueError("没有找到图片。")
+    if failed:
+        raise ValueError(f"{failed} 张图片读取失败，已停止打包。")
+
+    # 2. 装箱
+    with tracing.span("atlas.pack", "atlas", frames=len(infos)):
+        placements, used = pack_rects({k: v["rect"][2:] for k, v in infos.items()}, max_size, padding)
+
+    # 3. 合成 (每张图集内并行拷贝)
+    atlas_files = []
+    done_count = [0]
+    for index, (used_w, used_h) in enumerate(used):
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        atlas_w, atlas_h = (_pot(used_w), _pot(used_h)) if pot else (used_w, used_h)
+        canvas = np.zeros((atlas_h, atlas_w, 4), dtype=np.uint8)
+        members = sorted((k for k, p in placements.items() if p[0] == index), key=natural_key)
+
+        def blit(path, rel):
+            _, x, y = placements[rel]
+            rx, ry, rw, rh = infos[rel]["rect"]
+            img = _to_uint8(imgio.read_bgra(path, cache=False))
+            if (img.shape[1], img.shape[0]) != infos[rel]["source"]:
+                raise ValueError(f"图片在打包过程中被修改: {rel}")
+            with tracing.span("atlas.blit", "atlas"):
+                canvas[y:y + rh, x:x + rw] = img[ry:ry + rh, rx:rx + rw]
+            return True
+
+        def blit_progress(done, _, rel):
+            if progress:
+                progress(done_count[0] + done, total, f"合成 {rel}")
+
+        _, _, failed = batchfs.run_streaming(((infos[k]["path"], k) for k in members), blit,
+                                             progress=blit_progress, cancel_token=cancel_token)
+        if failed:
+            raise ValueError(f"{failed} 张图片合成失败，已停止打包。")
+        done_count[0] += len(members)
+        atlas_path = os.path.join(output_dir, f"{name}_{index}.png")
+        imgio.write_image(atlas_path, canvas)
+        atlas_files.append(atlas_path)
+
+    # 4. 清单
+    frames = {}
+    for rel in sorted(infos, key=natural_key):
+        index, x, y = placements[rel]
+        rx, ry, rw, rh = infos[rel]["rect"]
+        sw, sh = infos[rel]["source"]
+        frames[rel] = {
+            "atlas": index,
+            "frame": {"x": x, "y": y, "w": rw, "h": rh},
+            "spriteSourceSize": {"x": rx, "y": ry, "w": rw, "h": rh},
+            "sourceSize": {"w": sw, "h": sh},
+            "trimmed": (rw, rh) != (sw, sh),
+        }
+    manifest = {
+        "meta": {"version": MANIFEST_VERSION, "max_size": max_size, "padding": padding, "trim": trim},
+        "atlases": [{"file": os.path.basename(p), "size": [(_pot(w) if pot else w), (_pot(h) if pot else h)]}
+                    for p, (w, h) in zip(atlas_files, used)],
+        "frames": frames,
+    }
+    manifest_path = os.path.join(output_dir, f"{name}.json")
+    imgio.atomic_write_bytes(manifest_path, json.dumps(manifest, ensure_ascii=False, indent=1).encode('utf-8'))
+
+    area = sum(v["rect"][2] * v["rect"][3] for v in infos.values())
+    atlas_area = sum(a["size"][0] * a["size"][1] for a in manifest["atlases"])
+    return {"frames": len(frames), "atlases": atlas_files, "manifest": manifest_path,
+            "fill": round(area / atlas_area, 4) if atlas_area else 0}
@@ -2,11 +2,25 @@ import tkinter as tk
 from tkinter import messagebox, filedialog, ttk
 import cv2
 import numpy as np
-import math
 import threading
 import os
 import subprocess
 import shutil
+import json
+import hashlib
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+
+import anim_writers
+import fpscalc
+import imgio
+import nutpipe
+import qoi
+import source_cache
+import tracing
 
 
 # ===========================
@@ -18,152 +32,975 @@ def check_ffmpeg():
 
 
 # ===========================
-# 核心渲染逻辑 (FFmpeg 管道模式)
+# 编码配置表 (Profile Registry)
+# ===========================
+# kind = "ffmpeg"   : 通过管道送入 FFmpeg，args 为输出端编码参数
+# kind = "sequence" : 不依赖 FFmpeg，直接在线程池中编码为逐帧图片
+# kind = "animated" : 不依赖 FFmpeg，由 anim_writers 写出 APNG / GIF 动图 (只保存变化区域)
+# kind = "null"     : 丢弃所有帧，只用于基准测试合成速度 (hidden 的配置不出现在界面中)
+# segmentable = False : FFmpeg 配置的输出不能用 concat 分离器 + -c copy 拼接 (如动态 WebP)，不支持分段渲染
+ENCODER_PROFILES = {
+    "prores4444": {
+        "label": "ProRes 4444 (CPU)",
+        "kind": "ffmpeg",
+        "ext": ".mov",
+        "args": ['-c:v', 'prores_ks', '-profile:v', '4', '-pix_fmt', 'yuva444p10le', '-vendor', 'apl0'],
+    },
+    "prores4444xq": {
+        "label": "ProRes 4444 XQ (CPU)",
+        "kind": "ffmpeg",
+        "ext": ".mov",
+        "args": ['-c:v', 'prores_ks', '-profile:v', '5', '-pix_fmt', 'yuva444p10le', '-vendor', 'apl0'],
+    },
+    "vp9_webm": {
+        "label": "VP9 Alpha WebM (CPU)",
+        "kind": "ffmpeg",
+        "ext": ".webm",
+        "args": ['-c:v', 'libvpx-vp9', '-pix_fmt', 'yuva420p', '-b:v', '0', '-crf', '30',
+                 '-deadline', 'good', '-cpu-used', '4', '-row-mt', '1', '-auto-alt-ref', '0'],
+    },
+    "qtrle": {
+        "label": "QuickTime Animation (CPU)",
+        "kind": "ffmpeg",
+        "ext": ".mov",
+        "args": ['-c:v', 'qtrle', '-pix_fmt', 'argb'],
+    },
+    "ffv1": {
+        "label": "FFV1 无损 (CPU)",
+        "kind": "ffmpeg",
+        "ext": ".mkv",
+        "args": ['-c:v', 'ffv1', '-level', '3', '-pix_fmt', 'bgra', '-g', '1', '-slices', '16', '-slicecrc', '0'],
+    },
+    "hevc_nvenc": {
+        "label": "HEVC (NVIDIA GPU)",
+        "kind": "ffmpeg",
+        "ext": ".mov",
+        "args": ['-c:v', 'hevc_nvenc', '-pix_fmt', 'yuva444p', '-preset', 'p7', '-tune', 'hq',
+                 '-rc', 'vbr', '-b:v', '20M'],
+    },
+    "preview_png": {
+        "label": "预览 (PNG-in-MOV, 快速帧内)",
+        "kind": "ffmpeg",
+        "ext": ".mov",
+        "args": ['-c:v', 'png', '-pred', 'none', '-compression_level', '1', '-pix_fmt', 'rgba'],
+    },
+    "webp_anim": {
+        "label": "动态 WebP (网页用)",
+        "kind": "ffmpeg",
+        "ext": ".webp",
+        "args": ['-c:v', 'libwebp_anim', '-pix_fmt', 'yuva420p', '-lossless', '0', '-quality', '80',
+                 '-compression_level', '4', '-loop', '0'],
+        "segmentable": False,
+    },
+    "apng": {
+        "label": "APNG 动图 (无需 FFmpeg)",
+        "kind": "animated",
+        "ext": ".png",
+        "format": "apng",
+    },
+    "gif": {
+        "label": "GIF 动图 (无需 FFmpeg)",
+        "kind": "animated",
+        "ext": ".gif",
+        "format": "gif",
+    },
+    "gif_dither": {
+        "label": "GIF 动图 (有序抖动)",
+        "kind": "animated",
+        "ext": ".gif",
+        "format": "gif",
+        "dither": True,
+    },
+    "png_seq": {
+        "label": "PNG 序列 (无需 FFmpeg)",
+        "kind": "sequence",
+        "ext": ".png",
+    },
+    "qoi_seq": {
+        "label": "QOI 序列 (无需 FFmpeg)",
+        "kind": "sequence",
+        "ext": ".qoi",
+    },
+    "null": {
+        "label": "空输出 (基准测试)",
+        "kind": "null",
+        "ext": "",
+        "hidden": True,
+    },
+}
+
+DEFAULT_PROFILE = "prores4444"
+
+
+def get_profile(name):
+    """按名称取编码配置，名称无效时抛出 ValueError"""
+    profile = ENCODER_PROFILES.get(name)
+    if profile is None:
+        raise ValueError(f"未知的编码配置: {name}\n可选: {', '.join(ENCODER_PROFILES)}")
+    return profile
+
+
+def supports_segments(name):
+    """该配置能否分段编码后再无损拼接 (只有 FFmpeg 容器输出，且未标记 segmentable=False)"""
+    profile = get_profile(name)
+    return profile["kind"] == "ffmpeg" and profile.get("segmentable", True)
+
+
+def resolve_output_path(output_path, profile_name):
+    """
+    根据编码配置修正输出路径：
+    视频类配置强制使用对应扩展名；序列类配置输出到同名文件夹。
+    """
+    profile = get_profile(profile_name)
+    base = os.path.splitext(output_path)[0]
+    if profile["kind"] == "sequence":
+        return base
+    return base + profile["ext"]
+
+
+# ===========================
+# 渲染遥测 (阶段耗时 / FFmpeg 进度 / ETA)
 # ===========================
-def _render_video_thread(img_path, output_path, resolution, fps, angle, distance, speed, use_gpu, progress_callback,
-                         done_callback):
-    pipe = None
+class RenderTelemetry:
+    """
+    收集一次渲染的遥测数据，并按时间间隔推送快照。
+    - 阶段计时: decode / compose / pipe_write / encoder_wait
+    - FFmpeg 进度: 来自 `-progress pipe:1` 的 frame / fps / bitrate / speed
+    - ETA: 优先按 FFmpeg 实际编码速度估算
+    快照通过 callback(dict) 推送，也可以逐行追加到 JSON Lines 日志，
+    UI 与无界面批处理共用同一份数据。
+    """
+
+    STAGES = ("decode", "compose", "pipe_write", "encoder_wait")
+
+    def __init__(self, callback=None, log_path=None, interval=0.25):
+        self.callback = callback
+        self.log_path = log_path
+        self.interval = interval
+        self.stage_seconds = {name: 0.0 for name in self.STAGES}
+        self.ffmpeg = {}
+        self.total_frames = 0
+        self.frames_written = 0
+        self.frames_encoded = 0
+        self.frames_skipped = 0
+        self.encoded_offset = 0
+        self._lock = threading.Lock()
+        self._t_start = time.perf_counter()
+        self._t_last_emit = 0.0
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            with tracing.span("b0." + name, "b0"):
+                yield
+        finally:
+            dt = time.perf_counter() - t0
+            with self._lock:
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + dt
+
+    def begin(self, total_frames):
+        self.total_frames = total_frames
+        self._emit("start")
+
+    def frame_done(self):
+        """记录一帧已送出；到达推送间隔时推送快照并返回 True"""
+        self.frames_written += 1
+        now = time.perf_counter()
+        if now - self._t_last_emit >= self.interval:
+            tracing.counter("b0.frames", "b0", written=self.frames_written, encoded=self.frames_encoded,
+                            skipped=self.frames_skipped)
+            self._emit("progress", now)
+            return True
+        return False
+
+    def resume_frames(self, count):
+        """续渲时跳过的已完成分段，直接计入进度"""
+        self.frames_written += count
+        with self._lock:
+            self.frames_encoded += count
+
+    def frame_skipped(self):
+        """记录一帧与上一帧相同、未重新合成"""
+        self.frames_skipped += 1
+
+    def frame_encoded(self):
+        with self._lock:
+            self.frames_encoded += 1
+
+    def update_ffmpeg(self, fields):
+        """合并一组 FFmpeg progress 键值"""
+        with self._lock:
+            self.ffmpeg.update(fields)
+            try:
+                self.frames_encoded = self.encoded_offset + int(fields["frame"])
+            except (KeyError, ValueError):
+                pass
+
+    def finish(self, error=None, cancelled=False):
+        if cancelled:
+            self._emit("cancelled")
+        else:
+            self._emit("error" if error else "done", extra={"error": error} if error else None)
+
+    @property
+    def percent(self):
+        if not self.total_frames:
+            return 0.0
+        done = max(self.frames_encoded, 0) if self.ffmpeg else self.frames_written
+        return min(100.0, done / self.total_frames * 100)
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self._t_start
+            enc_fps = _to_float(self.ffmpeg.get("fps"))
+            if enc_fps is None and not self.ffmpeg and self.frames_encoded and elapsed:
+                enc_fps = round(self.frames_encoded / elapsed, 2)
+            done = self.frames_encoded if self.ffmpeg else self.frames_written
+            remaining = max(0, self.total_frames - done)
+            if enc_fps:
+                eta = remaining / enc_fps
+            elif done and elapsed:
+                eta = remaining * elapsed / done
+            else:
+                eta = None
+            return {
+                "elapsed": round(elapsed, 3),
+                "total_frames": self.total_frames,
+                "frames_written": self.frames_written,
+                "frames_encoded": self.frames_encoded,
+                "frames_skipped": self.frames_skipped,
+                "percent": round(self.percent, 2),
+                "eta": round(eta, 2) if eta is not None else None,
+                "write_fps": round(self.frames_written / elapsed, 2) if elapsed else 0.0,
+                "encode_fps": enc_fps,
+                "bitrate": self.ffmpeg.get("bitrate"),
+                "speed": self.ffmpeg.get("speed"),
+                "stages": {k: round(v, 4) for k, v in self.stage_seconds.items()},
+            }
+
+    def _emit(self, event, now=None, extra=None):
+        self._t_last_emit = now or time.perf_counter()
+        snap = self.snapshot()
+        snap["event"] = event
+        if extra:
+            snap.update(extra)
+        if self.log_path:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(snap, ensure_ascii=False) + "\n")
+        if self.callback:
+            self.callback(snap)
+
+
+def _to_float(value):
     try:
-        # 1. 强制检查 FFmpeg
-        if not check_ffmpeg():
-            raise RuntimeError(
-                "未检测到 ffmpeg.exe！\n\n必须安装 FFmpeg 才能生成视频。\n请下载 ffmpeg.exe 并放到本软件同级目录下。")
+        return float(str(value).rstrip("x")) or None
+    except (TypeError, ValueError):
+        return None
 
-        # 2. 读取源图片 (强制保留 Alpha)
-        img = cv2.imdecode(np.fromfile(img_path, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
-        if img is None:
-            raise ValueError("无法读取图片，请检查文件。")
 
-        # 3. 确保图片是 4 通道 (BGRA)
-        if len(img.shape) == 2:
-            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGRA)
-        elif img.shape[2] == 3:
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+def format_telemetry(snap):
+    """把遥测快照格式化为一行状态文字"""
+    text = f"渲染中: {snap['percent']:.1f}%"
+    if snap.get("encode_fps"):
+        text += f" | 编码 {snap['encode_fps']:.1f} fps"
+    if snap.get("speed"):
+        text += f" | {snap['speed']}"
+    if snap.get("eta") is not None:
+        text += f" | 剩余 {snap['eta']:.0f}s"
+    return text
 
-        img_h, img_w = img.shape[:2]
 
-        # 4. 参数计算
-        canvas_w, canvas_h = resolution
-        total_frames = int((distance / speed) * fps)
-        if total_frames <= 0: total_frames = fps
+# ===========================
+# 帧写入器
+# ===========================
+class _FFmpegWriter:
+    """
+    通过 stdin 管道把 BGRA 帧以 NUT 封装 (每帧带 PTS) 送入 FFmpeg。
+    重复帧不再经过管道，只推进帧序号：默认由 fps 滤镜按时间戳补齐为恒定帧率，
+    vfr=True 时 `-fps_mode passthrough` 直接保留每帧时长，输出可变帧率文件。
+    stdout 接收 `-progress pipe:1` 的键值输出，stderr 在后台线程持续读取，防止管道写满死锁。
+    """
 
-        rad = math.radians(angle)
-        vel_x = speed * math.cos(rad)
-        vel_y = speed * math.sin(rad)
-        dx_per_frame = vel_x / fps
-        dy_per_frame = vel_y / fps
+    def __init__(self, output_path, size, fps, profile_name, telemetry=None, vfr=False):
+        if not check_ffmpeg():
+            raise RuntimeError(
+                "未检测到 ffmpeg.exe！\n\n必须安装 FFmpeg 才能生成视频。\n请下载 ffmpeg.exe 并放到本软件同级目录下。")
 
-        # 5. 构建 FFmpeg 命令
-        if not output_path.lower().endswith('.mov'):
-            output_path = os.path.splitext(output_path)[0] + ".mov"
+        self.profile_name = profile_name
+        self.output_path = output_path
+        self.telemetry = telemetry
+        self.fps = float(Fraction(str(fps)))
+        self.vfr = vfr
 
-        common_input_flags = [
+        command = [
             'ffmpeg',
             '-y',
-            '-f', 'rawvideo',
-            '-vcodec', 'rawvideo',
-            '-s', f'{canvas_w}x{canvas_h}',
-            '-pix_fmt', 'bgra',
-            '-r', str(fps),
+            '-nostats',
+            '-progress', 'pipe:1',
+            '-f', 'nut',
             '-i', '-',
-        ]
+        ] + (['-fps_mode', 'passthrough'] if vfr else ['-vf', f'fps={fps}']) \
+            + get_profile(profile_name)["args"] + [output_path]
 
-        if use_gpu:
-            # === GPU 模式 (NVIDIA HEVC) ===
-            print("正在尝试使用 NVIDIA GPU 编码 (HEVC)...")
-            encoder_flags = [
-                '-c:v', 'hevc_nvenc',
-                '-pix_fmt', 'yuva444p',
-                '-preset', 'p7',
-                '-tune', 'hq',
-                '-rc', 'vbr',
-                '-b:v', '20M',
-                output_path
-            ]
-        else:
-            # === CPU 模式 (Apple ProRes 4444) ===
-            print("正在使用 CPU 编码 (ProRes 4444)...")
-            encoder_flags = [
-                '-c:v', 'prores_ks',
-                '-profile:v', '4',
-                '-pix_fmt', 'yuva444p10le',
-                '-vendor', 'apl0',
-                output_path
-            ]
-
-        command = common_input_flags + encoder_flags
-
-        # 打开管道
         startupinfo = None
         if os.name == 'nt':
             startupinfo = subprocess.STARTUPINFO()
             startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
 
-        pipe = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=startupinfo)
+        self.pipe = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                     startupinfo=startupinfo)
 
-        # 6. 逐帧渲染
-        start_x = (canvas_w - img_w) / 2.0
-        start_y = (canvas_h - img_h) / 2.0
+        self._muxer = None
+        self._size = size
+        self._rate = fps
+        self._pts = -1
+        self._last_bytes = b""
+        self._last_pts = -1
+        self._stderr_chunks = []
+        self._readers = [
+            threading.Thread(target=self._read_progress, daemon=True),
+            threading.Thread(target=self._read_stderr, daemon=True),
+        ]
+        for t in self._readers:
+            t.start()
 
-        for i in range(total_frames):
-            curr_x = int(start_x + dx_per_frame * i)
-            curr_y = int(start_y + dy_per_frame * i)
+    def _read_progress(self):
+        """解析 FFmpeg progress 输出：每组键值以 progress=continue/end 结尾"""
+        block = {}
+        for raw in self.pipe.stdout:
+            key, sep, value = raw.decode('utf-8', errors='ignore').strip().partition("=")
+            if not sep:
+                continue
+            block[key] = value.strip()
+            if key == "progress":
+                if self.vfr and "out_time_us" in block:
+                    # 可变帧率输出的编码帧数少于总帧数，按已编码的时长折算进度
+                    try:
+                        block["frame"] = str(round(int(block["out_time_us"]) * self.fps / 1e6))
+                    except ValueError:
+                        pass
+                if self.telemetry:
+                    self.telemetry.update_ffmpeg(block)
+                block = {}
 
-            # 创建透明画布 (BGRA)
-            canvas = np.zeros((canvas_h, canvas_w, 4), dtype=np.uint8)
+    def _read_stderr(self):
+        for raw in self.pipe.stderr:
+            self._stderr_chunks.append(raw)
 
-            # 计算 ROI
-            x1_c, y1_c = max(0, curr_x), max(0, curr_y)
-            x2_c, y2_c = min(canvas_w, curr_x + img_w), min(canvas_h, curr_y + img_h)
-            x1_i, y1_i = max(0, -curr_x), max(0, -curr_y)
+    def _stderr_text(self):
+        for t in self._readers:
+            t.join(timeout=5)
+        return b"".join(self._stderr_chunks).decode('utf-8', errors='ignore')
 
-            w_slice = x2_c - x1_c
-            h_slice = y2_c - y1_c
+    def write(self, frame):
+        self._pts += 1
+        self._write_bytes(frame.tobytes())
 
-            if w_slice > 0 and h_slice > 0:
-                canvas[y1_c:y2_c, x1_c:x2_c] = img[y1_i:y1_i + h_slice, x1_i:x1_i + w_slice]
+    def write_repeat(self):
+        """重复上一帧：只推进帧序号，不经过管道 (下一帧的 PTS 隐含了上一帧的时长)"""
+        self._pts += 1
 
-            # 写入管道
-            try:
-                pipe.stdin.write(canvas.tobytes())
-            except Exception as e:
-                # 发生写入错误时，立即读取 stderr 查明原因
-                _, stderr = pipe.communicate()
-                err_msg = stderr.decode('utf-8', errors='ignore')
-                if "hevc_nvenc" in err_msg:
-                    raise RuntimeError(f"GPU 编码失败：未检测到支持的 NVIDIA 显卡。\n\n详细错误: {err_msg}")
-                else:
-                    raise RuntimeError(f"FFmpeg 写入错误: {err_msg}")
-
-            # 进度
-            if i % 10 == 0:
-                prog = (i + 1) / total_frames * 100
-                progress_callback(prog)
+    def _write_bytes(self, data):
+        self._last_bytes = data
+        self._last_pts = self._pts
+        try:
+            with tracing.span("b0.ffmpeg_stdin", "b0", bytes=len(data)):
+                if self._muxer is None:
+                    self._muxer = nutpipe.NUTPipeMuxer(self.pipe.stdin, self._size, self._rate)
+                self._muxer.write_frame(self._pts, data)
+        except Exception:
+            # 发生写入错误时，等待进程退出并读取 stderr 查明原因
+            self.pipe.wait()
+            err_msg = self._stderr_text()
+            if "hevc_nvenc" in err_msg:
+                raise RuntimeError(f"GPU 编码失败：未检测到支持的 NVIDIA 显卡。\n\n详细错误: {err_msg}")
+            else:
+                raise RuntimeError(f"FFmpeg 写入错误: {err_msg}")
 
-        # === 关键修复点：防止 99% 卡死 ===
+    def close(self):
+        # 结尾是重复帧时，在最后一个帧序号上补发一次上一帧，标出视频的结束时间
+        if self._pts > self._last_pts >= 0:
+            self._write_bytes(self._last_bytes)
 
+        # === 关键修复点：防止 99% 卡死 ===
         # 1. 先关闭输入流，告诉 FFmpeg 数据发完了
-        pipe.stdin.close()
+        self.pipe.stdin.close()
 
-        # 2. 使用 communicate() 代替 wait()
-        # 这会读取并清空 stderr 缓冲区，防止死锁
-        _, stderr = pipe.communicate()
+        # 2. stdout/stderr 由后台线程持续读取，这里只需等待进程退出
+        self.pipe.wait()
+        err_msg = self._stderr_text()
 
         # 3. 检查返回值
-        if pipe.returncode != 0:
-            err_msg = stderr.decode('utf-8', errors='ignore')
-            raise RuntimeError(f"FFmpeg 异常退出 (Code {pipe.returncode}):\n{err_msg}")
+        if self.pipe.returncode != 0:
+            raise RuntimeError(f"FFmpeg 异常退出 (Code {self.pipe.returncode}):\n{err_msg}")
+
+    def abort(self):
+        """中止编码：先关闭输入并请求 FFmpeg 退出，超时后再强制结束"""
+        try:
+            self.pipe.stdin.close()
+        except:
+            pass
+        try:
+            self.pipe.terminate()
+            self.pipe.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.pipe.kill()
+            self.pipe.wait()
+        except:
+            pass
+        try:
+            os.remove(self.output_path)
+        except OSError:
+            pass
+
+
+class _ImageSequenceWriter:
+    """
+    逐帧图片输出 (PNG / QOI)，不依赖 FFmpeg。
+    编码在线程池中并行执行 (cv2.imencode 与 NumPy 运算都会释放 GIL)，
+    在途帧数量有上限，避免 4K 帧堆积占满内存。
+    vfr=True 时重复帧不再落盘，而是延长上一帧的时长，结束时写出带显式时长的 frames.ffconcat。
+    """
+
+    def __init__(self, output_dir, size, fps, profile_name, telemetry=None, workers=None, vfr=False):
+        self.output_path = output_dir
+        self.ext = get_profile(profile_name)["ext"]
+        self.telemetry = telemetry
+        self.frame_duration = 1 / Fraction(str(fps))
+        self.vfr = vfr
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.workers = workers or os.cpu_count() or 4
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.pending = deque()
+        self.index = 0
+        self.last_path = None
+        self.last_future = None
+        self.timeline = []  # [文件名, 持续帧数]
+
+    def _encode_to_file(self, frame, path):
+        if self.ext == ".qoi":
+            data = qoi.encode_qoi(frame)
+        else:
+            data = imgio.encode_image(frame, ".png", [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        with open(path, 'wb') as f:
+            f.write(data)
+        if self.telemetry:
+            self.telemetry.frame_encoded()
+
+    def _link_previous(self, prev_future, prev_path, path):
+        # 线程池按提交顺序取任务，被等待的上一帧一定已在执行或已完成，不会死锁
+        prev_future.result()
+        try:
+            os.link(prev_path, path)
+        except OSError:
+            shutil.copyfile(prev_path, path)
+        if self.telemetry:
+            self.telemetry.frame_encoded()
+
+    def _submit(self, fn, *args):
+        fut = self.pool.submit(fn, *args)
+        self.pending.append(fut)
+        while len(self.pending) > self.workers * 2:
+            self.pending.popleft().result()
+        return fut
+
+    def _next_path(self):
+        name = f"frame_{self.index:06d}{self.ext}"
+        self.index += 1
+        return name, os.path.join(self.output_path, name)
+
+    def write(self, frame):
+        name, path = self._next_path()
+        self.last_future = self._submit(self._encode_to_file, frame, path)
+        self.last_path = path
+        self.timeline.append([name, 1])
+
+    def write_repeat(self):
+        """重复上一帧：VFR 模式下只延长时长，否则硬链接 (或复制) 上一帧文件"""
+        if self.vfr:
+            self.index += 1
+            self.timeline[-1][1] += 1
+            if self.telemetry:
+                self.telemetry.frame_encoded()
+            return
+        _, path = self._next_path()
+        self.last_future = self._submit(self._link_previous, self.last_future, self.last_path, path)
+        self.last_path = path
+
+    def _write_ffconcat(self):
+        lines = ["ffconcat version 1.0"]
+        for name, count in self.timeline:
+            lines.append(f"file '{name}'")
+            lines.append(f"duration {float(self.frame_duration * count):.6f}")
+        if self.timeline:
+            # concat 分离器会忽略最后一条的时长，按惯例重复最后一帧
+            lines.append(f"file '{self.timeline[-1][0]}'")
+        with open(os.path.join(self.output_path, "frames.ffconcat"), 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+    def close(self):
+        try:
+            while self.pending:
+                self.pending.popleft().result()
+        finally:
+            self.pool.shutdown(wait=True)
+        if self.vfr:
+            self._write_ffconcat()
+
+    def abort(self):
+        for fut in self.pending:
+            fut.cancel()
+        self.pending.clear()
+        self.pool.shutdown(wait=False)
+
+
+class _NullWriter:
+    """丢弃帧的写入器：只统计帧数与字节数，不产生任何文件"""
+
+    def __init__(self, output_path, telemetry=None):
+        self.output_path = output_path
+        self.telemetry = telemetry
+        self.bytes_written = 0
+
+    def write(self, frame):
+        self.bytes_written += frame.nbytes
+        if self.telemetry:
+            self.telemetry.frame_encoded()
+
+    def write_repeat(self):
+        if self.telemetry:
+            self.telemetry.frame_encoded()
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+def _open_writer(output_path, size, fps, profile_name, telemetry=None, vfr=False):
+    """按编码配置创建对应的帧写入器"""
+    profile = get_profile(profile_name)
+    if profile["kind"] == "null":
+        return _NullWriter(output_path, telemetry)
+    if profile["kind"] == "sequence":
+        return _ImageSequenceWriter(output_path, size, fps, profile_name, telemetry, vfr=vfr)
+    if profile["kind"] == "animated":
+        if profile["format"] == "gif":
+            return anim_writers.GIFWriter(output_path, size, fps, dither=profile.get("dither", False),
+                                          telemetry=telemetry)
+        return anim_writers.APNGWriter(output_path, size, fps, telemetry=telemetry)
+    return _FFmpegWriter(output_path, size, fps, profile_name, telemetry, vfr=vfr)
+
+
+# ===========================
+# 核心渲染逻辑
+# ===========================
+def _compose_frame(img, canvas_w, canvas_h, curr_x, curr_y):
+    """在透明画布 (BGRA) 上按整数坐标放置图片"""
+    img_h, img_w = img.shape[:2]
+    canvas = np.zeros((canvas_h, canvas_w, 4), dtype=np.uint8)
+
+    # 计算 ROI
+    x1_c, y1_c = max(0, curr_x), max(0, curr_y)
+    x2_c, y2_c = min(canvas_w, curr_x + img_w), min(canvas_h, curr_y + img_h)
+    x1_i, y1_i = max(0, -curr_x), max(0, -curr_y)
+
+    w_slice = x2_c - x1_c
+    h_slice = y2_c - y1_c
+
+    if w_slice > 0 and h_slice > 0:
+        canvas[y1_c:y2_c, x1_c:x2_c] = img[y1_i:y1_i + h_slice, x1_i:x1_i + w_slice]
+    return canvas
+
+
+def _compose_blur_frame(img, canvas_w, canvas_h, sub_xs, sub_ys):
+    """
+    时间超采样运动模糊：把 K 个子帧位置的图片做预乘 Alpha 平均。
+    累加缓冲只覆盖这些子帧的扫掠包围盒，开销随扫掠面积增长，与画布大小无关。
+    """
+    img_h, img_w = img.shape[:2]
+    samples = len(sub_xs)
+    canvas = np.zeros((canvas_h, canvas_w, 4), dtype=np.uint8)
+
+    # 扫掠包围盒 (裁到画布内)
+    bx1, by1 = max(0, int(sub_xs.min())), max(0, int(sub_ys.min()))
+    bx2 = min(canvas_w, int(sub_xs.max()) + img_w)
+    by2 = min(canvas_h, int(sub_ys.max()) + img_h)
+    if bx2 <= bx1 or by2 <= by1:
+        return canvas
+
+    acc = np.zeros((by2 - by1, bx2 - bx1, 4), dtype=np.float32)
+    for x, y in zip(sub_xs.tolist(), sub_ys.tolist()):
+        x1_c, y1_c = max(bx1, x), max(by1, y)
+        x2_c, y2_c = min(bx2, x + img_w), min(by2, y + img_h)
+        if x2_c <= x1_c or y2_c <= y1_c:
+            continue
+        src = img[y1_c - y:y2_c - y, x1_c - x:x2_c - x]
+        alpha = src[:, :, 3:4].astype(np.float32)
+        region = acc[y1_c - by1:y2_c - by1, x1_c - bx1:x2_c - bx1]
+        region[:, :, :3] += src[:, :, :3] * alpha
+        region[:, :, 3:4] += alpha
+
+    sum_a = acc[:, :, 3:4]
+    color = np.divide(acc[:, :, :3], sum_a, out=np.zeros_like(acc[:, :, :3]), where=sum_a > 0)
+    out = canvas[by1:by2, bx1:bx2]
+    out[:, :, :3] = np.rint(color)
+    out[:, :, 3:4] = np.rint(sum_a / samples)
+    return canvas
+
+
+def _compose_index(img, canvas_w, canvas_h, xs, ys, i):
+    """合成第 i 帧：坐标为二维数组 (帧, 子帧) 时走运动模糊路径"""
+    if xs.ndim == 2:
+        return _compose_blur_frame(img, canvas_w, canvas_h, xs[i], ys[i])
+    return _compose_frame(img, canvas_w, canvas_h, int(xs[i]), int(ys[i]))
+
+
+def _duplicate_mask(xs, ys, frame_ids):
+    """
+    根据整数坐标判断哪些输出帧与上一输出帧完全相同。
+    speed / fps 小于 1 像素/帧时，int() 截断会产生大段相同坐标。
+    """
+    sel = np.asarray(frame_ids, dtype=np.int64)
+    px, py = xs[sel], ys[sel]
+    same = (px[1:] == px[:-1]) & (py[1:] == py[:-1])
+    if same.ndim == 2:
+        same = same.all(axis=1)
+    return np.concatenate(([False], same))
+
+
+def compute_motion(canvas_size, img_size, fps, angle, distance, speed, samples=1, shutter=1.0):
+    """
+    计算每一帧图片左上角的整数坐标 (全分辨率画布坐标系)。
+    正式渲染与预览共用这一份运动计算，保证预览所见即所得。
+    samples > 1 时返回 (帧数, samples) 的子帧坐标，子帧均匀分布在
+    [i, i + shutter) 帧区间内；第 0 个子帧与不开模糊时的位置完全相同。
+    """
+    canvas_w, canvas_h = canvas_size
+    img_w, img_h = img_size
+
+    total_frames = fpscalc.total_frames(distance, speed, fps)
+    dx_per_frame, dy_per_frame = fpscalc.frame_displacement(speed, angle, fps)
+
+    start_x = (canvas_w - img_w) / 2.0
+    start_y = (canvas_h - img_h) / 2.0
+
+    # astype(int) 与 int() 一样向零截断
+    i = np.arange(total_frames, dtype=np.float64)
+    if samples > 1:
+        i = i[:, None] + np.arange(samples, dtype=np.float64)[None, :] * (shutter / samples)
+    xs = (start_x + dx_per_frame * i).astype(np.int64)
+    ys = (start_y + dy_per_frame * i).astype(np.int64)
+    return xs, ys
+
+
+def _scale_plan(img, canvas_size, xs, ys, scale):
+    """把全分辨率的画布/图片/坐标按比例缩小，用于预览"""
+    canvas_w, canvas_h = canvas_size
+    if scale == 1.0:
+        return img, canvas_w, canvas_h, xs, ys
+
+    # 多数编码器要求偶数宽高
+    canvas_w = max(2, int(round(canvas_w * scale)) // 2 * 2)
+    canvas_h = max(2, int(round(canvas_h * scale)) // 2 * 2)
+    img_h, img_w = img.shape[:2]
+    img = cv2.resize(img, (max(1, int(round(img_w * scale))), max(1, int(round(img_h * scale)))),
+                     interpolation=cv2.INTER_AREA)
+    xs = np.rint(xs * scale).astype(np.int64)
+    ys = np.rint(ys * scale).astype(np.int64)
+    return img, canvas_w, canvas_h, xs, ys
+
+
+def render_video(img_path, output_path, resolution, fps, angle, distance, speed, profile=DEFAULT_PROFILE,
+                 progress_callback=None, preview_scale=1.0, frame_step=1, telemetry=None, source=None,
+                 mmap_cache=False, motion_blur=0, vfr=False, cancel_token=None, segment_frames=0):
+    """
+    渲染平移动画并返回最终输出路径 (视频文件或序列文件夹)。
+    不涉及任何 UI，出错时直接抛出异常；被 cancel_token 取消时抛出 RenderCancelled。
+    preview_scale / frame_step 用于预览：缩小画布与图片，并每隔 frame_step 帧取一帧。
+    telemetry 为 RenderTelemetry，省略时内部新建一个 (仅驱动 progress_callback)。
+    source 为已解码的 BGRA 图片，批量队列中多个任务共用同一张源图时传入，避免重复解码。
+    mmap_cache=True 时源图经 source_cache 解码为原始 BGRA 缓存文件并内存映射，适合远大于画布的全景图。
+    motion_blur 为每帧子帧数 K (0/1 关闭)，开启后按扫掠区域做时间超采样模糊。
+    与上一帧坐标完全相同的帧不再重新合成：FFmpeg 输出只推进 PTS、不经过管道 (vfr=True 时输出可变帧率)，
+    序列输出在 vfr=True 时只延长上一帧时长 (frames.ffconcat)，否则硬链接上一帧文件。
+    跳过的帧数记录在 telemetry.frames_skipped。
+    segment_frames > 0 (仅 supports_segments 的 FFmpeg 配置) 时按固定帧数分段编码并记录检查点，
+    中断后用相同参数再次调用会从最后一个完成的分段继续，最后无损拼接为完整文件。
+    """
+    get_profile(profile)
+    output_path = resolve_output_path(output_path, profile)
+    telemetry = telemetry or RenderTelemetry()
+
+    with telemetry.stage("decode"):
+        if source is not None:
+            img = source
+        elif mmap_cache:
+            img = source_cache.load_source_mmap(img_path)
+        else:
+            img = imgio.read_bgra(img_path)
+    img_h, img_w = img.shape[:2]
+
+    xs, ys = compute_motion(resolution, (img_w, img_h), fps, angle, distance, speed, samples=max(1, motion_blur))
+    img, canvas_w, canvas_h, xs, ys = _scale_plan(img, resolution, xs, ys, preview_scale)
+
+    frame_ids = list(range(0, len(xs), frame_step))
+    out_fps = fps if frame_step == 1 else f"{fps}/{frame_step}"
+    duplicates = _duplicate_mask(xs, ys, frame_ids)
+    telemetry.begin(len(frame_ids))
+
+    plan = (img, canvas_w, canvas_h, xs, ys)
+    try:
+        if segment_frames > 0 and supports_segments(profile):
+            key = _checkpoint_key(img_path, output_path, resolution, fps, angle, distance, speed, profile,
+                                  preview_scale, frame_step, motion_blur, segment_frames)
+            _render_segmented(plan, frame_ids, duplicates, output_path, out_fps, profile, telemetry, key,
+                              segment_frames, progress_callback, cancel_token)
+        else:
+            writer = _open_writer(output_path, (canvas_w, canvas_h), out_fps, profile, telemetry, vfr=vfr)
+            _write_frames(writer, plan, frame_ids, duplicates, telemetry, progress_callback, cancel_token)
+    except RenderCancelled:
+        telemetry.finish(cancelled=True)
+        raise
+    except Exception as e:
+        telemetry.finish(str(e))
+        raise
 
-        # 强制进度条走完
+    telemetry.finish()
+    if progress_callback:
         progress_callback(100)
-        done_callback(None, output_path)
+    return output_path
+
+
+def _prime_palette(writer, plan, frame_ids, duplicates, telemetry, samples=16):
+    """GIF 使用全局调色板：先均匀抽取若干不重复的帧合成，交给 writer 统计颜色"""
+    img, canvas_w, canvas_h, xs, ys = plan
+    distinct = [i for n, i in enumerate(frame_ids) if n == 0 or not duplicates[n]]
+    picks = np.unique(np.linspace(0, len(distinct) - 1, min(samples, len(distinct))).astype(np.int64))
+    with telemetry.stage("compose"):
+        frames = [_compose_index(img, canvas_w, canvas_h, xs, ys, distinct[k]) for k in picks]
+    writer.prime(frames)
+
+
+def _write_frames(writer, plan, frame_ids, duplicates, telemetry, progress_callback, cancel_token):
+    """把一段帧写入 writer 并关闭；出错或取消时中止 writer"""
+    img, canvas_w, canvas_h, xs, ys = plan
+    try:
+        if hasattr(writer, "prime"):
+            _prime_palette(writer, plan, frame_ids, duplicates, telemetry)
+
+        # 逐帧渲染
+        for n, i in enumerate(frame_ids):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+
+            if duplicates[n] and n > 0:
+                with telemetry.stage("pipe_write"):
+                    writer.write_repeat()
+                telemetry.frame_skipped()
+            else:
+                with telemetry.stage("compose"):
+                    frame = _compose_index(img, canvas_w, canvas_h, xs, ys, i)
+                with telemetry.stage("pipe_write"):
+                    writer.write(frame)
+
+            # 进度 (按时间间隔推送，而不是按帧数)
+            if telemetry.frame_done() and progress_callback:
+                progress_callback(telemetry.percent)
+
+        with telemetry.stage("encoder_wait"):
+            writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+
+# ===========================
+# 取消 & 分段续渲
+# ===========================
+class RenderCancelled(Exception):
+    """渲染被用户取消"""
+
+
+class CancelToken:
+    """线程安全的取消标记，由 UI / 批处理持有，渲染循环每帧检查一次"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise RenderCancelled("渲染已取消")
+
+
+def _checkpoint_key(img_path, output_path, *params):
+    """源文件 + 渲染参数的指纹；任一变化都不能沿用旧分段"""
+    st = os.stat(img_path)
+    raw = json.dumps([os.path.abspath(img_path), st.st_size, st.st_mtime_ns, os.path.abspath(output_path),
+                      [list(p) if isinstance(p, tuple) else p for p in params]])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _segment_dir(output_path):
+    return output_path + ".segments"
+
+
+def _load_checkpoint(seg_dir, key):
+    try:
+        with open(os.path.join(seg_dir, "checkpoint.json"), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    if data.get("key") != key:
+        return set()
+    return {i for i in data.get("completed", [])
+            if os.path.exists(os.path.join(seg_dir, _segment_name(i, data.get("ext", ""))))}
+
+
+def _save_checkpoint(seg_dir, key, completed, ext):
+    tmp = os.path.join(seg_dir, "checkpoint.json.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({"key": key, "ext": ext, "completed": sorted(completed)}, f)
+    os.replace(tmp, os.path.join(seg_dir, "checkpoint.json"))
+
+
+def _segment_name(index, ext):
+    return f"seg_{index:05d}{ext}"
+
+
+def _render_segmented(plan, frame_ids, duplicates, output_path, out_fps, profile, telemetry, key,
+                      segment_frames, progress_callback, cancel_token):
+    """
+    分段渲染：每 segment_frames 帧一个独立的 FFmpeg 进程/文件，完成一段写一次检查点。
+    全部完成后用 concat 分离器 (-c copy) 拼接，再删除分段目录。
+    """
+    _, canvas_w, canvas_h, _, _ = plan
+    ext = get_profile(profile)["ext"]
+    seg_dir = _segment_dir(output_path)
+    os.makedirs(seg_dir, exist_ok=True)
+
+    completed = _load_checkpoint(seg_dir, key)
+    if not completed:
+        # 参数已变化或首次渲染：清掉残留分段
+        for entry in os.scandir(seg_dir):
+            os.remove(entry.path)
+
+    total = len(frame_ids)
+    seg_count = (total + segment_frames - 1) // segment_frames
+    for seg in range(seg_count):
+        lo = seg * segment_frames
+        hi = min(total, lo + segment_frames)
+        if seg in completed:
+            telemetry.resume_frames(hi - lo)
+            continue
+
+        seg_path = os.path.join(seg_dir, _segment_name(seg, ext))
+        writer = _open_writer(seg_path, (canvas_w, canvas_h), out_fps, profile, telemetry)
+        telemetry.encoded_offset = lo
+        _write_frames(writer, plan, frame_ids[lo:hi], duplicates[lo:hi], telemetry, progress_callback, cancel_token)
+
+        completed.add(seg)
+        _save_checkpoint(seg_dir, key, completed, ext)
+
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    with telemetry.stage("encoder_wait"):
+        _concat_segments(seg_dir, [_segment_name(i, ext) for i in range(seg_count)], output_path)
+    shutil.rmtree(seg_dir, ignore_errors=True)
+
+
+def _concat_segments(seg_dir, names, output_path):
+    list_path = os.path.join(seg_dir, "concat.txt")
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for name in names:
+            f.write(f"file '{name}'\n")
+    command = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path,
+               '-c', 'copy', output_path]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"分段拼接失败 (Code {result.returncode}):\n"
+                           f"{result.stderr.decode('utf-8', errors='ignore')}")
+
+
+# ===========================
+# 快速预览 & 接触表
+# ===========================
+PREVIEW_SCALE = 0.25
+PREVIEW_FRAME_STEP = 4
+PREVIEW_PROFILE = "preview_png"
+
+
+def preview_output_path(output_path, suffix):
+    """根据正式输出路径生成预览/接触表的旁路路径"""
+    return os.path.splitext(output_path)[0] + suffix
+
 
+def render_preview(img_path, output_path, resolution, fps, angle, distance, speed, progress_callback=None,
+                   scale=PREVIEW_SCALE, frame_step=PREVIEW_FRAME_STEP, profile=PREVIEW_PROFILE, telemetry=None,
+                   motion_blur=0, cancel_token=None):
+    """低分辨率、抽帧、快速帧内编码的预览渲染"""
+    return render_video(img_path, output_path, resolution, fps, angle, distance, speed, profile,
+                        progress_callback, preview_scale=scale, frame_step=frame_step, telemetry=telemetry,
+                        motion_blur=motion_blur, cancel_token=cancel_token)
+
+
+def write_contact_sheet(img_path, output_png, resolution, fps, angle, distance, speed, count=12, cols=4,
+                        scale=PREVIEW_SCALE, motion_blur=0):
+    """
+    在整段动画中均匀抽取 count 帧，拼成一张 PNG 接触表。
+    透明区域用棋盘格显示，左上角标注帧号。
+    """
+    img = imgio.read_bgra(img_path)
+    img_h, img_w = img.shape[:2]
+    xs, ys = compute_motion(resolution, (img_w, img_h), fps, angle, distance, speed, samples=max(1, motion_blur))
+    img, cell_w, cell_h, xs, ys = _scale_plan(img, resolution, xs, ys, scale)
+
+    count = max(1, min(count, len(xs)))
+    picks = np.unique(np.linspace(0, len(xs) - 1, count).round().astype(np.int64))
+    cols = max(1, min(cols, len(picks)))
+    rows = (len(picks) + cols - 1) // cols
+    gap = 4
+
+    # 棋盘格背景
+    yy, xx = np.mgrid[0:cell_h, 0:cell_w]
+    checker = np.where(((yy // 16 + xx // 16) % 2)[..., None] == 0, 200, 150).astype(np.float32)
+
+    sheet = np.full((rows * (cell_h + gap) + gap, cols * (cell_w + gap) + gap, 3), 64, dtype=np.uint8)
+    for n, i in enumerate(picks):
+        frame = _compose_index(img, cell_w, cell_h, xs, ys, i)
+        alpha = frame[:, :, 3:4].astype(np.float32) / 255.0
+        cell = (frame[:, :, :3] * alpha + checker * (1.0 - alpha)).astype(np.uint8)
+        cv2.putText(cell, f"#{i}", (6, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1, cv2.LINE_AA)
+
+        r, c = divmod(n, cols)
+        y0 = gap + r * (cell_h + gap)
+        x0 = gap + c * (cell_w + gap)
+        sheet[y0:y0 + cell_h, x0:x0 + cell_w] = cell
+
+    return imgio.write_image(output_png, sheet)
+
+
+SEGMENT_SECONDS = 10
+
+
+def _render_video_thread(task, progress_callback, done_callback):
+    """后台线程入口：task(progress_callback) 返回输出路径"""
+    try:
+        final_path = task(progress_callback)
+        done_callback(None, final_path)
+    except RenderCancelled:
+        done_callback(None, None)
     except Exception as e:
-        if pipe:
-            try:
-                pipe.kill()
-            except:
-                pass
         done_callback(str(e), None)
 
 
@@ -172,11 +1009,10 @@ def _render_video_thread(img_path, output_path, resolution, fps, angle, distance
 # ===========================
 def show_ui(parent):
     top = tk.Toplevel(parent)
-    top.title("透明MOV生成器 (ProRes/GPU)")
-    top.geometry("550x750")
+    top.title("透明动画生成器 (ProRes/WebM/序列)")
+    top.geometry("550x980")
 
     top.transient(parent)
-    top.grab_set()
 
     top.update_idletasks()
     x = (top.winfo_screenwidth() - top.winfo_width()) // 2
@@ -190,7 +1026,7 @@ def show_ui(parent):
     if has_ffmpeg:
         status_bg, status_fg, status_txt = "#4CAF50", "white", "环境正常: 已检测到 FFmpeg"
     else:
-        status_bg, status_fg, status_txt = "#FF5722", "white", "环境错误: 未检测到 ffmpeg.exe！"
+        status_bg, status_fg, status_txt = "#FF5722", "white", "未检测到 ffmpeg.exe！仅可使用 PNG/QOI 序列与 APNG/GIF 输出"
 
     tk.Label(top, text=status_txt, bg=status_bg, fg=status_fg, font=("Arial", 10, "bold")).pack(fill="x")
 
@@ -205,12 +1041,13 @@ def show_ui(parent):
                                                                                                               "*.png")])))).pack(
         anchor="e", padx=10)
 
-    tk.Label(top, text="输出视频路径 (.mov):").pack(anchor="w", **pad_opts)
+    tk.Label(top, text="输出路径 (视频文件 / 序列文件夹):").pack(anchor="w", **pad_opts)
     entry_out = tk.Entry(top)
     entry_out.pack(fill="x", padx=10)
 
     def sel_out():
-        path = filedialog.asksaveasfilename(defaultextension=".mov", filetypes=[("Video", "*.mov")], parent=top)
+        ext = get_profile(profile_keys[cb_profile.current()])["ext"]
+        path = filedialog.asksaveasfilename(defaultextension=ext, filetypes=[("Output", f"*{ext}")], parent=top)
         if path:
             entry_out.delete(0, tk.END)
             entry_out.insert(0, path)
@@ -233,11 +1070,37 @@ def show_ui(parent):
     tk.Radiobutton(frame_param, text="60 FPS", variable=var_fps, value=60).grid(row=1, column=1, sticky="w")
     tk.Radiobutton(frame_param, text="120 FPS", variable=var_fps, value=120).grid(row=1, column=2, sticky="w")
 
-    # === GPU 加速选项 ===
+    # === 编码配置 ===
     tk.Label(frame_param, text="编码模式:").grid(row=2, column=0, sticky="w", pady=5)
-    var_gpu = tk.BooleanVar(value=False)
-    chk_gpu = tk.Checkbutton(frame_param, text="尝试使用 NVIDIA 显卡加速 (HEVC)", variable=var_gpu, fg="#E91E63")
-    chk_gpu.grid(row=2, column=1, columnspan=2, sticky="w")
+    profile_keys = [k for k, p in ENCODER_PROFILES.items() if not p.get("hidden")]
+    cb_profile = ttk.Combobox(frame_param, values=[ENCODER_PROFILES[k]["label"] for k in profile_keys],
+                              state="readonly", width=28)
+    cb_profile.current(profile_keys.index(DEFAULT_PROFILE))
+    cb_profile.grid(row=2, column=1, columnspan=2, sticky="w")
+
+    var_log = tk.BooleanVar(value=False)
+    tk.Checkbutton(frame_param, text="记录遥测日志 (输出旁 .telemetry.jsonl)", variable=var_log).grid(
+        row=3, column=1, columnspan=2, sticky="w")
+
+    var_mmap = tk.BooleanVar(value=False)
+    tk.Checkbutton(frame_param, text="大图内存映射缓存 (全景平移)", variable=var_mmap).grid(
+        row=4, column=1, columnspan=2, sticky="w")
+
+    var_vfr = tk.BooleanVar(value=False)
+    tk.Checkbutton(frame_param, text="省略重复帧 (可变帧率输出)", variable=var_vfr).grid(
+        row=5, column=1, columnspan=2, sticky="w")
+
+    var_segment = tk.BooleanVar(value=False)
+    chk_segment = tk.Checkbutton(frame_param, text=f"分段渲染 (每 {SEGMENT_SECONDS} 秒一段，中断后可续渲)",
+                                 variable=var_segment)
+    chk_segment.grid(row=6, column=1, columnspan=2, sticky="w")
+
+    def on_profile_selected(event=None):
+        segmentable = supports_segments(profile_keys[cb_profile.current()])
+        chk_segment.config(state="normal" if segmentable else "disabled")
+
+    cb_profile.bind("<<ComboboxSelected>>", on_profile_selected, add="+")
+    on_profile_selected()
 
     tk.Frame(top, height=2, bd=1, relief="sunken").pack(fill="x", padx=10, pady=10)
 
@@ -261,9 +1124,15 @@ def show_ui(parent):
     entry_speed.insert(0, "100");
     entry_speed.grid(row=2, column=1, sticky="w")
 
+    tk.Label(frame_move, text="运动模糊子帧数:").grid(row=3, column=0, sticky="w", pady=5)
+    entry_blur = tk.Entry(frame_move, width=10);
+    entry_blur.insert(0, "0");
+    entry_blur.grid(row=3, column=1, sticky="w")
+    tk.Label(frame_move, text="(0=关闭, 建议 4~16)", fg="gray").grid(row=3, column=2, sticky="w", padx=5)
+
     # === 说明 ===
     tk.Label(top,
-             text="说明：\n1. CPU模式: ProRes 4444 (兼容性最佳)。\n2. 显卡模式: HEVC (速度快，需N卡)。\n3. 如果卡在99%，请耐心等待文件封包完成。",
+             text="说明：\n1. ProRes 4444: 兼容性最佳；QTRLE/FFV1: 无损。\n2. HEVC (NVIDIA): 速度快，需N卡。\n3. PNG/QOI 序列: 无需 FFmpeg，输出到同名文件夹。\n4. 如果卡在99%，请耐心等待文件封包完成。",
              fg="#2196F3", bg="#E3F2FD", justify="left", bd=1, relief="groove").pack(fill="x", padx=10, pady=10,
                                                                                      ipady=5)
 
@@ -274,7 +1143,23 @@ def show_ui(parent):
     lbl_status.pack()
 
     # === 执行按钮 ===
-    def run():
+    # 渲染不走 jobs 任务管理器：单次渲染可持续数十分钟并独占一个 FFmpeg 进程，放进共用的两线程池会挡住
+    # 其他工具的批处理；取消需要经 CancelToken 终止 FFmpeg，批量队列由 render_queue 自行控制并发。
+    # 当前渲染线程与取消标记。窗口被销毁 (包括直接关闭主窗口) 时取消渲染并短暂等待 FFmpeg 干净退出；
+    # 线程设为守护线程，即使没能及时结束也不会阻止进程退出
+    state = {"thread": None, "token": None, "closed": False}
+    CLOSE_JOIN_TIMEOUT = 5.0
+
+    def post(fn):
+        """从渲染线程回到界面线程；窗口已关闭时丢弃"""
+        if state["closed"]:
+            return
+        try:
+            top.after(0, fn)
+        except (tk.TclError, RuntimeError):
+            pass
+
+    def run(mode="final"):
         f_in = entry_in.get()
         f_out = entry_out.get()
         if not f_in or not f_out:
@@ -285,7 +1170,8 @@ def show_ui(parent):
             ang = float(entry_angle.get())
             dist = float(entry_dist.get())
             spd = float(entry_speed.get())
-            if spd <= 0: raise ValueError
+            blur = int(entry_blur.get() or 0)
+            if spd <= 0 or blur < 0: raise ValueError
         except:
             messagebox.showerror("错误", "参数输入有误", parent=top)
             return
@@ -293,39 +1179,177 @@ def show_ui(parent):
         res_map = {"1080p": (1920, 1080), "4k": (3840, 2160)}
         target_res = res_map[var_res.get()]
         target_fps = var_fps.get()
-        use_gpu_mode = var_gpu.get()
+        profile = profile_keys[cb_profile.current()]
+        motion = (f_in, target_res, target_fps, ang, dist, spd)
+        use_mmap = var_mmap.get()
+        use_vfr = var_vfr.get()
+        segment_frames = target_fps * SEGMENT_SECONDS if var_segment.get() and supports_segments(profile) else 0
+        token = CancelToken()
+
+        def on_telemetry(snap):
+            post(lambda: progress_bar.configure(value=snap["percent"]))
+            post(lambda: lbl_status.config(text=format_telemetry(snap)))
+
+        log_path = preview_output_path(f_out, ".telemetry.jsonl") if var_log.get() else None
+        telemetry = RenderTelemetry(callback=on_telemetry, log_path=log_path)
 
-        mode_text = "GPU加速 (HEVC)" if use_gpu_mode else "CPU (ProRes)"
-        btn_run.config(state="disabled", text=f"正在渲染 [{mode_text}]...")
+        if mode == "preview":
+            mode_text = f"预览 ({int(PREVIEW_SCALE * 100)}%, 每 {PREVIEW_FRAME_STEP} 帧取 1 帧)"
+            out_path = preview_output_path(f_out, "_preview.mov")
+            task = lambda cb: render_preview(f_in, out_path, *motion[1:], progress_callback=cb,
+                                             telemetry=telemetry, motion_blur=blur, cancel_token=token)
+        elif mode == "sheet":
+            mode_text = "接触表 PNG"
+            out_path = preview_output_path(f_out, "_contact.png")
+            task = lambda cb: write_contact_sheet(f_in, out_path, *motion[1:], motion_blur=blur)
+        else:
+            mode_text = ENCODER_PROFILES[profile]["label"]
+            task = lambda cb: render_video(f_in, f_out, *motion[1:], profile, cb, telemetry=telemetry,
+                                           mmap_cache=use_mmap, motion_blur=blur, vfr=use_vfr,
+                                           cancel_token=token, segment_frames=segment_frames)
+
+        for btn in action_buttons:
+            btn.config(state="disabled")
+        btn_cancel.config(state="normal")
+        btn_run.config(text=f"正在渲染 [{mode_text}]...")
         progress_bar['value'] = 0
-        lbl_status.config(text="初始化 FFmpeg...", fg="blue")
+        lbl_status.config(text="初始化编码器...", fg="blue")
 
         def update_prog(val):
-            top.after(0, lambda: progress_bar.configure(value=val))
-            top.after(0, lambda: lbl_status.config(text=f"渲染中: {val:.1f}%"))
+            post(lambda: progress_bar.configure(value=val))
 
         def on_done(error_msg, final_path):
-            top.after(0, lambda: _finish_ui(error_msg, final_path))
+            post(lambda: _finish_ui(error_msg, final_path))
 
         def _finish_ui(error_msg, final_path):
-            btn_run.config(state="normal", text="开始生成 MOV")
-            if error_msg:
+            for btn in action_buttons:
+                btn.config(state="normal")
+            btn_cancel.config(state="disabled")
+            btn_run.config(text="开始生成")
+            if token.cancelled:
+                lbl_status.config(text="已取消", fg="orange")
+                if segment_frames and mode == "final":
+                    messagebox.showinfo("已取消", "渲染已取消。\n已完成的分段会保留，使用相同参数再次生成即可续渲。",
+                                        parent=top)
+            elif error_msg:
                 lbl_status.config(text="失败", fg="red")
                 messagebox.showerror("渲染错误", error_msg, parent=top)
             else:
                 lbl_status.config(text="完成！", fg="green")
-                messagebox.showinfo("成功", f"视频生成成功！\n路径: {final_path}\n模式: {mode_text}", parent=top)
+                msg = f"生成成功！\n路径: {final_path}\n模式: {mode_text}"
+                if telemetry.frames_skipped:
+                    msg += f"\n跳过重复帧: {telemetry.frames_skipped}/{telemetry.total_frames}"
+                messagebox.showinfo("成功", msg, parent=top)
                 try:
                     os.startfile(final_path)
                 except:
                     pass
 
-        t = threading.Thread(target=_render_video_thread, args=(
-            f_in, f_out, target_res, target_fps, ang, dist, spd, use_gpu_mode, update_prog, on_done
-        ))
-        t.daemon = True
+        t = threading.Thread(target=_render_video_thread, args=(task, update_prog, on_done), daemon=True)
+        state["thread"], state["token"] = t, token
         t.start()
 
-    btn_run = tk.Button(top, text="开始生成 MOV", bg="#9C27B0", fg="white", font=("Arial", 12, "bold"),
+    frame_preview = tk.Frame(top)
+    frame_preview.pack(fill="x", padx=20)
+    btn_preview = tk.Button(frame_preview, text="快速预览", command=lambda: run("preview"))
+    btn_preview.pack(side="left", expand=True, fill="x", padx=(0, 5))
+    btn_sheet = tk.Button(frame_preview, text="生成接触表", command=lambda: run("sheet"))
+    btn_sheet.pack(side="left", expand=True, fill="x", padx=(5, 0))
+
+    btn_run = tk.Button(top, text="开始生成", bg="#9C27B0", fg="white", font=("Arial", 12, "bold"),
                         command=run)
-    btn_run.pack(pady=10, fill="x", padx=20)
\ No newline at end of file
+    btn_run.pack(pady=10, fill="x", padx=20)
+
+    # === 批量队列 ===
+    def run_batch():
+        manifest = filedialog.askopenfilename(parent=top, filetypes=[("Manifest", "*.json")])
+        if not manifest:
+            return
+        import render_queue
+
+        for btn in action_buttons:
+            btn.config(state="disabled")
+        btn_cancel.config(state="normal")
+        token = CancelToken()
+        progress_bar['value'] = 0
+        lbl_status.config(text="批量队列运行中...", fg="blue")
+        counter = {"finished": 0, "total": 0}
+
+        def on_event(event):
+            if event["event"] == "queued":
+                counter["total"] += 1
+            elif event["event"] in ("done", "failed"):
+                counter["finished"] += 1
+                val = counter["finished"] / max(1, counter["total"]) * 100
+                text = f"批量队列: {counter['finished']}/{counter['total']}"
+                post(lambda: progress_bar.configure(value=val))
+                post(lambda: lbl_status.config(text=text))
+
+        def task():
+            try:
+                results, _ = render_queue.run_manifest(manifest, on_event=on_event, cancel_token=token)
+                failed = [r for r in results if not r["ok"]]
+                msg = f"完成 {len(results) - len(failed)}/{len(results)} 个任务"
+                if failed:
+                    msg += "\n\n失败:\n" + "\n".join(f"{r['output']}: {r['error'][:80]}" for r in failed)
+                post(lambda: _finish_batch(None, msg))
+            except Exception as e:
+                post(lambda: _finish_batch(str(e), None))
+
+        def _finish_batch(error_msg, msg):
+            for btn in action_buttons:
+                btn.config(state="normal")
+            btn_cancel.config(state="disabled")
+            if error_msg:
+                lbl_status.config(text="失败", fg="red")
+                messagebox.showerror("批量队列错误", error_msg, parent=top)
+            else:
+                lbl_status.config(text="批量队列完成", fg="green")
+                messagebox.showinfo("批量队列", msg, parent=top)
+
+        t = threading.Thread(target=task, daemon=True)
+        state["thread"], state["token"] = t, token
+        t.start()
+
+    btn_batch = tk.Button(top, text="批量队列 (JSON 清单)...", command=run_batch)
+    btn_batch.pack(fill="x", padx=20)
+
+    # === 取消 / 关闭窗口 ===
+    def cancel():
+        if state["token"]:
+            state["token"].cancel()
+            lbl_status.config(text="正在取消，等待 FFmpeg 退出...", fg="orange")
+
+    def on_close():
+        t = state["thread"]
+        if t and t.is_alive():
+            if not messagebox.askyesno("确认", "渲染仍在进行，是否取消并关闭？", parent=top):
+                return
+            cancel()
+            _wait_and_close()
+        else:
+            top.destroy()
+
+    def _wait_and_close():
+        # 轮询而不是 join，避免阻塞 Tk 主循环 (渲染线程仍会通过 after 回调界面)
+        if state["thread"].is_alive():
+            top.after(100, _wait_and_close)
+        else:
+            top.destroy()
+
+    def on_destroy(event):
+        # 主窗口直接关闭时不会经过 on_close：在这里兜底取消并等待渲染线程
+        if event.widget is not top or state["closed"]:
+            return
+        state["closed"] = True
+        if state["token"]:
+            state["token"].cancel()
+        t = state["thread"]
+        if t and t.is_alive():
+            t.join(CLOSE_JOIN_TIMEOUT)
+
+    btn_cancel = tk.Button(top, text="取消", state="disabled", command=cancel)
+    btn_cancel.pack(fill="x", padx=20, pady=(5, 0))
+    top.protocol("WM_DELETE_WINDOW", on_close)
+    top.bind("<Destroy>", on_destroy, add="+")
+    action_buttons = [btn_run, btn_preview, btn_sheet, btn_batch]
@@ -1,50 +1,102 @@
-import tkinter as tk
-from tkinter import messagebox
 import os
-import subprocess
-import platform
+import tkinter as tk
+from tkinter import messagebox, filedialog, ttk
+
+import fpscalc
+import launcher
 
 # ==========================================
-#  配置区域 (请修改这里)
+#  FPS / 时长 / 距离 / 速度 计算器
 # ==========================================
-# 在这里填入你的 exe 绝对路径
-# 注意：
-# 1. 路径两边加上引号
-# 2. 路径前面加上 r，防止反斜杠转义
-# 3. 示例: r"D:\Games\Genshin Impact\Genshin Impact Game\YuanShen.exe"
+# 原先这里通过 subprocess 启动外部的 7.fps计算.exe，
+# 现在换算逻辑统一放在 fpscalc 模块中 (b0 渲染也使用同一套公式)，直接在工具箱内计算。
+# 其他外部程序改为在 launcher_tools.json 中登记，由 launcher.Supervisor 监管。
 
-TARGET_EXE_PATH = r"E:\povtools\7.fps计算.exe"
+FIELD_LABELS = [
+    ("fps", "帧率 FPS"),
+    ("duration", "时长 (秒)"),
+    ("distance", "距离 (像素)"),
+    ("speed", "速度 (像素/秒)"),
+    ("frames", "总帧数"),
+]
 
 
 # ==========================================
 #  核心逻辑
 # ==========================================
-def _launch_program():
-    path = TARGET_EXE_PATH
+def _read_entries(entries):
+    """读取输入框，空白视为未知；格式错误时抛出 ValueError"""
+    values = {}
+    for key, label in FIELD_LABELS:
+        text = entries[key].get().strip()
+        if not text:
+            values[key] = None
+            continue
+        try:
+            values[key] = float(text)
+        except ValueError:
+            raise ValueError(f"{label} 不是有效数字: {text}")
+    return values
+
+
+def _format_value(key, value):
+    if value is None:
+        return ""
+    if key == "frames":
+        return str(int(value))
+    return f"{value:.6g}"
 
-    # 1. 检查文件是否存在
-    if not os.path.exists(path):
-        messagebox.showerror("错误", f"找不到文件：\n{path}\n\n请检查代码中的 TARGET_EXE_PATH 配置。")
-        return
 
+def _process_batch_csv(parent):
+    in_path = filedialog.askopenfilename(parent=parent, filetypes=[("CSV", "*.csv")])
+    if not in_path:
+        return
+    out_path = filedialog.asksaveasfilename(parent=parent, defaultextension=".csv", filetypes=[("CSV", "*.csv")],
+                                            initialfile="fps_result.csv")
+    if not out_path:
+        return
     try:
-        # 2. 获取目标文件夹路径
-        # 很多软件依赖同目录下的 dll 或 config 文件，必须设置 cwd (当前工作目录)
-        work_dir = os.path.dirname(path)
+        count = fpscalc.solve_csv(in_path, out_path)
+        messagebox.showinfo("完成", f"已换算 {count} 行:\n{out_path}", parent=parent)
+    except Exception as e:
+        messagebox.showerror("批量换算失败", str(e), parent=parent)
 
-        # 3. 启动进程
-        # subprocess.Popen 是非阻塞的，主程序不会卡死
-        if platform.system() == 'Windows':
-            subprocess.Popen(path, cwd=work_dir, shell=False)
-        else:
-            # Linux/Mac 兼容写法 (虽然 exe 通常是 Windows 的)
-            subprocess.Popen([path], cwd=work_dir)
 
-        # 启动成功提示 (可选，不想弹窗可以注释掉)
-        # messagebox.showinfo("成功", "程序已启动！")
+# ==========================================
+#  外部程序监管
+# ==========================================
+# 监管器在模块级保存：关闭窗口不会结束已启动的程序，重新打开窗口仍能看到进程表
+_supervisor = None
+_supervisor_config = None
+
+
+def _get_supervisor(config_path):
+    global _supervisor, _supervisor_config
+    if _supervisor is None or _supervisor_config != config_path:
+        registry = launcher.load_registry(config_path)
+        if _supervisor is not None:
+            _supervisor.shutdown()
+        _supervisor = launcher.Supervisor(registry)
+        _supervisor_config = config_path
+    return _supervisor
+
+
+def _parse_variables(text):
+    """解析 "key=value; key2=value2" 形式的模板变量"""
+    variables = {}
+    for part in text.split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        key, sep, value = part.partition("=")
+        if not sep:
+            raise ValueError(f"变量格式应为 key=value: {part}")
+        variables[key.strip()] = value.strip()
+    return variables
 
-    except Exception as e:
-        messagebox.showerror("启动失败", f"无法启动程序：\n{str(e)}")
+
+def _format_rss(rss):
+    return "-" if rss is None else f"{rss / 1024 / 1024:.1f} MB"
 
 
 # ==========================================
@@ -52,10 +104,9 @@ def _launch_program():
 # ==========================================
 def show_ui(parent):
     top = tk.Toplevel(parent)
-    top.title("快速启动器")
-    top.geometry("400x250")
-    top.transient(parent) # 修改点
-    top.grab_set()        # 修改点
+    top.title("FPS 计算器 / 外部程序")
+    top.geometry("560x520")
+    top.transient(parent)
 
     # 居中
     top.update_idletasks()
@@ -63,22 +114,184 @@ def show_ui(parent):
     y = (top.winfo_screenheight() - top.winfo_height()) // 2
     top.geometry(f"+{x}+{y}")
 
-    # 显示当前的配置路径
-    tk.Label(top, text="当前配置的目标程序:", font=("Arial", 10)).pack(pady=(20, 5))
+    notebook = ttk.Notebook(top)
+    notebook.pack(fill="both", expand=True, padx=10, pady=10)
+
+    # Tab 1
+    tab1 = tk.Frame(notebook)
+    notebook.add(tab1, text="1. FPS 计算")
+    _init_calc_ui(tab1, top)
+
+    # Tab 2
+    tab2 = tk.Frame(notebook)
+    notebook.add(tab2, text="2. 外部程序")
+    _init_launcher_ui(tab2, top)
+
+
+# -----------------------------------------------------------
+# Tab 1 UI
+# -----------------------------------------------------------
+def _init_calc_ui(frame, parent_win):
+    tk.Label(frame, text="填写已知的量，留空的量会自动推算", font=("Arial", 10)).pack(pady=(15, 5))
+
+    frame_fields = tk.Frame(frame)
+    frame_fields.pack(padx=20, pady=5, fill="x")
+
+    entries = {}
+    for row, (key, label) in enumerate(FIELD_LABELS):
+        tk.Label(frame_fields, text=label + ":").grid(row=row, column=0, sticky="w", pady=3)
+        entry = tk.Entry(frame_fields, font=("Consolas", 10))
+        entry.grid(row=row, column=1, sticky="ew", pady=3)
+        entries[key] = entry
+    frame_fields.columnconfigure(1, weight=1)
+
+    tk.Label(frame_fields, text="运动角度 (度):").grid(row=len(FIELD_LABELS), column=0, sticky="w", pady=3)
+    entry_angle = tk.Entry(frame_fields, font=("Consolas", 10))
+    entry_angle.insert(0, "0")
+    entry_angle.grid(row=len(FIELD_LABELS), column=1, sticky="ew", pady=3)
+
+    lbl_result = tk.Label(frame, text="", fg="#1565C0", font=("Consolas", 10), justify="left")
+    lbl_result.pack(pady=5)
+
+    def calculate():
+        try:
+            values = _read_entries(entries)
+            angle = float(entry_angle.get() or 0)
+        except ValueError as e:
+            messagebox.showerror("输入错误", str(e), parent=parent_win)
+            return
+
+        result = fpscalc.solve(**values)
+        for key, _ in FIELD_LABELS:
+            if values[key] is None and result[key] is not None:
+                entries[key].delete(0, tk.END)
+                entries[key].insert(0, _format_value(key, result[key]))
+
+        if result["px_per_frame"] is None:
+            lbl_result.config(text="已知量不足，无法推算每帧位移")
+            return
+        dx, dy = fpscalc.frame_displacement(result["speed"], angle, result["fps"])
+        lbl_result.config(text=f"每帧位移: {result['px_per_frame']:.4f} px\n"
+                               f"dx = {dx:.4f} px, dy = {dy:.4f} px")
+
+    def clear():
+        for entry in entries.values():
+            entry.delete(0, tk.END)
+        lbl_result.config(text="")
+
+    frame_btn = tk.Frame(frame)
+    frame_btn.pack(pady=10, fill="x", padx=40)
+    tk.Button(frame_btn, text="计算", bg="#E91E63", fg="white", font=("Arial", 14, "bold"),
+              command=calculate).pack(side="left", expand=True, fill="x", padx=(0, 5))
+    tk.Button(frame_btn, text="清空", font=("Arial", 12), command=clear).pack(side="left", padx=(5, 0))
+
+    tk.Button(frame, text="批量换算 CSV...", command=lambda: _process_batch_csv(parent_win)).pack(pady=5)
+    tk.Label(frame, text="(CSV 列名: fps, duration, distance, speed, frames，缺失值留空)",
+             fg="gray", font=("Arial", 8)).pack()
+
+
+# -----------------------------------------------------------
+# Tab 2 UI
+# -----------------------------------------------------------
+def _init_launcher_ui(frame, parent_win):
+    pad_opts = {'padx': 10, 'pady': 5}
+    state = {"sup": None}
+
+    tk.Label(frame, text="程序注册表 (JSON / TOML):").pack(anchor="w", **pad_opts)
+    frame_cfg = tk.Frame(frame)
+    frame_cfg.pack(fill="x", padx=10)
+    entry_cfg = tk.Entry(frame_cfg)
+    entry_cfg.insert(0, launcher.DEFAULT_CONFIG_PATH)
+    entry_cfg.pack(side="left", fill="x", expand=True)
+
+    frame_tool = tk.Frame(frame)
+    frame_tool.pack(fill="x", **pad_opts)
+    tk.Label(frame_tool, text="程序:").pack(side="left")
+    cb_tool = ttk.Combobox(frame_tool, state="readonly", width=24)
+    cb_tool.pack(side="left", padx=5)
+
+    tk.Label(frame, text="参数变量 (key=value; key2=value2):").pack(anchor="w", padx=10)
+    entry_vars = tk.Entry(frame)
+    entry_vars.pack(fill="x", padx=10)
+
+    def load_config(path=None):
+        path = path or entry_cfg.get().strip()
+        try:
+            sup = _get_supervisor(path)
+        except Exception as e:
+            messagebox.showerror("读取注册表失败", str(e), parent=parent_win)
+            return
+        state["sup"] = sup
+        names = list(sup.registry["tools"])
+        cb_tool.config(values=names)
+        if names and cb_tool.get() not in names:
+            cb_tool.current(0)
+
+    def browse():
+        path = filedialog.askopenfilename(parent=parent_win, filetypes=[("Registry", "*.json;*.toml")])
+        if path:
+            entry_cfg.delete(0, tk.END)
+            entry_cfg.insert(0, path)
+            load_config(path)
+
+    tk.Button(frame_cfg, text="浏览", command=browse).pack(side="left", padx=(5, 0))
+    tk.Button(frame_cfg, text="加载", command=load_config).pack(side="left", padx=(5, 0))
+
+    # 进程表
+    columns = ("id", "name", "state", "pid", "exit", "restarts", "cpu", "rss")
+    headings = ("#", "程序", "状态", "PID", "退出码", "重启", "CPU%", "内存")
+    widths = (30, 120, 70, 60, 55, 40, 55, 80)
+    tree = ttk.Treeview(frame, columns=columns, show="headings", height=10)
+    for col, text, width in zip(columns, headings, widths):
+        tree.heading(col, text=text)
+        tree.column(col, width=width, anchor="center")
+    tree.pack(fill="both", expand=True, **pad_opts)
+
+    def launch():
+        if state["sup"] is None or not cb_tool.get():
+            messagebox.showwarning("提示", "请先加载注册表并选择程序", parent=parent_win)
+            return
+        try:
+            state["sup"].launch(cb_tool.get(), _parse_variables(entry_vars.get()))
+        except Exception as e:
+            messagebox.showerror("启动失败", str(e), parent=parent_win)
+        refresh(schedule=False)
 
-    # 使用 Text 组件显示路径，方便长路径自动换行
-    txt_path = tk.Text(top, height=3, width=40, bg="#f0f0f0", relief="flat", font=("Consolas", 9))
-    txt_path.insert("1.0", TARGET_EXE_PATH)
-    txt_path.configure(state="disabled")  # 只读
-    txt_path.pack(padx=20, pady=5)
+    def stop_selected():
+        if state["sup"] is None:
+            return
+        for item in tree.selection():
+            state["sup"].stop(int(item))
+        refresh(schedule=False)
 
-    tk.Label(top, text="(如需修改，请打开 launcher_tools.py 编辑第12行)", fg="gray", font=("Arial", 8)).pack(pady=5)
+    def refresh(schedule=True):
+        if not frame.winfo_exists():
+            return
+        if state["sup"] is not None:
+            rows = state["sup"].table()
+            alive = set()
+            for r in rows:
+                iid = str(r["id"])
+                alive.add(iid)
+                values = (r["id"], r["name"], r["state"], r["pid"] or "-",
+                          "-" if r["exit_code"] is None else r["exit_code"], r["restarts"],
+                          "-" if r["cpu"] is None else r["cpu"], _format_rss(r["rss"]))
+                if tree.exists(iid):
+                    tree.item(iid, values=values)
+                else:
+                    tree.insert("", "end", iid=iid, values=values)
+            for iid in tree.get_children():
+                if iid not in alive:
+                    tree.delete(iid)
+        if schedule:
+            frame.after(1000, refresh)
 
-    # 启动按钮
-    def run():
-        _launch_program()
-        # 可选：启动后自动关闭这个小窗口
-        # top.destroy()
+    frame_btn = tk.Frame(frame)
+    frame_btn.pack(fill="x", padx=10, pady=(0, 10))
+    tk.Button(frame_btn, text="启动", bg="#E91E63", fg="white", font=("Arial", 12, "bold"),
+              command=launch).pack(side="left", expand=True, fill="x", padx=(0, 5))
+    tk.Button(frame_btn, text="结束选中", command=stop_selected).pack(side="left", padx=5)
 
-    tk.Button(top, text="立即启动", bg="#E91E63", fg="white", font=("Arial", 14, "bold"),
-              command=run).pack(pady=20, fill="x", padx=40)
\ No newline at end of file
+    if os.path.exists(entry_cfg.get()):
+        load_config()
+    refresh()
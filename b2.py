@@ -1,8 +1,16 @@
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, filedialog, ttk
+import os
 import subprocess
 import platform
+import threading
+import time
 import webbrowser
+from urllib.parse import quote
+
+import geocode
+import http_client
+import tiles
 
 
 # ===========================
@@ -49,9 +57,360 @@ def _open_map(service_name):
         _open_url_in_edge(target_url)
 
 
-def _api_placeholder():
-    messagebox.showinfo("API 查询",
-                        "此功能为预留接口。\n\n未来可接入：\n1. 天气查询 API\n2. 汇率换算 API\n3. 快递查询 API")
+# ===========================
+# API 查询
+# ===========================
+# url 中的 {q} 替换为每一行输入 (已做 URL 编码)；自定义模式直接把输入当作完整 URL。
+# 需要密钥的服务 (如快递查询) 可用自定义 URL 模式接入。
+API_SERVICES = {
+    "weather": {"label": "天气 (wttr.in)", "url": "https://wttr.in/{q}?format=j1", "hint": "每行一个城市名"},
+    "exchange": {"label": "汇率 (open.er-api.com)", "url": "https://open.er-api.com/v6/latest/{q}",
+                 "hint": "每行一个基准货币代码，如 USD"},
+    "custom": {"label": "自定义 URL", "url": None, "hint": "每行一个完整 URL"},
+}
+
+# 事件循环与客户端在第一次查询时创建，之后所有窗口共用 (连接池与缓存跨窗口复用)
+_http = None
+
+
+def _get_http():
+    global _http
+    if _http is None:
+        bg = http_client.BackgroundLoop()
+        client = bg.call(http_client.AsyncHTTPClient, 6, 64, 10.0, 2, 0.5,
+                         http_client.TTLCache(maxsize=512, ttl=600.0))
+        _http = (bg, client)
+    return _http
+
+
+def _build_url(service, query):
+    template = API_SERVICES[service]["url"]
+    if template is None:
+        return query
+    return template.format(q=quote(query))
+
+
+def _summarize(service, resp):
+    """把响应整理成一行摘要"""
+    if not resp.ok:
+        return f"HTTP {resp.status} {resp.reason}"
+    try:
+        if service == "weather":
+            cur = resp.json()["current_condition"][0]
+            return f"{cur['temp_C']}°C  {cur['weatherDesc'][0]['value']}  湿度 {cur['humidity']}%"
+        if service == "exchange":
+            rates = resp.json()["rates"]
+            picks = [c for c in ("CNY", "USD", "EUR", "JPY", "HKD") if c in rates]
+            return "  ".join(f"{c}={rates[c]}" for c in picks)
+    except (ValueError, KeyError, IndexError, TypeError):
+        pass
+    return resp.text()[:200].replace("\n", " ")
+
+
+async def _run_queries(client, service, queries):
+    urls = [_build_url(service, q) for q in queries]
+    results = await client.get_many(urls)
+    lines = []
+    for q, r in zip(queries, results):
+        if isinstance(r, Exception):
+            lines.append(f"[失败] {q}: {type(r).__name__} {r}")
+        else:
+            tag = "缓存" if r.from_cache else f"{r.elapsed * 1000:.0f}ms"
+            lines.append(f"[{tag}] {q}: {_summarize(service, r)}")
+    return lines
+
+
+def _api_query_ui(parent):
+    top = tk.Toplevel(parent)
+    top.title("API 查询")
+    top.geometry("560x480")
+    top.transient(parent)
+
+    frame_top = tk.Frame(top)
+    frame_top.pack(fill="x", padx=10, pady=(10, 5))
+    tk.Label(frame_top, text="服务:").pack(side="left")
+    keys = list(API_SERVICES)
+    cb_service = ttk.Combobox(frame_top, values=[API_SERVICES[k]["label"] for k in keys], state="readonly", width=28)
+    cb_service.current(0)
+    cb_service.pack(side="left", padx=5)
+
+    lbl_hint = tk.Label(top, text=API_SERVICES[keys[0]]["hint"], fg="gray")
+    lbl_hint.pack(anchor="w", padx=10)
+    cb_service.bind("<<ComboboxSelected>>",
+                    lambda e: lbl_hint.config(text=API_SERVICES[keys[cb_service.current()]]["hint"]))
+
+    txt_in = tk.Text(top, height=6, font=("Consolas", 10))
+    txt_in.pack(fill="x", padx=10, pady=5)
+
+    txt_out = tk.Text(top, height=12, font=("Consolas", 9), bg="#f7f7f7")
+    lbl_status = tk.Label(top, text="", fg="gray")
+
+    def _finish(lines, error, seconds, stats):
+        btn_run.config(state="normal")
+        txt_out.delete("1.0", tk.END)
+        if error:
+            txt_out.insert("1.0", f"查询失败: {error}")
+            return
+        txt_out.insert("1.0", "\n".join(lines))
+        lbl_status.config(text=f"{len(lines)} 项，用时 {seconds:.2f}s，新建连接 {stats['connections']}，"
+                               f"复用 {stats['reused']}，重试 {stats['retries']}")
+
+    def run():
+        queries = [q.strip() for q in txt_in.get("1.0", tk.END).splitlines() if q.strip()]
+        if not queries:
+            messagebox.showwarning("提示", "请至少输入一行查询内容", parent=top)
+            return
+        service = keys[cb_service.current()]
+        btn_run.config(state="disabled")
+        lbl_status.config(text=f"正在并发查询 {len(queries)} 项...")
+        bg, client = _get_http()
+        t0 = time.perf_counter()
+
+        def on_done(fut):
+            try:
+                lines, error = fut.result(), None
+            except Exception as e:
+                lines, error = None, str(e)
+            seconds = time.perf_counter() - t0
+            stats = dict(client.stats)
+            top.after(0, lambda: _finish(lines, error, seconds, stats))
+
+        bg.submit(_run_queries(client, service, queries), on_done)
+
+    btn_run = tk.Button(top, text="并发查询", bg="#4CAF50", fg="white", font=("Arial", 11, "bold"), command=run)
+    btn_run.pack(fill="x", padx=10, pady=5)
+    txt_out.pack(fill="both", expand=True, padx=10)
+    lbl_status.pack(anchor="w", padx=10, pady=5)
+
+
+# ===========================
+# 批量地理编码
+# ===========================
+def _geocode_ui(parent):
+    top = tk.Toplevel(parent)
+    top.title("批量地理编码")
+    top.geometry("480x360")
+    top.transient(parent)
+
+    pad_opts = {'padx': 10, 'pady': 4}
+
+    tk.Label(top, text="地址表格 (CSV，UTF-8):").pack(anchor="w", **pad_opts)
+    frame_in = tk.Frame(top)
+    frame_in.pack(fill="x", padx=10)
+    entry_in = tk.Entry(frame_in)
+    entry_in.pack(side="left", fill="x", expand=True)
+    tk.Button(frame_in, text="浏览",
+              command=lambda: (entry_in.delete(0, tk.END),
+                               entry_in.insert(0, filedialog.askopenfilename(parent=top,
+                                                                             filetypes=[("CSV", "*.csv")])))
+              ).pack(side="left", padx=(5, 0))
+
+    frame_opts = tk.Frame(top)
+    frame_opts.pack(fill="x", **pad_opts)
+    tk.Label(frame_opts, text="地址列名:").grid(row=0, column=0, sticky="w")
+    entry_col = tk.Entry(frame_opts, width=16)
+    entry_col.insert(0, "address")
+    entry_col.grid(row=0, column=1, sticky="w", padx=5)
+    tk.Label(frame_opts, text="提供方:").grid(row=1, column=0, sticky="w", pady=4)
+    cb_provider = ttk.Combobox(frame_opts, values=list(geocode.PROVIDERS), state="readonly", width=14)
+    cb_provider.set("amap")
+    cb_provider.grid(row=1, column=1, sticky="w", padx=5)
+    tk.Label(frame_opts, text="API Key:").grid(row=2, column=0, sticky="w")
+    entry_key = tk.Entry(frame_opts, width=36, show="*")
+    entry_key.grid(row=2, column=1, sticky="w", padx=5)
+    tk.Label(frame_opts, text="城市 (可选):").grid(row=3, column=0, sticky="w", pady=4)
+    entry_city = tk.Entry(frame_opts, width=16)
+    entry_city.grid(row=3, column=1, sticky="w", padx=5)
+
+    progress_bar = ttk.Progressbar(top, orient="horizontal", mode="determinate")
+    progress_bar.pack(fill="x", padx=10, pady=(10, 2))
+    lbl_status = tk.Label(top, text="已查过的地址保存在本地缓存中，不会重复请求", fg="gray")
+    lbl_status.pack(anchor="w", padx=10)
+
+    def _finish(stats, error, out_path):
+        btn_run.config(state="normal")
+        if error:
+            lbl_status.config(text="失败")
+            messagebox.showerror("地理编码失败", error, parent=top)
+            return
+        progress_bar.configure(value=100)
+        lbl_status.config(text=f"缓存命中 {stats['cache_hits']}，联网 {stats['network']}，"
+                               f"请求 {stats['requests']} 次，失败 {stats['errors']}")
+        messagebox.showinfo("完成", f"共 {stats['rows']} 行，结果已保存:\n{out_path}", parent=top)
+
+    def run():
+        in_path = entry_in.get().strip()
+        if not os.path.isfile(in_path):
+            messagebox.showwarning("提示", "请选择有效的 CSV 文件", parent=top)
+            return
+        name = cb_provider.get()
+        options = {"key": entry_key.get().strip(), "city": entry_city.get().strip() or None} if name == "amap" else {}
+        try:
+            provider = geocode.make_provider(name, **options)
+        except ValueError as e:
+            messagebox.showwarning("提示", str(e), parent=top)
+            return
+        out_path = os.path.splitext(in_path)[0] + "_geocoded.csv"
+        column = entry_col.get().strip() or "address"
+        btn_run.config(state="disabled")
+        progress_bar.configure(value=0)
+
+        def on_progress(done, total):
+            val = done / total * 100 if total else 100
+            top.after(0, lambda: progress_bar.configure(value=val))
+            top.after(0, lambda: lbl_status.config(text=f"{done} / {total} 个不重复地址"))
+
+        def worker():
+            try:
+                stats = geocode.geocode_csv(in_path, out_path, provider, column, progress=on_progress)
+                top.after(0, lambda: _finish(stats, None, out_path))
+            except Exception as e:
+                msg = str(e)
+                top.after(0, lambda: _finish(None, msg, None))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    btn_run = tk.Button(top, text="开始编码", bg="#2196F3", fg="white", font=("Arial", 11, "bold"), command=run)
+    btn_run.pack(fill="x", padx=10, pady=10)
+
+
+# ===========================
+# 离线地图 (瓦片预下载 + 本地浏览)
+# ===========================
+# 同一个 MBTiles 只启动一个本地服务，之后再次打开直接复用
+_tile_servers = {}
+
+
+def _open_offline_map(mbtiles_path):
+    key = os.path.abspath(mbtiles_path)
+    if key not in _tile_servers:
+        _tile_servers[key] = tiles.serve(key)
+    _open_url_in_edge(_tile_servers[key][1])
+
+
+def _offline_map_ui(parent):
+    top = tk.Toplevel(parent)
+    top.title("离线地图")
+    top.geometry("480x470")
+    top.transient(parent)
+
+    pad_opts = {'padx': 10, 'pady': 4}
+    state = {"cancel": None}
+
+    # 公共瓦片服务禁止批量下载：只接受用户自己的 / 已授权的瓦片服务 (或 TILE_SOURCES 中登记的源名称)
+    tk.Label(top, text="瓦片 URL 模板 (自建或已授权可批量下载的服务):").pack(anchor="w", **pad_opts)
+    entry_source = tk.Entry(top)
+    entry_source.pack(fill="x", padx=10)
+    tk.Label(top, text="如 http://tiles.example.lan/{z}/{x}/{y}.png；"
+                       f"公网主机最多 {tiles.PUBLIC_HOST_CONCURRENCY} 个并发连接",
+             fg="gray").pack(anchor="w", padx=10)
+
+    frame_box = tk.LabelFrame(top, text="范围 (经纬度) 与级别")
+    frame_box.pack(fill="x", **pad_opts)
+    fields = [("最小经度", "116.20"), ("最小纬度", "39.80"), ("最大经度", "116.60"), ("最大纬度", "40.05"),
+              ("最小级别", "10"), ("最大级别", "14")]
+    entries = []
+    for i, (label, default) in enumerate(fields):
+        tk.Label(frame_box, text=label + ":").grid(row=i // 2, column=(i % 2) * 2, sticky="w", padx=5, pady=2)
+        entry = tk.Entry(frame_box, width=12)
+        entry.insert(0, default)
+        entry.grid(row=i // 2, column=(i % 2) * 2 + 1, sticky="w", padx=5, pady=2)
+        entries.append(entry)
+
+    tk.Label(top, text="MBTiles 文件:").pack(anchor="w", **pad_opts)
+    frame_path = tk.Frame(top)
+    frame_path.pack(fill="x", padx=10)
+    entry_path = tk.Entry(frame_path)
+    entry_path.insert(0, os.path.join(os.path.expanduser("~"), "offline_map.mbtiles"))
+    entry_path.pack(side="left", fill="x", expand=True)
+
+    def browse():
+        path = filedialog.asksaveasfilename(parent=top, defaultextension=".mbtiles",
+                                            filetypes=[("MBTiles", "*.mbtiles")], confirmoverwrite=False)
+        if path:
+            entry_path.delete(0, tk.END)
+            entry_path.insert(0, path)
+
+    tk.Button(frame_path, text="浏览", command=browse).pack(side="left", padx=(5, 0))
+
+    progress_bar = ttk.Progressbar(top, orient="horizontal", mode="determinate")
+    progress_bar.pack(fill="x", padx=10, pady=(10, 2))
+    lbl_status = tk.Label(top, text="", fg="gray")
+    lbl_status.pack(anchor="w", padx=10)
+
+    def read_params():
+        values = [e.get().strip() for e in entries]
+        bbox = tuple(float(v) for v in values[:4])
+        zmin, zmax = int(values[4]), int(values[5])
+        if not 0 <= zmin <= zmax <= tiles.PREFETCH_MAX_ZOOM:
+            raise ValueError(f"级别范围应在 0-{tiles.PREFETCH_MAX_ZOOM} 之间，且最小级别不大于最大级别")
+        return tiles.resolve_source(entry_source.get().strip()), bbox, zmin, zmax
+
+    def _finish(report, error):
+        state["cancel"] = None
+        btn_run.config(state="normal")
+        if error:
+            messagebox.showerror("下载失败", error, parent=top)
+            return
+        lbl_status.config(text=f"下载 {report['downloaded']}，跳过 {report['skipped']}，失败 {report['failed']}，"
+                               f"库内 {report['tiles']} 块 / 去重后 {report['unique_images']} 张")
+        if report["cancelled"]:
+            lbl_status.config(text="已取消 (再次下载会从断点继续)")
+
+    def run():
+        try:
+            source, bbox, zmin, zmax = read_params()
+            total = tiles.count_tiles(bbox, zmin, zmax)
+        except ValueError as e:
+            messagebox.showwarning("提示", str(e), parent=top)
+            return
+        if total > tiles.PREFETCH_CONFIRM_TILES and not messagebox.askyesno(
+                "确认", f"共 {total} 块瓦片，下载量较大，确定继续吗？", parent=top):
+            return
+        path = entry_path.get().strip()
+        cancel = threading.Event()
+        state["cancel"] = cancel
+        btn_run.config(state="disabled")
+        progress_bar.configure(value=0)
+
+        last = [0.0]
+
+        def on_progress(done, total_tiles):
+            now = time.monotonic()
+            if now - last[0] < 0.2 and done < total_tiles:
+                return
+            last[0] = now
+            val = done / total_tiles * 100 if total_tiles else 100
+            top.after(0, lambda: progress_bar.configure(value=val))
+            top.after(0, lambda: lbl_status.config(text=f"{done} / {total_tiles}"))
+
+        def worker():
+            try:
+                report = tiles.prefetch(path, bbox, zmin, zmax, source, progress=on_progress, cancel_event=cancel)
+                top.after(0, lambda: _finish(report, None))
+            except Exception as e:
+                msg = str(e)
+                top.after(0, lambda: _finish(None, msg))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def cancel_run():
+        if state["cancel"] is not None:
+            state["cancel"].set()
+
+    def open_map():
+        path = entry_path.get().strip()
+        if not os.path.isfile(path):
+            messagebox.showwarning("提示", "MBTiles 文件不存在，请先预下载", parent=top)
+            return
+        _open_offline_map(path)
+
+    frame_btn = tk.Frame(top)
+    frame_btn.pack(fill="x", padx=10, pady=10)
+    btn_run = tk.Button(frame_btn, text="预下载", bg="#2196F3", fg="white", font=("Arial", 11, "bold"), command=run)
+    btn_run.pack(side="left", expand=True, fill="x", padx=(0, 5))
+    tk.Button(frame_btn, text="取消", command=cancel_run).pack(side="left", padx=5)
+    tk.Button(frame_btn, text="打开离线地图", command=open_map).pack(side="left", padx=(5, 0))
 
 
 # ===========================
@@ -60,9 +419,8 @@ def _api_placeholder():
 def show_ui(parent):
     top = tk.Toplevel(parent)
     top.title("网络工具箱")
-    top.geometry("400x350")
+    top.geometry("400x450")
     top.transient(parent) # 修改点
-    top.grab_set()        # 修改点
 
     # 居中
     top.update_idletasks()
@@ -92,9 +450,17 @@ def show_ui(parent):
     tk.Button(frame_map, text="腾讯地图", bg="#E3F2FD",
               command=lambda: _open_map("tencent"), **btn_style).pack(pady=5)
 
+    # 批量地址 -> 坐标
+    tk.Button(frame_map, text="批量地理编码", bg="#BBDEFB",
+              command=lambda: _geocode_ui(top), **btn_style).pack(pady=5)
+
+    # 离线瓦片
+    tk.Button(frame_map, text="离线地图", bg="#BBDEFB",
+              command=lambda: _offline_map_ui(top), **btn_style).pack(pady=5)
+
     # === 模块 2: API 查询 (2选1 的第二个选项) ===
     frame_api = tk.LabelFrame(top, text="选项 2: API 数据服务", font=("Arial", 10, "bold"), fg="#4CAF50")
     frame_api.pack(fill="x", **pad_opts)
 
-    tk.Button(frame_api, text="API 查询 (预留)", bg="#E8F5E9", width=20, height=2,
-              command=_api_placeholder).pack(pady=10)
\ No newline at end of file
+    tk.Button(frame_api, text="API 查询", bg="#E8F5E9", width=20, height=2,
+              command=lambda: _api_query_ui(top)).pack(pady=10)
\ No newline at end of file
@@ -0,0 +1,228 @@
+import fnmatch
+import json
+import os
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# ===========================
+# 批处理文件发现 + 断点续跑日志
+# ===========================
+# iter_files: 基于 os.scandir 的流式 (可递归) 文件发现，边扫描边产出，
+#             调用方不必等整棵目录树列完就能开始处理。
+# BatchJournal: 就地覆盖类批处理 (a2 裁切 / 去底) 的追加式日志。
+#             每处理完一个文件记一行 (源文件, 输出文件, 输出文件的大小与修改时间)，
+#             记录在临时文件写完、替换目标文件之前写入并 fsync，所以中途崩溃 / 取消后重跑时
+#             能准确区分 "已处理" 与 "未处理" 的文件，已处理的不会被再裁一次。
+#             整批成功结束后日志自动删除；参数不同的新批次会丢弃旧日志重新开始。
+# run_streaming: 把 iter_files 产出的文件送进线程池 (cv2 编解码会释放 GIL)，只保留有限个在途任务。
+
+JOURNAL_NAME = ".batch_journal.jsonl"
+
+
+def split_globs(text):
+    """'*.png; sub/*' -> ['*.png', 'sub/*']，分号或逗号分隔，空白忽略"""
+    if not text:
+        return []
+    if isinstance(text, (list, tuple)):
+        return [p.strip() for p in text if p.strip()]
+    return [p.strip() for p in text.replace("；", ";").replace(",", ";").split(";") if p.strip()]
+
+
+def _match_any(rel, patterns):
+    """按相对路径 (/ 分隔) 或文件名匹配任一 glob"""
+    name = rel.rsplit("/", 1)[-1]
+    return any(fnmatch.fnmatch(rel, p) or fnmatch.fnmatch(name, p) for p in patterns)
+
+
+def iter_files(root, exts=None, include=(), exclude=(), recursive=False):
+    """
+    流式产出 (绝对路径, 相对路径)；相对路径统一用 / 分隔。
+    exts: 扩展名元组 (小写，含点)；include 非空时只保留匹配的文件；exclude 同时用于剪掉整个子目录。
+    以 . 开头的文件 / 目录 (临时文件、日志、状态库) 一律跳过。
+    """
+    include = split_globs(include)
+    exclude = split_globs(exclude)
+    stack = [(root, "")]
+    while stack:
+        directory, prefix = stack.pop()
+        try:
+            it = os.scandir(directory)
+        except OSError as e:
+            print(f"Error {directory}: {e}", file=sys.stderr)
+            continue
+        subdirs = []
+        with it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                rel = prefix + entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and not _match_any(rel, exclude):
+                            subdirs.append((entry.path, rel + "/"))
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                if exts and not entry.name.lower().endswith(exts):
+                    continue
+                if include and not _match_any(rel, include):
+                    continue
+                if exclude and _match_any(rel, exclude):
+                    continue
+                yield entry.path, rel
+        # 倒序压栈，子目录按扫描到的顺序依次处理
+        stack.extend(reversed(subdirs))
+
+
+# ===========================
+# 断点续跑日志
+# ===========================
+class BatchJournal:
+    """
+    op_key 描述本批次的操作与参数 (如 "crop:10,10,0,0")；日志中 op_key 不同则视为新批次。
+    线程安全，供 run_streaming 的多个工作线程同时使用。
+    """
+
+    def __init__(self, folder, op_key):
+        self.path = os.path.join(folder, JOURNAL_NAME)
+        self.folder = folder
+        self.op_key = op_key
+        self._lock = threading.Lock()
+        self._by_out = {}  # 输出相对路径 -> (size, mtime_ns)
+        self._by_src = {}  # 源相对路径 -> 输出相对路径 (格式转换时两者不同)
+        self.resumed = self._load()
+        self._file = open(self.path, 'a' if self.resumed else 'w', encoding='utf-8')
+        if not self.resumed:
+            self._append({"op": op_key})
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return False
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            header = {}
+        if header.get("op") != self.op_key:
+            return False
+        for line in lines[1:]:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                # 崩溃时写了一半的最后一行
+                continue
+            self._by_out[rec["out"]] = (rec["size"], rec["mtime_ns"])
+            self._by_src[rec["src"]] = rec["out"]
+        return True
+
+    def _append(self, rec):
+        self._file.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _abs(self, rel):
+        return os.path.join(self.folder, *rel.split("/"))
+
+    def _matches(self, out_rel):
+        sig = self._by_out.get(out_rel)
+        if sig is None:
+            return False
+        try:
+            st = os.stat(self._abs(out_rel))
+        except OSError:
+            return False
+        return (st.st_size, st.st_mtime_ns) == sig
+
+    def is_done(self, rel):
+        """
+        rel 已是本批次的输出 (大小与修改时间和日志一致) 时返回 True。
+        rel 是已转换完成的源文件 (如 a.jpg -> a.png 后没来得及删除 a.jpg) 时，补删源文件并返回 True。
+        """
+        with self._lock:
+            if self._matches(rel):
+                return True
+            out_rel = self._by_src.get(rel)
+            if out_rel is None or out_rel == rel or not self._matches(out_rel):
+                return False
+        try:
+            os.remove(self._abs(rel))
+        except FileNotFoundError:
+            pass
+        return True
+
+    def commit(self, src_rel, out_rel, tmp_path):
+        """在替换目标文件之前记录 (imgio.write_image 的 before_replace 回调)"""
+        st = os.stat(tmp_path)
+        rec = {"src": src_rel, "out": out_rel, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        with self._lock:
+            self._append(rec)
+            self._by_out[out_rel] = (st.st_size, st.st_mtime_ns)
+            self._by_src[src_rel] = out_rel
+
+    def close(self, complete=False):
+        """complete=True (整批无失败地结束) 时删除日志；否则保留供下次续跑"""
+        with self._lock:
+            self._file.close()
+            if complete:
+                try:
+                    os.remove(self.path)
+                except FileNotFoundError:
+                    pass
+
+
+# ===========================
+# 流式并行执行
+# ===========================
+def default_workers():
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+def run_streaming(items, fn, workers=None, progress=None, cancel_token=None):
+    """
+    items 为 (路径, 相对路径) 的可迭代对象 (可以是 iter_files 生成器)，边产出边提交。
+    fn(path, rel) 返回 True 计为成功；抛出异常计为失败 (错误打印到 stderr 后继续)。
+    返回 (成功数, 总数, 失败数)。total 随扫描进度增长。
+    """
+    workers = workers or default_workers()
+    window = workers * 4
+    counts = {"success": 0, "total": 0, "failed": 0, "done": 0}
+    pending = {}
+
+    def drain(return_when):
+        finished, _ = wait(pending, return_when=return_when)
+        for future in finished:
+            rel = pending.pop(future)
+            try:
+                if future.result():
+                    counts["success"] += 1
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"Error {rel}: {e}", file=sys.stderr)
+            counts["done"] += 1
+            if progress:
+                progress(counts["done"], counts["total"], rel)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        try:
+            for path, rel in items:
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+                while len(pending) >= window:
+                    drain(FIRST_COMPLETED)
+                pending[pool.submit(fn, path, rel)] = rel
+                counts["total"] += 1
+            while pending:
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+                drain(FIRST_COMPLETED)
+        except BaseException:
+            # 取消 / 中断: 未开始的文件不再处理，正在处理的等它写完 (原子写入，不会留下半截文件)
+            for future in pending:
+                future.cancel()
+            raise
+    return counts["success"], counts["total"], counts["failed"]
@@ -0,0 +1,429 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import imgio
+from bench_encoders import make_synthetic_sprite
+
+# ===========================
+# 全工具基准测试
+# ===========================
+# 素材全部在本地合成 (PPT 模板 / 多页多 run 的 PPT / 不同尺寸与 Alpha 形态的 PNG 文件夹 / 精灵图)，
+# 每个用例在独立子进程中运行：峰值 RSS 互不干扰，imgio 解码缓存也不会跨用例命中。
+#
+#   python bench.py                       运行全部用例并与基线比较 (有退化时退出码为 1)
+#   python bench.py --quick               缩小素材规模，用于快速自检
+#   python bench.py --save-baseline       把本次结果保存为基线
+#   python bench.py --cases a2_crop b0_render_null --repeat 5
+#
+# 基线与机器相关：基线文件记录了平台与 CPU 核数，和当前机器不一致时只提示不判定。
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+DEFAULT_THRESHOLD = 0.15
+
+# 素材规模: (正常, --quick)
+SCALES = {
+    "deck_slides": (60, 10),
+    "deck_runs": (24, 6),
+    "png_count": (40, 8),
+    "png_size": ((1600, 900), (640, 360)),
+    "render_frames": (240, 40),
+    "render_resolution": ((1920, 1080), (640, 360)),
+}
+
+
+def _scale(key, quick):
+    return SCALES[key][1 if quick else 0]
+
+
+# ===========================
+# 合成素材
+# ===========================
+def make_template_deck(path, runs=6):
+    """只有一页的 a0 模板：若干文本框，每个文本框含占位符 run 与普通 run"""
+    from pptx import Presentation
+    from pptx.util import Inches, Pt
+
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    for i in range(runs):
+        box = slide.shapes.add_textbox(Inches(0.5), Inches(0.3 + i * 0.8), Inches(8), Inches(0.6))
+        p = box.text_frame.paragraphs[0]
+        run = p.add_run()
+        run.text = "{name}" if i % 2 == 0 else f"标题 {i} {{name}} 结尾"
+        run.font.size = Pt(18)
+        p.add_run().text = f" 固定文字 {i}"
+    prs.save(path)
+    return path
+
+
+def make_text_deck(path, slides, runs):
+    """a1 用的多页 PPT：每页若干带空格的 run，另有一个空白文本框"""
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    prs = Presentation()
+    layout = prs.slide_layouts[6]
+    for s in range(slides):
+        slide = prs.slides.add_slide(layout)
+        box = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(5))
+        tf = box.text_frame
+        for r in range(runs):
+            p = tf.paragraphs[0] if r == 0 else tf.add_paragraph()
+            p.add_run().text = f"第 {s} 页 第 {r} 段  含 空格\t与制表符"
+        slide.shapes.add_textbox(Inches(0.5), Inches(6), Inches(2), Inches(0.5))
+    prs.save(path)
+    return path
+
+
+def make_png(width, height, pattern, seed=0):
+    """
+    pattern:
+      "opaque"   - 不透明渐变 + 噪点 (3 通道)
+      "keyed"    - 白底上的彩色圆形 (去底用)
+      "alpha"    - 4 通道，径向柔边 Alpha
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    if pattern == "opaque":
+        img = np.empty((height, width, 3), dtype=np.uint8)
+        img[:, :, 0] = (xx * 255 // max(1, width - 1)).astype(np.uint8)
+        img[:, :, 1] = (yy * 255 // max(1, height - 1)).astype(np.uint8)
+        img[:, :, 2] = rng.integers(0, 256, size=(height, width), dtype=np.uint8)
+        return img
+    if pattern == "keyed":
+        img = np.full((height, width, 3), 255, dtype=np.uint8)
+        mask = (xx - width / 2) ** 2 + (yy - height / 2) ** 2 < (min(width, height) / 3) ** 2
+        img[mask] = rng.integers(0, 200, size=3, dtype=np.uint8)
+        return img
+    if pattern == "alpha":
+        return make_synthetic_sprite(width, height, seed)
+    raise ValueError(f"未知的图案: {pattern}")
+
+
+def make_png_folder(folder, count, size, patterns=("opaque", "keyed", "alpha")):
+    os.makedirs(folder, exist_ok=True)
+    w, h = size
+    for i in range(count):
+        imgio.write_image(os.path.join(folder, f"img_{i:04d}.png"), make_png(w, h, patterns[i % len(patterns)], i))
+    return folder
+
+
+def build_fixtures(fixture_dir, quick=False):
+    """生成全部素材 (已存在且规模一致时复用)，返回素材信息"""
+    os.makedirs(fixture_dir, exist_ok=True)
+    info_path = os.path.join(fixture_dir, "fixtures.json")
+    info = {
+        "quick": quick,
+        "deck_slides": _scale("deck_slides", quick),
+        "deck_runs": _scale("deck_runs", quick),
+        "png_count": _scale("png_count", quick),
+        "png_size": list(_scale("png_size", quick)),
+    }
+    if os.path.exists(info_path):
+        with open(info_path, 'r', encoding='utf-8') as f:
+            if json.load(f) == info:
+                return info
+
+    make_template_deck(os.path.join(fixture_dir, "template.pptx"))
+    with open(os.path.join(fixture_dir, "names.txt"), 'w', encoding='utf-8') as f:
+        f.write("\n".join(f"名字_{i}" for i in range(info["deck_slides"])))
+    make_text_deck(os.path.join(fixture_dir, "text_deck.pptx"), info["deck_slides"], info["deck_runs"])
+    shutil.rmtree(os.path.join(fixture_dir, "pngs"), ignore_errors=True)
+    make_png_folder(os.path.join(fixture_dir, "pngs"), info["png_count"], info["png_size"])
+    imgio.write_image(os.path.join(fixture_dir, "sprite.png"), make_synthetic_sprite(480, 320))
+
+    with open(info_path, 'w', encoding='utf-8') as f:
+        json.dump(info, f)
+    return info
+
+
+# ===========================
+# 用例
+# ===========================
+# 每个用例: prepare(fixture_dir, work_dir, info, quick) -> (run, 工作量, 单位)
+# prepare 不计时 (例如复制会被就地修改的图片文件夹)，run() 计时。
+def _case_a0_generate(fixture_dir, work_dir, info, quick):
+    import a0
+
+    # 每次都完整重建；否则第二次起会走增量生成的无变化路径
+    def run():
+        a0.generate_ppt(os.path.join(fixture_dir, "template.pptx"), os.path.join(fixture_dir, "names.txt"),
+                        os.path.join(work_dir, "a0_out.pptx"), "{name}", incremental=False)
+
+    return run, info["deck_slides"], "slides"
+
+
+def _case_a0_incremental(fixture_dir, work_dir, info, quick):
+    import a0
+
+    # 两份数据每 10 行改 1 行，交替生成：每次都是在上次输出上增量重写约 10% 的页面
+    template = os.path.join(fixture_dir, "template.pptx")
+    output = os.path.join(work_dir, "a0_incremental.pptx")
+    with open(os.path.join(fixture_dir, "names.txt"), 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    variants = [os.path.join(work_dir, "a0_names_a.txt"), os.path.join(work_dir, "a0_names_b.txt")]
+    for path, suffix in zip(variants, ("", " (改)")):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(line + suffix if i % 10 == 0 else line for i, line in enumerate(lines)))
+    a0.generate_ppt(template, variants[0], output, "{name}", incremental=False)
+    turn = [0]
+
+    def run():
+        turn[0] ^= 1
+        a0.generate_ppt(template, variants[turn[0]], output, "{name}")
+
+    return run, (len(lines) + 9) // 10, "slides"
+
+
+def _case_a1_recolor(fixture_dir, work_dir, info, quick):
+    import a1
+
+    def run():
+        a1.modify_ppt(os.path.join(fixture_dir, "text_deck.pptx"), os.path.join(work_dir, "a1_out.pptx"),
+                      (255, 0, 0), True, True, True)
+
+    return run, info["deck_slides"] * info["deck_runs"], "runs"
+
+
+def _copy_pngs(fixture_dir, work_dir):
+    folder = os.path.join(work_dir, "pngs")
+    shutil.rmtree(folder, ignore_errors=True)
+    shutil.copytree(os.path.join(fixture_dir, "pngs"), folder)
+    return folder
+
+
+def _case_a2_crop(fixture_dir, work_dir, info, quick):
+    import a2
+
+    folder = _copy_pngs(fixture_dir, work_dir)
+    return (lambda: a2.batch_crop_extend(folder, 20, 20, -16, -16)), info["png_count"], "images"
+
+
+def _case_a2_key(fixture_dir, work_dir, info, quick):
+    import a2
+
+    folder = _copy_pngs(fixture_dir, work_dir)
+    return (lambda: a2.batch_remove_bg(folder, (255, 255, 255), 10)), info["png_count"], "images"
+
+
+def _case_b0_render_null(fixture_dir, work_dir, info, quick):
+    import b0
+
+    frames = _scale("render_frames", quick)
+    fps = 60
+    speed = 240.0
+
+    def run():
+        b0.render_video(os.path.join(fixture_dir, "sprite.png"), os.path.join(work_dir, "null_out"),
+                        _scale("render_resolution", quick), fps, 15.0, speed * frames / fps, speed, "null")
+
+    return run, frames, "frames"
+
+
+CASES = {
+    "a0_generate": _case_a0_generate,
+    "a0_incremental": _case_a0_incremental,
+    "a1_recolor": _case_a1_recolor,
+    "a2_crop": _case_a2_crop,
+    "a2_key": _case_a2_key,
+    "b0_render_null": _case_b0_render_null,
+}
+
+
+# ===========================
+# 测量
+# ===========================
+def peak_rss_bytes():
+    """当前进程的峰值常驻内存；无法获取时返回 None"""
+    if platform.system() == "Windows":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+        return None
+    # Linux: VmHWM 属于当前地址空间 (ru_maxrss 会把 fork 时父进程的峰值带进子进程)
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(name, fixture_dir, quick=False, repeat=3):
+    """在当前进程中运行一个用例，返回结果 dict (取各次耗时的中位数)"""
+    info = build_fixtures(fixture_dir, quick)
+    work_dir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    try:
+        times = []
+        units = unit = None
+        for _ in range(repeat):
+            run, units, unit = CASES[name](fixture_dir, work_dir, info, quick)
+            t0 = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - t0)
+        seconds = statistics.median(times)
+        return {"case": name, "ok": True, "units": units, "unit": unit, "seconds": round(seconds, 4),
+                "throughput": round(units / seconds, 3) if seconds > 0 else None,
+                "peak_rss": peak_rss_bytes(), "runs": [round(t, 4) for t in times]}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_case_subprocess(name, fixture_dir, quick=False, repeat=3, timeout=1800):
+    """在独立子进程中运行用例 (峰值 RSS 只属于这个用例)"""
+    cmd = [sys.executable, os.path.abspath(__file__), "--run-case", name, "--fixtures", fixture_dir,
+           "--repeat", str(repeat)]
+    if quick:
+        cmd.append("--quick")
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+    except subprocess.TimeoutExpired:
+        return {"case": name, "ok": False, "error": f"超时 ({timeout}s)"}
+    if proc.returncode != 0:
+        lines = (proc.stderr or proc.stdout).strip().splitlines()
+        return {"case": name, "ok": False, "error": lines[-1] if lines else f"退出码 {proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# ===========================
+# 基线比较
+# ===========================
+def machine_info():
+    return {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()}
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path, results, quick):
+    data = {"machine": machine_info(), "quick": quick,
+            "cases": {r["case"]: {"throughput": r["throughput"], "peak_rss": r["peak_rss"]}
+                      for r in results if r["ok"]}}
+    imgio.atomic_write_bytes(path, json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8'))
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    吞吐量低于基线 (1 - threshold) 倍，或峰值 RSS 高于基线 (1 + threshold) 倍视为退化。
+    在每条结果上写入 "regressions" 列表，返回是否存在退化。
+    """
+    regressed = False
+    for r in results:
+        r["regressions"] = []
+        base = (baseline or {}).get("cases", {}).get(r["case"])
+        if not r["ok"] or not base:
+            continue
+        if base.get("throughput") and r["throughput"] is not None:
+            r["throughput_delta"] = round(r["throughput"] / base["throughput"] - 1, 4)
+            if r["throughput"] < base["throughput"] * (1 - threshold):
+                r["regressions"].append("throughput")
+        if base.get("peak_rss") and r["peak_rss"]:
+            r["peak_rss_delta"] = round(r["peak_rss"] / base["peak_rss"] - 1, 4)
+            if r["peak_rss"] > base["peak_rss"] * (1 + threshold):
+                r["regressions"].append("peak_rss")
+        regressed = regressed or bool(r["regressions"])
+    return regressed
+
+
+def _format_delta(r, key):
+    delta = r.get(key)
+    return "-" if delta is None else f"{delta * 100:+.1f}%"
+
+
+def format_table(results):
+    lines = [f"{'case':<16}{'throughput':>18}{'seconds':>10}{'peak RSS':>12}{'Δthru':>9}{'ΔRSS':>9}  状态"]
+    for r in results:
+        if not r["ok"]:
+            lines.append(f"{r['case']:<16}  失败: {r['error']}")
+            continue
+        rss = "-" if r["peak_rss"] is None else f"{r['peak_rss'] / 1024 / 1024:.1f} MB"
+        status = "退化: " + ", ".join(r["regressions"]) if r.get("regressions") else "ok"
+        lines.append(f"{r['case']:<16}{r['throughput']:>11.1f} {r['unit'] + '/s':<6}{r['seconds']:>10.3f}{rss:>12}"
+                     f"{_format_delta(r, 'throughput_delta'):>9}{_format_delta(r, 'peak_rss_delta'):>9}  {status}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="全工具基准测试 (本地合成素材)")
+    parser.add_argument("--cases", nargs="*", choices=list(CASES), help="要运行的用例，默认全部")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例重复次数 (取中位数)")
+    parser.add_argument("--quick", action="store_true", help="缩小素材规模")
+    parser.add_argument("--fixtures", help="素材目录 (默认临时目录，用完删除)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="基线文件")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果写入基线文件")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="允许的退化比例 (默认 0.15)")
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        # 子进程模式：只输出一行 JSON
+        print(json.dumps(run_case(args.run_case, args.fixtures, args.quick, args.repeat), ensure_ascii=False))
+        return 0
+
+    fixture_dir = args.fixtures or tempfile.mkdtemp(prefix="bench_fixtures_")
+    try:
+        build_fixtures(fixture_dir, args.quick)
+        results = [run_case_subprocess(name, fixture_dir, args.quick, args.repeat) for name in (args.cases or CASES)]
+    finally:
+        if not args.fixtures:
+            shutil.rmtree(fixture_dir, ignore_errors=True)
+
+    baseline = None if args.save_baseline else load_baseline(args.baseline)
+    comparable = baseline is not None and baseline.get("quick") == args.quick
+    if baseline is not None and not comparable:
+        print("基线与本次素材规模 (--quick) 不一致，跳过比较", file=sys.stderr)
+    elif comparable and baseline.get("machine", {}).get("cpus") != os.cpu_count():
+        print("提示：基线来自 CPU 核数不同的机器，结果仅供参考", file=sys.stderr)
+    regressed = compare(results, baseline if comparable else None, args.threshold)
+
+    print(format_table(results))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"machine": machine_info(), "quick": args.quick, "results": results}, f,
+                      ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        save_baseline(args.baseline, results, args.quick)
+        print(f"基线已保存: {args.baseline}")
+
+    failed = any(not r["ok"] for r in results)
+    return 1 if regressed or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
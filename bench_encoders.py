@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+import b0
+import imgio
+
+
+# ===========================
+# 合成测试素材
+# ===========================
+def make_synthetic_sprite(width=480, height=320, seed=0):
+    """生成带渐变色彩、噪点和柔边 Alpha 的 BGRA 精灵图"""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+
+    sprite = np.empty((height, width, 4), dtype=np.uint8)
+    sprite[:, :, 0] = (xx / width * 255).astype(np.uint8)
+    sprite[:, :, 1] = (yy / height * 255).astype(np.uint8)
+    sprite[:, :, 2] = rng.integers(0, 256, size=(height, width), dtype=np.uint8)
+
+    # 椭圆形柔边 Alpha
+    cx, cy = width / 2.0, height / 2.0
+    dist = np.sqrt(((xx - cx) / cx) ** 2 + ((yy - cy) / cy) ** 2)
+    sprite[:, :, 3] = (np.clip(1.0 - dist, 0.0, 1.0) * 4 * 255).clip(0, 255).astype(np.uint8)
+    return sprite
+
+
+def _output_size(path):
+    if os.path.isdir(path):
+        return sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+# ===========================
+# 基准测试
+# ===========================
+def benchmark_profiles(profiles=None, resolution=(1920, 1080), fps=60, frames=120, sprite_size=(480, 320)):
+    """
+    对每个编码配置渲染同一段合成动画，返回编码 fps 与输出体积。
+    未安装 FFmpeg 或编码器不可用的配置记为失败，不影响其余配置。
+    """
+    profiles = profiles or list(b0.ENCODER_PROFILES)
+    work_dir = tempfile.mkdtemp(prefix="b0_bench_")
+    sprite_path = os.path.join(work_dir, "sprite.png")
+    imgio.write_image(sprite_path, make_synthetic_sprite(*sprite_size))
+
+    # 速度与距离按帧数反推，保证各配置渲染帧数一致
+    speed = 240.0
+    distance = speed * frames / fps
+
+    results = []
+    try:
+        for name in profiles:
+            out_path = os.path.join(work_dir, f"out_{name}")
+            row = {"profile": name, "frames": frames}
+            t0 = time.perf_counter()
+            try:
+                final_path = b0.render_video(sprite_path, out_path, resolution, fps, 15.0, distance, speed, name)
+                elapsed = time.perf_counter() - t0
+                row.update(ok=True, seconds=round(elapsed, 3), fps=round(frames / elapsed, 2),
+                           bytes=_output_size(final_path))
+            except Exception as e:
+                row.update(ok=False, error=str(e).splitlines()[0])
+            results.append(row)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def format_table(results):
+    lines = [f"{'profile':<14}{'fps':>10}{'seconds':>10}{'size (MB)':>12}"]
+    for row in results:
+        if row["ok"]:
+            lines.append(f"{row['profile']:<14}{row['fps']:>10.2f}{row['seconds']:>10.3f}"
+                         f"{row['bytes'] / 1024 / 1024:>12.2f}")
+        else:
+            lines.append(f"{row['profile']:<14}  失败: {row['error']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="b0 编码配置基准测试 (合成精灵图)")
+    parser.add_argument("--profiles", nargs="*", help="要测试的配置，默认全部")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    results = benchmark_profiles(args.profiles, (args.width, args.height), args.fps, args.frames)
+    print(format_table(results))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
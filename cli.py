@@ -0,0 +1,409 @@
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+
+import jobs
+import tracing
+
+# ===========================
+# 无界面命令行入口
+# ===========================
+# 单个任务:
+#   python cli.py crop D:/imgs --top 10 --bottom -20
+#   python cli.py render a.png out/a.mov --fps 60 --distance 800 --speed 200
+# 批量任务清单:
+#   python cli.py run manifest.json --workers 4
+#
+# 清单格式 (JSON):
+# {
+#   "workers": 4,
+#   "defaults": {"render": {"fps": 60, "encoder": "prores4444"}},
+#   "jobs": [
+#     {"command": "ppt-gen", "template": "t.pptx", "txt": "names.txt", "output": "out/names.pptx"},
+#     {"command": "remove-bg", "folder": "imgs", "color": "255,255,255", "tolerance": 10},
+#     {"command": "render", "image": "a.png", "output": "out/a.mov", "distance": 800, "speed": 200}
+#   ]
+# }
+# 字段名与子命令的参数名相同 (横线换成下划线)，相对路径以清单文件所在目录为基准。
+# 结果以 JSON 输出到 stdout；--progress 时进度事件逐行 (JSON Lines) 写到 stderr。
+# 任务执行期间 stdout 重定向到 stderr，工具模块打印的诊断信息不会混进结果 JSON。
+# 批处理任务的结果带 failed (失败文件数)，大于 0 时该任务记为失败。
+# 工具模块只在用到的子命令里导入，例如只跑 crop 不会加载 python-pptx / b0。
+#
+# 退出码: 0 全部成功，1 有任务失败，2 参数 / 清单错误，130 被中断。
+
+# 参数: (名称, 类型, 默认值, 说明)；默认值为 REQUIRED 的是必填项 (单任务模式下为位置参数)
+REQUIRED = object()
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+COMMANDS = {
+    "ppt-gen": {
+        "help": "按 TXT 每行生成一页 PPT (a0)",
+        "params": [
+            ("template", str, REQUIRED, "PPTX 模板"),
+            ("txt", str, REQUIRED, "TXT 数据 (每行一页)"),
+            ("output", str, REQUIRED, "输出 PPTX"),
+            ("placeholder", str, "{name}", "占位符"),
+            ("incremental", _bool, True, "输出已存在时只重写数据有变化的页"),
+        ],
+        "paths": ("template", "txt", "output"),
+    },
+    "ppt-modify": {
+        "help": "PPT 改色 / 去空格 / 删除空白文本框 (a1)",
+        "params": [
+            ("input", str, REQUIRED, "输入 PPTX"),
+            ("output", str, REQUIRED, "输出 PPTX"),
+            ("color", str, None, "字体颜色 r,g,b (省略则不改色)"),
+            ("remove_spaces", _bool, False, "去除所有空格/换行符"),
+            ("remove_empty", _bool, True, "删除空白文本框"),
+        ],
+        "paths": ("input", "output"),
+    },
+    "export-png": {
+        "help": "PPT 逐页导出透明 PNG (a2，仅 Windows + PowerPoint)",
+        "params": [
+            ("input", str, REQUIRED, "输入 PPT"),
+            ("output_dir", str, REQUIRED, "输出文件夹"),
+            ("dpi", str, "288", "DPI (30~3000)；多个值如 96,150,300 时只导出最高 DPI，其余缩放生成"),
+            ("ratio", str, "16:9", "强制比例: 原比例 / 16:9 / 4:3 / 1:1"),
+            ("size", str, None, "二次裁切/填充到 WxH (如 3840x2160)"),
+            ("anchor", str, "左上", "裁切/填充锚点 (左上 / 居中 / 左下 / 右上 / 右下)"),
+        ],
+        "paths": ("input", "output_dir"),
+    },
+    "dpi-pyramid": {
+        "help": "由已导出的高 DPI PNG 缩放生成其他 DPI，存入 <dpi>dpi 子文件夹 (a2，不需要 PowerPoint)",
+        "params": [
+            ("src_dir", str, REQUIRED, "高 DPI PNG 所在文件夹"),
+            ("src_dpi", int, REQUIRED, "源图片的 DPI"),
+            ("dpis", str, REQUIRED, "要生成的 DPI，如 96,150"),
+            ("output_dir", str, REQUIRED, "输出根文件夹"),
+        ],
+        "paths": ("src_dir", "output_dir"),
+    },
+    "atlas": {
+        "help": "把文件夹中的 PNG 去透明边后打包为图集 + JSON 帧索引",
+        "params": [
+            ("folder", str, REQUIRED, "PNG 文件夹"),
+            ("output_dir", str, REQUIRED, "输出文件夹"),
+            ("name", str, "atlas", "输出文件名前缀"),
+            ("max_size", int, 4096, "图集最大边长"),
+            ("padding", int, 2, "帧间距 (像素)"),
+            ("trim", _bool, True, "裁掉四周透明像素"),
+            ("pot", _bool, False, "图集尺寸取 2 的幂"),
+            ("include", str, "", "只打包匹配的文件 (通配符，分号分隔)"),
+            ("exclude", str, "", "排除匹配的文件 / 子文件夹"),
+            ("recursive", _bool, False, "包含子文件夹"),
+        ],
+        "paths": ("folder", "output_dir"),
+    },
+    "crop": {
+        "help": "批量裁切/扩展图片，正数裁切、负数扩展 (a2，覆盖源文件)",
+        "params": [
+            ("folder", str, REQUIRED, "图片文件夹"),
+            ("top", int, 0, "上"),
+            ("bottom", int, 0, "下"),
+            ("left", int, 0, "左"),
+            ("right", int, 0, "右"),
+            ("include", str, "", "只处理匹配的文件 (通配符，分号分隔)"),
+            ("exclude", str, "", "排除匹配的文件 / 子文件夹"),
+            ("recursive", _bool, False, "包含子文件夹"),
+        ],
+        "paths": ("folder",),
+    },
+    "remove-bg": {
+        "help": "批量去除纯色背景 (a2，覆盖源文件)",
+        "params": [
+            ("folder", str, REQUIRED, "图片文件夹"),
+            ("color", str, "255,255,255", "背景色 r,g,b"),
+            ("tolerance", int, 10, "容差 0~100"),
+            ("include", str, "", "只处理匹配的文件 (通配符，分号分隔)"),
+            ("exclude", str, "", "排除匹配的文件 / 子文件夹"),
+            ("recursive", _bool, False, "包含子文件夹"),
+        ],
+        "paths": ("folder",),
+    },
+    "render": {
+        "help": "图片平移动画渲染为 MOV / 序列 (b0)",
+        "params": [
+            ("image", str, REQUIRED, "源图片"),
+            ("output", str, REQUIRED, "输出路径"),
+            ("resolution", str, "1080p", "1080p / 4k / WxH"),
+            ("fps", int, 60, "帧率"),
+            ("angle", float, 0.0, "运动角度 (度)"),
+            ("distance", float, 500.0, "距离 (像素)"),
+            ("speed", float, 100.0, "速度 (像素/秒)"),
+            ("encoder", str, "prores4444", "编码配置"),
+            ("motion_blur", int, 0, "运动模糊子帧数"),
+            ("vfr", _bool, False, "省略重复帧，输出可变帧率 (视频或 frames.ffconcat)"),
+            ("segment_frames", int, 0, "分段编码帧数 (断点续渲)"),
+        ],
+        "paths": (),  # 由 render_queue.normalize_job 处理
+    },
+}
+
+
+# ===========================
+# 任务构建
+# ===========================
+def normalize_job(raw, base_dir="", defaults=None):
+    """补全一条任务的默认值、解析相对路径并做类型转换，返回标准化后的 dict"""
+    command = raw.get("command")
+    spec = COMMANDS.get(command)
+    if spec is None:
+        raise ValueError(f"未知的命令: {command}\n可选: {', '.join(COMMANDS)}")
+    merged = dict((defaults or {}).get(command, {}))
+    merged.update(raw)
+
+    job = {"command": command}
+    for name, kind, default, _ in spec["params"]:
+        value = merged.get(name, default)
+        if value is REQUIRED:
+            raise ValueError(f"{command} 任务缺少字段: {name}")
+        job[name] = None if value is None else kind(value)
+    for name in spec["paths"]:
+        if not os.path.isabs(job[name]):
+            job[name] = os.path.join(base_dir, job[name])
+    if command == "render":
+        job["base_dir"] = base_dir
+    return job
+
+
+def load_manifest(path):
+    """读取任务清单，返回 (任务列表, 清单中的 workers 设置)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {"jobs": data}
+    base_dir = os.path.dirname(os.path.abspath(path))
+    defaults = data.get("defaults", {})
+    job_list = [normalize_job(raw, base_dir, defaults) for raw in data.get("jobs", [])]
+    return job_list, data.get("workers")
+
+
+def _run_ppt_gen(job, progress=None, cancel_token=None):
+    a0 = importlib.import_module("a0")
+    pages = a0.generate_ppt(job["template"], job["txt"], job["output"], job["placeholder"],
+                            progress=progress, cancel_token=cancel_token, incremental=job["incremental"])
+    return {"output": job["output"], "pages": pages}
+
+
+def _run_ppt_modify(job, progress=None, cancel_token=None):
+    a1 = importlib.import_module("a1")
+    do_color = job["color"] is not None
+    rgb = a1.parse_rgb(job["color"]) if do_color else (0, 0, 0)
+    pages = a1.modify_ppt(job["input"], job["output"], rgb, do_color, job["remove_spaces"], job["remove_empty"],
+                          progress=progress, cancel_token=cancel_token)
+    return {"output": job["output"], "pages": pages}
+
+
+def _run_export_png(job, progress=None, cancel_token=None):
+    a2 = importlib.import_module("a2")
+    size = None
+    if job["size"]:
+        w, _, h = job["size"].lower().partition("x")
+        size = (int(w), int(h))
+    dpis = a2.parse_dpi_list(job["dpi"])
+    if len(dpis) > 1:
+        result = a2.export_slides_pyramid(job["input"], job["output_dir"], dpis, job["ratio"],
+                                          size, job["anchor"], progress=progress, cancel_token=cancel_token)
+    else:
+        result = a2.export_slides_png(job["input"], job["output_dir"], dpis[0], job["ratio"],
+                                      size, job["anchor"], progress=progress, cancel_token=cancel_token)
+    result["size"] = list(result["size"])
+    return result
+
+
+def _run_dpi_pyramid(job, progress=None, cancel_token=None):
+    a2 = importlib.import_module("a2")
+    return a2.derive_dpi_pyramid(job["src_dir"], job["src_dpi"], a2.parse_dpi_list(job["dpis"]), job["output_dir"],
+                                 progress=progress, cancel_token=cancel_token)
+
+
+def _run_atlas(job, progress=None, cancel_token=None):
+    atlas = importlib.import_module("atlas")
+    return atlas.build_atlas(job["folder"], job["output_dir"], job["name"], job["max_size"], job["padding"],
+                             job["trim"], job["pot"], job["include"], job["exclude"], job["recursive"],
+                             progress=progress, cancel_token=cancel_token)
+
+
+def _run_crop(job, progress=None, cancel_token=None):
+    a2 = importlib.import_module("a2")
+    success, total, failed = a2.batch_crop_extend(job["folder"], job["top"], job["bottom"], job["left"], job["right"],
+                                                  job["include"], job["exclude"], job["recursive"],
+                                                  progress=progress, cancel_token=cancel_token)
+    return {"folder": job["folder"], "success": success, "total": total, "failed": failed}
+
+
+def _run_remove_bg(job, progress=None, cancel_token=None):
+    a2 = importlib.import_module("a2")
+    success, total, failed = a2.batch_remove_bg(job["folder"], a2.parse_rgb(job["color"]), job["tolerance"],
+                                                job["include"], job["exclude"], job["recursive"],
+                                                progress=progress, cancel_token=cancel_token)
+    return {"folder": job["folder"], "success": success, "total": total, "failed": failed}
+
+
+def _failed_count(result):
+    """批处理结果中失败的文件 / 页数；没有该字段的结果视为 0"""
+    return result.get("failed", 0) if isinstance(result, dict) else 0
+
+
+def _run_render(job, progress=None, cancel_token=None):
+    render_queue = importlib.import_module("render_queue")
+    b0 = render_queue.b0
+    params = {k: v for k, v in job.items() if k not in ("command", "base_dir")}
+    spec = render_queue.normalize_job(params, job["base_dir"])
+    telemetry = b0.RenderTelemetry()
+    output = b0.render_video(spec["image"], spec["output"], spec["resolution"], spec["fps"], spec["angle"],
+                             spec["distance"], spec["speed"], spec["encoder"],
+                             progress_callback=lambda percent: progress and progress(int(percent), 100),
+                             telemetry=telemetry, motion_blur=spec["motion_blur"], vfr=spec["vfr"],
+                             cancel_token=cancel_token, segment_frames=spec["segment_frames"])
+    return {"output": output, "frames": telemetry.total_frames, "skipped_frames": telemetry.frames_skipped}
+
+
+RUNNERS = {
+    "ppt-gen": _run_ppt_gen,
+    "ppt-modify": _run_ppt_modify,
+    "export-png": _run_export_png,
+    "dpi-pyramid": _run_dpi_pyramid,
+    "atlas": _run_atlas,
+    "crop": _run_crop,
+    "remove-bg": _run_remove_bg,
+    "render": _run_render,
+}
+
+
+# ===========================
+# 执行
+# ===========================
+def _job_label(job):
+    for key in ("output", "output_dir", "folder"):
+        if job.get(key):
+            return job[key]
+    return job["command"]
+
+
+def _exclusive_key(job):
+    """PowerPoint 导出串行；同一文件夹上的原地批处理按清单顺序串行，避免互相覆盖"""
+    if job["command"] == "export-png":
+        return "powerpoint"
+    if job.get("folder"):
+        return "folder:" + os.path.normcase(os.path.abspath(job["folder"]))
+    return None
+
+
+def run_jobs(job_list, workers=None, on_event=None):
+    """在共享任务管理器中并行执行，按清单顺序返回结果列表"""
+    workers = max(1, workers or min(4, os.cpu_count() or 1))
+    manager = jobs.JobManager(max_workers=workers)
+    results = [None] * len(job_list)
+    finished = threading.Semaphore(0)
+
+    def notify(**event):
+        if on_event:
+            on_event(event)
+
+    def on_progress(index, job):
+        notify(event="progress", index=index, done=job.done, total=job.total, message=job.message)
+
+    def on_done(index, job):
+        failed = _failed_count(job.result) if job.state == "done" else 0
+        result = {"index": index, "command": job_list[index]["command"], "ok": job.state == "done" and not failed,
+                  "state": job.state, "seconds": round((job.ended or time.time()) - (job.started or job.created), 3)}
+        if job.state == "done":
+            result["result"] = job.result
+            if failed:
+                result["error"] = f"{failed} 个文件处理失败"
+        else:
+            result["error"] = job.error or "已取消"
+        results[index] = result
+        notify(event=job.state, **result)
+        finished.release()
+
+    for index, job in enumerate(job_list):
+        manager.submit(RUNNERS[job["command"]], job, tool=job["command"], title=_job_label(job),
+                       exclusive=_exclusive_key(job),
+                       on_progress=lambda j, i=index: on_progress(i, j),
+                       on_done=lambda j, i=index: on_done(i, j))
+        notify(event="queued", index=index, command=job["command"], target=_job_label(job))
+
+    try:
+        for _ in job_list:
+            # 带超时轮询，Windows 上阻塞的 acquire 收不到 Ctrl+C
+            while not finished.acquire(timeout=0.5):
+                pass
+    except KeyboardInterrupt:
+        manager.shutdown(wait=True)
+        raise
+    manager.shutdown()
+    return results, workers
+
+
+def _add_command_parser(subparsers, name, spec):
+    sub = subparsers.add_parser(name, help=spec["help"], description=spec["help"])
+    for param, kind, default, help_text in spec["params"]:
+        if default is REQUIRED:
+            sub.add_argument(param, help=help_text)
+        else:
+            sub.add_argument("--" + param.replace("_", "-"), dest=param,
+                             type=str if kind is _bool else kind, default=default,
+                             help=f"{help_text} (默认 {default})")
+    return sub
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多功能工具箱 (无界面批处理)")
+    parser.add_argument("--workers", type=int, default=0, help="并行任务数 (默认 min(4, CPU 核数))")
+    parser.add_argument("--progress", action="store_true", help="把进度事件以 JSON Lines 写到 stderr")
+    parser.add_argument("--trace", metavar="PATH", help="记录追踪并导出 Chrome trace JSON (汇总表写到 stderr)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    sub_run = subparsers.add_parser("run", help="执行 JSON 任务清单")
+    sub_run.add_argument("manifest", help="任务清单 JSON")
+    for name, spec in COMMANDS.items():
+        _add_command_parser(subparsers, name, spec)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "run":
+            job_list, manifest_workers = load_manifest(args.manifest)
+        else:
+            raw = {k: v for k, v in vars(args).items() if k not in ("workers", "progress", "trace")}
+            job_list, manifest_workers = [normalize_job(raw, os.getcwd())], None
+    except (OSError, ValueError, TypeError) as e:
+        print(json.dumps({"error": str(e)}, ensure_ascii=False))
+        return 2
+
+    def on_event(event):
+        print(json.dumps(event, ensure_ascii=False), file=sys.stderr, flush=True)
+
+    if args.trace:
+        tracing.enable()
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            results, workers = run_jobs(job_list, args.workers or manifest_workers,
+                                        on_event if args.progress else None)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if args.trace:
+            tracing.export_chrome(args.trace)
+            print(tracing.format_summary(), file=sys.stderr)
+    print(json.dumps({"workers": workers, "ok": all(r["ok"] for r in results), "results": results},
+                     ensure_ascii=False, indent=2))
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+import argparse
+import csv
+import math
+import sys
+
+import numpy as np
+
+# ===========================
+# FPS / 时长 / 距离 / 速度 换算
+# ===========================
+# 五个量之间的关系:
+#   duration = distance / speed          (秒)
+#   frames   = int(duration * fps)       (向零截断；<= 0 时按 1 秒处理，即 frames = fps)
+#   px_per_frame = speed / fps           (每帧位移，像素)
+# 单行换算与批量换算共用同一套公式，b0 的渲染帧数与每帧位移也从这里取，
+# 保证计算器里看到的帧数就是实际渲染的帧数。
+
+FIELDS = ("fps", "duration", "distance", "speed", "frames")
+OUTPUT_FIELDS = FIELDS + ("px_per_frame",)
+
+
+def total_frames(distance, speed, fps):
+    """渲染总帧数 (与 b0 历史行为一致: 不足 1 帧时按 1 秒计)"""
+    n = int((distance / speed) * fps)
+    if n <= 0:
+        n = int(fps)
+    return n
+
+
+def frame_displacement(speed, angle, fps):
+    """沿 angle (度) 方向运动时每帧的位移 (dx, dy)，单位像素"""
+    rad = math.radians(angle)
+    return speed * math.cos(rad) / fps, speed * math.sin(rad) / fps
+
+
+def solve(fps=None, duration=None, distance=None, speed=None, frames=None):
+    """
+    已知其中若干个量，推算其余的量并返回完整的 dict (含 px_per_frame)。
+    信息不足以推出的字段为 None。
+    """
+    row = {"fps": fps, "duration": duration, "distance": distance, "speed": speed, "frames": frames}
+    out = solve_batch({k: [np.nan if v is None else v] for k, v in row.items()})
+    result = {}
+    for key in OUTPUT_FIELDS:
+        value = out[key][0]
+        if math.isnan(value):
+            result[key] = None
+        elif key == "frames":
+            result[key] = int(value)
+        else:
+            result[key] = float(value)
+    return result
+
+
+def _column(table, key, n):
+    values = table.get(key)
+    if values is None:
+        return np.full(n, np.nan)
+    arr = np.asarray(values, dtype=np.float64).reshape(-1)
+    if arr.shape[0] != n:
+        raise ValueError(f"列长度不一致: {key}")
+    return arr.copy()
+
+
+def _fill(target, mask, values):
+    target[mask] = values[mask]
+
+
+def solve_batch(table):
+    """
+    批量换算：table 为 {字段名: 序列}，缺失值用 None/NaN 表示，缺少的列视为全部未知。
+    全部为数组运算，适合一次性换算成千上万行参数。返回 {字段名: float64 数组}，
+    无法推算的位置为 NaN。
+    """
+    n = max((len(v) for v in table.values()), default=0)
+    cols = {key: _column(table, key, n) for key in FIELDS}
+    fps, duration, distance, speed, frames = (cols[k] for k in FIELDS)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 关系是闭合的，最多两轮即可把能推出的量全部推出
+        for _ in range(2):
+            unknown = np.isnan(duration)
+            _fill(duration, unknown & ~np.isnan(distance) & ~np.isnan(speed), distance / speed)
+            unknown = np.isnan(duration)
+            _fill(duration, unknown & ~np.isnan(frames) & ~np.isnan(fps), frames / fps)
+
+            _fill(distance, np.isnan(distance) & ~np.isnan(speed) & ~np.isnan(duration), speed * duration)
+            _fill(speed, np.isnan(speed) & ~np.isnan(distance) & ~np.isnan(duration), distance / duration)
+            _fill(fps, np.isnan(fps) & ~np.isnan(frames) & ~np.isnan(duration), frames / duration)
+
+            need = np.isnan(frames) & ~np.isnan(duration) & ~np.isnan(fps)
+            # 与 total_frames 相同：向零截断，<= 0 时取 fps
+            computed = np.trunc(duration * fps)
+            computed = np.where(computed <= 0, np.trunc(fps), computed)
+            _fill(frames, need, computed)
+
+        px_per_frame = speed / fps
+
+    out = {"fps": fps, "duration": duration, "distance": distance, "speed": speed, "frames": frames,
+           "px_per_frame": px_per_frame}
+    for key, arr in out.items():
+        arr[~np.isfinite(arr)] = np.nan
+    return out
+
+
+# ===========================
+# CSV 批处理
+# ===========================
+def _parse_cell(text):
+    text = (text or "").strip()
+    return float(text) if text else np.nan
+
+
+def solve_csv(in_path, out_path):
+    """读取含 fps/duration/distance/speed/frames 任意列的 CSV，补全后写出，返回行数"""
+    with open(in_path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+        extra = [c for c in (reader.fieldnames or []) if c not in OUTPUT_FIELDS]
+
+    table = {key: [_parse_cell(r.get(key)) for r in rows] for key in FIELDS if rows and key in rows[0]}
+    if not table:
+        table = {"fps": [np.nan] * len(rows)}
+    out = solve_batch(table)
+
+    with open(out_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(extra + list(OUTPUT_FIELDS))
+        for i, r in enumerate(rows):
+            cells = []
+            for key in OUTPUT_FIELDS:
+                v = out[key][i]
+                if np.isnan(v):
+                    cells.append("")
+                elif key == "frames":
+                    cells.append(str(int(v)))
+                else:
+                    cells.append(f"{v:.6g}")
+            writer.writerow([r.get(c, "") for c in extra] + cells)
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FPS / 时长 / 距离 / 速度 换算")
+    parser.add_argument("--csv", nargs=2, metavar=("IN", "OUT"), help="批量换算 CSV 文件")
+    for key in FIELDS:
+        parser.add_argument(f"--{key}", type=float)
+    args = parser.parse_args(argv)
+
+    if args.csv:
+        count = solve_csv(*args.csv)
+        print(f"已换算 {count} 行 -> {args.csv[1]}")
+        return 0
+
+    result = solve(**{k: getattr(args, k) for k in FIELDS})
+    for key in OUTPUT_FIELDS:
+        print(f"{key:<14}{'' if result[key] is None else result[key]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
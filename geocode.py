@@ -0,0 +1,368 @@
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+import http_client
+
+# ===========================
+# 批量地理编码 (地址 -> 坐标)
+# ===========================
+# Geocoder 先批量查询 SQLite 缓存，只把未命中的地址按提供方的批大小分组请求网络；
+# "查无此地址" 也会写入缓存，同一地址永远只请求一次 (网络错误不缓存，下次重试)。
+# 提供方实现 GeocodeProvider 接口即可接入；MockProvider 不联网，用于离线测试与吞吐量基准。
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "geocode_cache.sqlite3")
+
+
+def normalize_address(address):
+    """缓存键：去掉首尾空白并合并连续空白"""
+    return " ".join(str(address).split())
+
+
+# ===========================
+# 提供方接口
+# ===========================
+class GeocodeProvider:
+    """
+    name        : 写入缓存的提供方标识 (不同提供方的坐标系/精度不同，分开缓存)
+    batch_size  : 单次请求最多携带的地址数
+    rate_limit  : 每秒最多请求数 (0 表示不限)
+    concurrency : 同时在途的请求数
+    geocode_batch() 返回与输入等长的列表，元素为 {"lng", "lat", "formatted"} 或 None (查无结果)；
+    整批失败时直接抛出异常。
+    """
+
+    name = "base"
+    batch_size = 1
+    rate_limit = 0
+    concurrency = 4
+
+    async def geocode_batch(self, client, addresses):
+        raise NotImplementedError
+
+
+class MockProvider(GeocodeProvider):
+    """离线模拟：按地址哈希生成国内范围内的稳定坐标，含 "不存在" 的地址视为查无结果"""
+
+    name = "mock"
+
+    def __init__(self, batch_size=20, rate_limit=0, concurrency=8, latency=0.0):
+        self.batch_size = batch_size
+        self.rate_limit = rate_limit
+        self.concurrency = concurrency
+        self.latency = latency
+        self.requests = 0
+
+    async def geocode_batch(self, client, addresses):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        results = []
+        for addr in addresses:
+            if "不存在" in addr:
+                results.append(None)
+                continue
+            h = hashlib.sha1(addr.encode("utf-8")).digest()
+            lng = 73.5 + int.from_bytes(h[:4], "big") / 2 ** 32 * (135.0 - 73.5)
+            lat = 18.0 + int.from_bytes(h[4:8], "big") / 2 ** 32 * (53.5 - 18.0)
+            results.append({"lng": round(lng, 6), "lat": round(lat, 6), "formatted": addr})
+        return results
+
+
+class AmapProvider(GeocodeProvider):
+    """高德 Web 服务地理编码 (batch=true 时一次最多 10 个地址，GCJ-02 坐标)"""
+
+    name = "amap"
+    batch_size = 10
+    rate_limit = 50
+    concurrency = 8
+    URL = "https://restapi.amap.com/v3/geocode/geo"
+
+    def __init__(self, key, city=None):
+        if not key:
+            raise ValueError("高德地理编码需要 Web 服务 Key")
+        self.key = key
+        self.city = city
+
+    async def geocode_batch(self, client, addresses):
+        params = {"key": self.key, "address": "|".join(addresses), "batch": "true", "output": "JSON"}
+        if self.city:
+            params["city"] = self.city
+        resp = await client.get(f"{self.URL}?{urlencode(params)}", use_cache=False)
+        resp.raise_for_status()
+        data = resp.json()
+        if data.get("status") != "1":
+            raise RuntimeError(f"高德接口错误: {data.get('info')} ({data.get('infocode')})")
+
+        results = []
+        for item in data.get("geocodes", [])[:len(addresses)]:
+            location = item.get("location")
+            if not location or not isinstance(location, str):
+                results.append(None)
+                continue
+            lng, lat = location.split(",")
+            formatted = item.get("formatted_address")
+            results.append({"lng": float(lng), "lat": float(lat),
+                            "formatted": formatted if isinstance(formatted, str) else ""})
+        results.extend([None] * (len(addresses) - len(results)))
+        return results
+
+
+PROVIDERS = {"mock": MockProvider, "amap": AmapProvider}
+
+
+def make_provider(name, **options):
+    cls = PROVIDERS.get(name)
+    if cls is None:
+        raise ValueError(f"未知的地理编码提供方: {name} (可选: {', '.join(PROVIDERS)})")
+    return cls(**options)
+
+
+# ===========================
+# 限速
+# ===========================
+class RateLimiter:
+    """按固定间隔发放请求时隙的异步限速器"""
+
+    def __init__(self, rate_per_sec):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec and rate_per_sec > 0 else 0.0
+        self._next = 0.0
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+# ===========================
+# SQLite 缓存
+# ===========================
+class GeocodeCache:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or DEFAULT_DB_PATH
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocode (
+                provider  TEXT NOT NULL,
+                address   TEXT NOT NULL,
+                found     INTEGER NOT NULL,
+                lng       REAL,
+                lat       REAL,
+                formatted TEXT,
+                updated   REAL NOT NULL,
+                PRIMARY KEY (provider, address)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def lookup(self, provider, addresses, chunk=500):
+        """批量查询缓存，返回 {地址: 结果或 None (已缓存的查无结果)}；未缓存的地址不在返回值中"""
+        found = {}
+        for i in range(0, len(addresses), chunk):
+            part = addresses[i:i + chunk]
+            marks = ",".join("?" * len(part))
+            rows = self.conn.execute(
+                f"SELECT address, found, lng, lat, formatted FROM geocode WHERE provider = ? AND address IN ({marks})",
+                [provider] + part)
+            for address, ok, lng, lat, formatted in rows:
+                found[address] = {"lng": lng, "lat": lat, "formatted": formatted} if ok else None
+        return found
+
+    def store(self, provider, pairs):
+        """写入 [(地址, 结果或 None)]，一次事务"""
+        now = time.time()
+        rows = [(provider, addr, 0 if r is None else 1, None if r is None else r["lng"],
+                 None if r is None else r["lat"], None if r is None else r.get("formatted"), now)
+                for addr, r in pairs]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def count(self, provider=None):
+        if provider is None:
+            return self.conn.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM geocode WHERE provider = ?", (provider,)).fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+# ===========================
+# 批量编码
+# ===========================
+class Geocoder:
+    """
+    geocode(addresses) 返回与输入等长的结果列表:
+    {"address", "status": ok / not_found / error, "lng", "lat", "formatted", "source": cache / network, "error"}
+    progress(done, total) 在每批完成时调用 (工作线程中)。
+    """
+
+    def __init__(self, provider, db_path=None):
+        self.provider = provider
+        self.cache = GeocodeCache(db_path)
+        self.stats = {"cache_hits": 0, "network": 0, "requests": 0, "errors": 0}
+
+    def close(self):
+        self.cache.close()
+
+    async def _fetch(self, misses, progress, total, done_before):
+        provider = self.provider
+        limiter = RateLimiter(provider.rate_limit)
+        sem = asyncio.Semaphore(max(1, provider.concurrency))
+        batches = [misses[i:i + provider.batch_size] for i in range(0, len(misses), provider.batch_size)]
+        results = {}
+        errors = {}
+        done = [done_before]
+
+        client = http_client.AsyncHTTPClient(max_per_host=max(1, provider.concurrency), timeout=15.0, retries=2)
+
+        async def run(batch):
+            async with sem:
+                await limiter.acquire()
+                self.stats["requests"] += 1
+                try:
+                    found = await provider.geocode_batch(client, batch)
+                except Exception as e:
+                    for addr in batch:
+                        errors[addr] = str(e)
+                else:
+                    pairs = list(zip(batch, found))
+                    self.cache.store(provider.name, pairs)
+                    results.update(pairs)
+            done[0] += len(batch)
+            if progress:
+                progress(done[0], total)
+
+        try:
+            await asyncio.gather(*(run(b) for b in batches))
+        finally:
+            await client.close()
+        return results, errors
+
+    def geocode(self, addresses, progress=None):
+        keys = [normalize_address(a) for a in addresses]
+        unique = [k for k in dict.fromkeys(keys) if k]
+        cached = self.cache.lookup(self.provider.name, unique)
+        misses = [k for k in unique if k not in cached]
+        self.stats["cache_hits"] += len(unique) - len(misses)
+        self.stats["network"] += len(misses)
+        if progress:
+            progress(len(unique) - len(misses), len(unique))
+
+        fetched, errors = {}, {}
+        if misses:
+            fetched, errors = asyncio.run(self._fetch(misses, progress, len(unique), len(unique) - len(misses)))
+        self.stats["errors"] += len(errors)
+
+        out = []
+        for addr, key in zip(addresses, keys):
+            row = {"address": addr, "status": "error", "lng": None, "lat": None, "formatted": None,
+                   "source": "cache" if key in cached else "network", "error": None}
+            if not key:
+                row["error"] = "空地址"
+            elif key in errors:
+                row["error"] = errors[key]
+            else:
+                r = cached[key] if key in cached else fetched.get(key)
+                if r is None:
+                    row["status"] = "not_found"
+                else:
+                    row.update(status="ok", lng=r["lng"], lat=r["lat"], formatted=r["formatted"])
+            out.append(row)
+        return out
+
+
+# ===========================
+# CSV 批处理
+# ===========================
+def geocode_csv(in_path, out_path, provider, column="address", db_path=None, progress=None):
+    """为 CSV 的地址列追加 lng / lat / formatted / status 列，返回 Geocoder.stats"""
+    with open(in_path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.DictReader(f)
+        fieldnames = list(reader.fieldnames or [])
+        rows = list(reader)
+    if column not in fieldnames:
+        raise ValueError(f"CSV 中没有地址列: {column} (现有列: {', '.join(fieldnames)})")
+
+    geocoder = Geocoder(provider, db_path)
+    try:
+        results = geocoder.geocode([r[column] for r in rows], progress)
+    finally:
+        geocoder.close()
+
+    extra = ["lng", "lat", "formatted", "status"]
+    with open(out_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames + [c for c in extra if c not in fieldnames])
+        writer.writeheader()
+        for row, res in zip(rows, results):
+            row = dict(row)
+            row.update(lng="" if res["lng"] is None else res["lng"], lat="" if res["lat"] is None else res["lat"],
+                       formatted=res["formatted"] or "", status=res["error"] or res["status"])
+            writer.writerow(row)
+    return dict(geocoder.stats, rows=len(rows))
+
+
+def benchmark(count=10000, unique=2000, latency=0.02, batch_size=20, concurrency=8, db_path=None):
+    """用 MockProvider 测量冷缓存与热缓存下的吞吐量 (地址/秒)"""
+    tmp_dir = None
+    if db_path is None:
+        tmp_dir = tempfile.mkdtemp(prefix="geocode_bench_")
+        db_path = os.path.join(tmp_dir, "bench.sqlite3")
+    addresses = [f"测试市测试区第{i % unique}号" for i in range(count)]
+    provider = MockProvider(batch_size=batch_size, concurrency=concurrency, latency=latency)
+    report = {}
+    try:
+        for label in ("cold", "warm"):
+            geocoder = Geocoder(provider, db_path)
+            t0 = time.perf_counter()
+            geocoder.geocode(addresses)
+            elapsed = time.perf_counter() - t0
+            geocoder.close()
+            report[label] = {"seconds": round(elapsed, 3), "addresses_per_sec": round(count / elapsed, 1),
+                             **geocoder.stats}
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量地理编码 (SQLite 缓存)")
+    parser.add_argument("input", nargs="?", help="输入 CSV")
+    parser.add_argument("output", nargs="?", help="输出 CSV")
+    parser.add_argument("--column", default="address", help="地址列名")
+    parser.add_argument("--provider", default="mock", choices=list(PROVIDERS))
+    parser.add_argument("--key", help="提供方 API Key")
+    parser.add_argument("--city", help="限定城市 (高德)")
+    parser.add_argument("--db", help="缓存数据库路径")
+    parser.add_argument("--bench", type=int, metavar="N", help="用模拟提供方对 N 个地址做吞吐量基准")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        print(json.dumps(benchmark(args.bench), ensure_ascii=False, indent=2))
+        return 0
+    if not (args.input and args.output):
+        parser.error("需要输入与输出 CSV 路径")
+
+    options = {"key": args.key, "city": args.city} if args.provider == "amap" else {}
+    stats = geocode_csv(args.input, args.output, make_provider(args.provider, **options), args.column, args.db)
+    print(json.dumps(stats, ensure_ascii=False))
+    return 0 if stats["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+import asyncio
+import json
+import ssl
+import threading
+import time
+from collections import OrderedDict, deque
+from urllib.parse import urlsplit, urljoin
+
+# ===========================
+# 异步 HTTP 客户端 (仅标准库)
+# ===========================
+# - HTTP/1.1 keep-alive 连接池，按 (scheme, host, port) 复用空闲连接
+# - 每个主机的并发上限 + 全局并发上限
+# - 单次请求超时、失败/5xx/429 按指数退避重试 (遵守数值型 Retry-After)；
+#   只有幂等方法 (GET/HEAD) 会自动重发，POST 等请求最多发送一次
+# - GET 200 响应进入带 TTL 的 LRU 缓存；同一 URL 的并发 GET 合并为一次请求
+# - BackgroundLoop 在后台线程运行事件循环，Tk 主循环不会被阻塞
+
+USER_AGENT = "smallpov-toolbox/1.0"
+RETRY_STATUS = (429, 500, 502, 503, 504)
+REDIRECT_STATUS = (301, 302, 303, 307, 308)
+IDEMPOTENT_METHODS = ("GET", "HEAD")
+
+
+class HTTPError(Exception):
+    """HTTP 状态码表示失败"""
+
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status}: {response.url}")
+        self.response = response
+
+
+class _ProtocolError(Exception):
+    """服务端返回了无法解析的响应，或连接在响应中途断开"""
+
+
+class Response:
+    def __init__(self, url, status, reason, headers, body, elapsed, from_cache=False):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers  # 键为小写
+        self.body = body
+        self.elapsed = elapsed
+        self.from_cache = from_cache
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+    def text(self, encoding=None):
+        if encoding is None:
+            ctype = self.headers.get("content-type", "")
+            encoding = "utf-8"
+            for part in ctype.split(";"):
+                part = part.strip()
+                if part.lower().startswith("charset="):
+                    encoding = part[8:].strip('"') or encoding
+        return self.body.decode(encoding, errors="replace")
+
+    def json(self):
+        return json.loads(self.text())
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise HTTPError(self)
+        return self
+
+
+# ===========================
+# TTL + LRU 响应缓存
+# ===========================
+class TTLCache:
+    """容量受限的 LRU 缓存，每个条目带过期时间；只在事件循环线程内使用"""
+
+    def __init__(self, maxsize=256, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# ===========================
+# 连接池
+# ===========================
+class _Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.idle_since = time.monotonic()
+        self.reused = False
+
+    def close(self):
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class AsyncHTTPClient:
+    """
+    连接池化的异步 HTTP/1.1 客户端。必须在同一个事件循环内使用；
+    用完调用 close() 关闭空闲连接。
+    """
+
+    def __init__(self, max_per_host=6, max_connections=64, timeout=10.0, retries=2, backoff=0.5,
+                 cache=None, keepalive_timeout=30.0, max_redirects=5):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = cache if cache is not None else TTLCache()
+        self.keepalive_timeout = keepalive_timeout
+        self.max_redirects = max_redirects
+        self._idle = {}
+        self._host_sems = {}
+        self._global_sem = asyncio.Semaphore(max_connections)
+        self._ssl = None
+        self._inflight = {}
+        self.stats = {"requests": 0, "connections": 0, "reused": 0, "retries": 0}
+
+    # --- 连接管理 ---
+    def _ssl_context(self):
+        if self._ssl is None:
+            self._ssl = ssl.create_default_context()
+        return self._ssl
+
+    async def _acquire(self, key, reuse=True):
+        scheme, host, port = key
+        pool = self._idle.get(key) if reuse else None
+        now = time.monotonic()
+        while pool:
+            conn = pool.pop()
+            if now - conn.idle_since < self.keepalive_timeout and not conn.reader.at_eof():
+                conn.reused = True
+                self.stats["reused"] += 1
+                return conn
+            conn.close()
+        ssl_ctx = self._ssl_context() if scheme == "https" else None
+        reader, writer = await asyncio.open_connection(host, port, ssl=ssl_ctx,
+                                                       server_hostname=host if ssl_ctx else None)
+        self.stats["connections"] += 1
+        return _Connection(reader, writer)
+
+    def _release(self, key, conn):
+        conn.idle_since = time.monotonic()
+        conn.reused = False
+        self._idle.setdefault(key, deque()).append(conn)
+
+    async def close(self):
+        for pool in self._idle.values():
+            for conn in pool:
+                conn.close()
+        self._idle.clear()
+
+    # --- 单次往返 ---
+    async def _read_response(self, reader, method):
+        status_line = await reader.readline()
+        if not status_line:
+            raise _ProtocolError("连接已被服务端关闭")
+        parts = status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise _ProtocolError(f"无效的状态行: {status_line!r}")
+        version, status = parts[0], int(parts[1])
+        reason = parts[2] if len(parts) > 2 else ""
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise _ProtocolError("响应头不完整")
+            if line in (b"\r\n", b"\n"):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            value = value.strip()
+            headers[name] = f"{headers[name]}, {value}" if name in headers else value
+
+        conn_header = headers.get("connection", "").lower()
+        keep_alive = "close" not in conn_header and (version != "HTTP/1.0" or "keep-alive" in conn_header)
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            body = b""
+        elif "chunked" in headers.get("transfer-encoding", "").lower():
+            chunks = []
+            while True:
+                size_line = await reader.readline()
+                if not size_line:
+                    raise _ProtocolError("分块传输中断")
+                size = int(size_line.split(b";")[0].strip(), 16)
+                if size == 0:
+                    # 跳过 trailer
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b"".join(chunks)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return status, reason, headers, body, keep_alive
+
+    def _host_sem(self, key):
+        sem = self._host_sems.get(key)
+        if sem is None:
+            sem = self._host_sems[key] = asyncio.Semaphore(self.max_per_host)
+        return sem
+
+    async def _send_once(self, method, url, headers, body):
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https"):
+            raise ValueError(f"不支持的协议: {url}")
+        host = parts.hostname
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, host, port)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+
+        host_header = host if parts.port is None else f"{host}:{port}"
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {host_header}", f"User-Agent: {USER_AGENT}",
+                 "Accept-Encoding: identity", "Connection: keep-alive"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        if body is not None:
+            lines.append(f"Content-Length: {len(body)}")
+        raw = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b"")
+
+        idempotent = method in IDEMPOTENT_METHODS
+        async with self._global_sem, self._host_sem(key):
+            while True:
+                # 非幂等请求不使用空闲连接：连接可能已被服务端关闭，而这类请求不能重发
+                conn = await self._acquire(key, reuse=idempotent)
+                done = False
+                try:
+                    conn.writer.write(raw)
+                    await conn.writer.drain()
+                    status, reason, resp_headers, resp_body, keep_alive = await self._read_response(
+                        conn.reader, method)
+                    done = True
+                except (_ProtocolError, ConnectionError, asyncio.IncompleteReadError):
+                    if conn.reused and idempotent:
+                        # 复用的空闲连接可能已被服务端关闭：换一条新连接重发，不计入重试次数
+                        conn.close()
+                        continue
+                    raise
+                finally:
+                    if not done:
+                        conn.close()
+                if keep_alive:
+                    self._release(key, conn)
+                else:
+                    conn.close()
+                return status, reason, resp_headers, resp_body
+
+    # --- 对外接口 ---
+    async def request(self, method, url, headers=None, body=None, timeout=None, use_cache=True, cache_ttl=None):
+        """
+        发送请求并返回 Response。GET/HEAD 的网络错误与 RETRY_STATUS 会按指数退避重试，
+        其他方法不重试；重试用尽后网络错误直接抛出，HTTP 错误状态以 Response 返回 (可调用 raise_for_status)。
+        """
+        method = method.upper()
+        cache_key = (method, url) if method == "GET" and use_cache and body is None else None
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return Response(url, cached.status, cached.reason, cached.headers, cached.body, 0.0,
+                                from_cache=True)
+            # 同一 URL 已有请求在途时直接等待它的结果，不重复发请求
+            pending = self._inflight.get(cache_key)
+            if pending is None:
+                pending = asyncio.ensure_future(self._request(method, url, headers, body, timeout, cache_key,
+                                                              cache_ttl))
+                self._inflight[cache_key] = pending
+                pending.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+            return await asyncio.shield(pending)
+        return await self._request(method, url, headers, body, timeout, None, cache_ttl)
+
+    async def _request(self, method, url, headers, body, timeout, cache_key, cache_ttl):
+        timeout = self.timeout if timeout is None else timeout
+        t0 = time.perf_counter()
+        attempt = 0
+        current = url
+        redirects = 0
+        while True:
+            self.stats["requests"] += 1
+            delay = None
+            retries = self.retries if method in IDEMPOTENT_METHODS else 0
+            try:
+                status, reason, resp_headers, resp_body = await asyncio.wait_for(
+                    self._send_once(method, current, headers, body), timeout)
+            except (OSError, asyncio.TimeoutError, _ProtocolError, asyncio.IncompleteReadError):
+                if attempt >= retries:
+                    raise
+            else:
+                if status in REDIRECT_STATUS and "location" in resp_headers and redirects < self.max_redirects:
+                    redirects += 1
+                    current = urljoin(current, resp_headers["location"])
+                    if status == 303:
+                        method, body = "GET", None
+                    continue
+                if status not in RETRY_STATUS or attempt >= retries:
+                    resp = Response(current, status, reason, resp_headers, resp_body, time.perf_counter() - t0)
+                    if cache_key is not None and status == 200:
+                        self.cache.set(cache_key, resp, cache_ttl)
+                    return resp
+                retry_after = resp_headers.get("retry-after", "")
+                if retry_after.isdigit():
+                    delay = min(float(retry_after), 30.0)
+
+            attempt += 1
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay if delay is not None else self.backoff * (2 ** (attempt - 1)))
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def get_many(self, urls, **kwargs):
+        """并发获取多个 URL，结果与输入顺序一致；失败项为异常对象"""
+        return await asyncio.gather(*(self.get(u, **kwargs) for u in urls), return_exceptions=True)
+
+
+# ===========================
+# 后台事件循环
+# ===========================
+class BackgroundLoop:
+    """
+    在守护线程中运行 asyncio 事件循环。
+    submit() 返回 concurrent.futures.Future，UI 在回调中用 top.after(0, ...) 切回主线程。
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro, callback=None):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
+    def call(self, fn, *args):
+        """在事件循环线程中同步执行 fn 并返回结果 (用于创建绑定到该循环的对象)"""
+        async def _wrap():
+            return fn(*args)
+        return self.submit(_wrap()).result()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
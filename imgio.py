@@ -0,0 +1,248 @@
+import os
+import stat
+import tempfile
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+import tracing
+
+# ===========================
+# 统一图片读写
+# ===========================
+# 所有工具读图都走 read_bgra：文件通过 memmap 直接交给 imdecode (不再先拷贝一份到内存)，
+# 灰度 / BGR 转 BGRA 只做一次 cvtColor，已是 4 通道的图片不再复制。
+#
+# cache=True 时解码结果进入进程内 LRU 缓存 (按字节预算淘汰)，键为 绝对路径 + mtime + 大小，
+# 同一张源图在预览 / 接触表 / 正式渲染 / 批量队列之间只解码一次。
+# 缓存中的数组是只读共享的；需要就地修改像素的调用方用 cache=False 取得私有副本。
+#
+# 写图统一用 write_image：编码后先写同目录临时文件再 os.replace，
+# 中途失败或被中断不会留下半截文件，也不会破坏原来的文件。
+
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+
+
+def to_bgra(img, dst=None):
+    """灰度 / BGR / BGRA 统一为 BGRA；已是 4 通道且未给 dst 时原样返回 (不复制)"""
+    if len(img.shape) == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGRA, dst=dst)
+    if img.shape[2] == 3:
+        return cv2.cvtColor(img, cv2.COLOR_BGR2BGRA, dst=dst)
+    if dst is not None:
+        dst[:] = img
+        return dst
+    return img
+
+
+def decode_file(path, flags=cv2.IMREAD_UNCHANGED):
+    """解码图片文件 (支持中文路径)，失败时抛出 ValueError"""
+    if os.path.getsize(path) == 0:
+        raise ValueError(f"无法读取图片，请检查文件: {path}")
+    encoded = np.memmap(path, dtype=np.uint8, mode='r')
+    try:
+        with tracing.span("imgio.imdecode", "imgio", bytes=len(encoded)):
+            img = cv2.imdecode(encoded, flags)
+    finally:
+        # Windows 上 memmap 不释放就无法覆盖 / 删除源文件
+        del encoded
+    if img is None:
+        raise ValueError(f"无法读取图片，请检查文件: {path}")
+    return img
+
+
+# ===========================
+# 解码缓存
+# ===========================
+class ImageCache:
+    """
+    按字节预算淘汰的 LRU 缓存。
+    同一键并发读取时只有一个线程解码，其余线程等待并共用结果。
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()  # key -> ndarray
+        self._paths = {}  # 绝对路径 -> 当前键 (文件变化后旧键立即淘汰)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loading = {}  # key -> Lock
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(path):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        return path, st.st_mtime_ns, st.st_size
+
+    def get_or_load(self, path, loader):
+        key = self.make_key(path)
+        with self._lock:
+            img = self._lookup(key)
+            if img is not None:
+                return img
+            load_lock = self._loading.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                img = self._lookup(key, count=False)
+                if img is not None:
+                    self.hits += 1
+                    return img
+                self.misses += 1
+            try:
+                img = loader(path)
+                img.flags.writeable = False
+                with self._lock:
+                    self._store(key, img)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        return img
+
+    def _lookup(self, key, count=True):
+        img = self._items.get(key)
+        if img is not None:
+            self._items.move_to_end(key)
+            if count:
+                self.hits += 1
+        return img
+
+    def _store(self, key, img):
+        old_key = self._paths.get(key[0])
+        if old_key is not None and old_key != key:
+            self._evict(old_key)
+        if img.nbytes > self.max_bytes:
+            return
+        self._items[key] = img
+        self._paths[key[0]] = key
+        self._bytes += img.nbytes
+        while self._bytes > self.max_bytes:
+            self._evict(next(iter(self._items)))
+
+    def _evict(self, key):
+        img = self._items.pop(key, None)
+        if img is not None:
+            self._bytes -= img.nbytes
+            if self._paths.get(key[0]) == key:
+                del self._paths[key[0]]
+
+    def invalidate(self, path):
+        with self._lock:
+            key = self._paths.get(os.path.abspath(path))
+            if key is not None:
+                self._evict(key)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._paths.clear()
+            self._bytes = 0
+
+    def set_budget(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            while self._bytes > self.max_bytes and self._items:
+                self._evict(next(iter(self._items)))
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+_cache = ImageCache()
+
+
+def get_cache():
+    return _cache
+
+
+def _load_bgra_file(path):
+    return to_bgra(decode_file(path))
+
+
+def read_bgra(path, cache=True):
+    """
+    读取图片并返回 BGRA 数组 (保持原位深)。
+    cache=True: 返回缓存中的只读数组，调用方不得修改；
+    cache=False: 不经过缓存，返回可写的私有数组 (就地处理后覆盖源文件的批处理使用)。
+    """
+    if not cache:
+        return _load_bgra_file(path)
+    return _cache.get_or_load(path, _load_bgra_file)
+
+
+# ===========================
+# 原子写入
+# ===========================
+def _read_umask():
+    # Linux 4.7+ 可以从 /proc/self/status 只读地取得 umask
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+    # 其他平台 os.umask 只能 "设置并返回旧值"：导入时可能有其他线程 (如 main.py 的预热线程) 正在建文件，
+    # 先设为 0o077 再恢复，窗口期内新建的文件只会权限偏严，不会对组/其他用户开放
+    mask = os.umask(0o077)
+    os.umask(mask)
+    return mask
+
+
+_UMASK = _read_umask()
+
+
+def _target_mode(path):
+    """覆盖已有文件时沿用其权限；新文件按 umask 取默认权限 (与 open() 新建文件一致)"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def atomic_write_bytes(path, data, before_replace=None):
+    """
+    写同目录临时文件后 os.replace 到目标路径。
+    mkstemp 建出的临时文件权限是 0600，替换前改为目标文件原有 (或默认) 的权限。
+    before_replace(tmp_path) 在临时文件写完、替换之前调用 (断点日志在此记录最终文件的大小 / 修改时间，
+    rename 不改变这两项)；它抛出异常时放弃写入。
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".~" + os.path.basename(path), suffix=".tmp")
+    try:
+        with tracing.span("imgio.write", "imgio", bytes=len(data)):
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(tmp, _target_mode(path))
+            if before_replace is not None:
+                before_replace(tmp)
+            os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    _cache.invalidate(path)
+    return path
+
+
+def encode_image(img, ext=".png", params=None):
+    """编码为指定格式的字节 (ndarray)，失败时抛出 RuntimeError"""
+    with tracing.span("imgio.imencode", "imgio", ext=ext):
+        is_success, buffer = cv2.imencode(ext, img, params or [])
+    if not is_success:
+        raise RuntimeError(f"{ext} 编码失败")
+    return buffer
+
+
+def write_image(path, img, params=None, before_replace=None):
+    """按扩展名编码并原子写入，返回 path"""
+    ext = os.path.splitext(path)[1] or ".png"
+    return atomic_write_bytes(path, encode_image(img, ext, params), before_replace)
@@ -0,0 +1,308 @@
+import heapq
+import itertools
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# ===========================
+# 后台任务管理
+# ===========================
+# 所有工具共用一个任务管理器：按优先级排队，在线程池 (或进程池) 中执行，
+# 进度 / 完成回调通过 Tk 的 after 切回主线程，主窗口的“任务”面板列出各工具正在运行与排队的任务。
+#
+# 线程任务的函数签名为 fn(*args, progress=..., cancel_token=..., **kwargs)：
+#   progress(done, total, message="") 汇报进度；
+#   cancel_token.raise_if_cancelled() 在安全位置检查取消 (抛出 JobCancelled)。
+# 进程任务 (kind="process") 只传 args/kwargs，函数必须可 pickle；无法汇报进度，只能在排队时取消。
+#
+# exclusive 相同的任务串行执行 (例如 PowerPoint COM 同一时间只能跑一个导出)。
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+STATES = ("queued", "running", "cancelling", "done", "failed", "cancelled")
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """任务在执行过程中被取消"""
+
+
+class Job:
+    """一个任务记录，同时作为线程任务的取消标记"""
+
+    def __init__(self, job_id, tool, title, priority, kind, exclusive, fn, args, kwargs,
+                 widget, on_progress, on_done):
+        self.id = job_id
+        self.tool = tool
+        self.title = title
+        self.priority = priority
+        self.kind = kind
+        self.exclusive = exclusive
+        self.state = "queued"
+        self.done = 0
+        self.total = 0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.created = time.time()
+        self.started = None
+        self.ended = None
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self._widget = widget
+        self._on_progress = on_progress
+        self._on_done = on_done
+        self._cancel = threading.Event()
+        self._future = None
+        self._last_progress = 0.0
+
+    # --- 取消标记接口 (与 b0.CancelToken 一致) ---
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def raise_if_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled("任务已取消")
+
+    @property
+    def percent(self):
+        if self.state == "done":
+            return 100.0
+        if not self.total:
+            return 0.0
+        return min(100.0, 100.0 * self.done / self.total)
+
+    def snapshot(self):
+        return {
+            "id": self.id, "tool": self.tool, "title": self.title, "priority": self.priority,
+            "kind": self.kind, "state": self.state, "done": self.done, "total": self.total,
+            "percent": round(self.percent, 1), "message": self.message, "error": self.error,
+            "created": self.created, "started": self.started, "ended": self.ended,
+        }
+
+
+class JobManager:
+    """
+    优先级任务队列 + 线程池 / 进程池。
+    priority 数值越小越先执行，同优先级先进先出。
+    回调 (on_progress(job) / on_done(job)) 优先通过 attach_tk 绑定的主窗口 after 派发，
+    未绑定时使用提交任务时传入的 widget；都没有时直接在工作线程中调用。
+    """
+
+    # 进度回调最短间隔 (秒)，避免逐项处理时把 Tk 事件队列塞满
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, max_workers=2, process_workers=2):
+        self.max_workers = max(1, max_workers)
+        self.process_workers = max(1, process_workers)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._heap = []
+        self._jobs = {}
+        self._running = {"thread": 0, "process": 0}
+        self._busy_groups = set()
+        self._thread_pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._process_pool = None
+        self._root = None
+        self._closed = False
+
+    def attach_tk(self, root):
+        self._root = root
+
+    # --- 提交 / 取消 ---
+    def submit(self, fn, *args, tool="", title="", priority=PRIORITY_NORMAL, kind="thread", exclusive=None,
+               widget=None, on_progress=None, on_done=None, **kwargs):
+        """登记一个任务并返回 Job；达到并发上限时排队"""
+        if kind not in ("thread", "process"):
+            raise ValueError(f"未知的任务类型: {kind}")
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("任务管理器已关闭")
+            job = Job(next(self._ids), tool, title or getattr(fn, "__name__", "job"), priority, kind, exclusive,
+                      fn, args, kwargs, widget, on_progress, on_done)
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (priority, next(self._seq), job.id))
+        self._schedule()
+        return job
+
+    def cancel(self, job_id):
+        """取消任务：排队中的直接移除；运行中的线程任务设置取消标记，由任务自行退出"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return
+            job.cancel()
+            if job.state == "queued":
+                self._heap = [item for item in self._heap if item[2] != job_id]
+                heapq.heapify(self._heap)
+                self._finish(job, "cancelled")
+                finished = True
+            else:
+                job.state = "cancelling"
+                finished = False
+        if finished:
+            self._dispatch(job, job._on_done)
+
+    def cancel_all(self):
+        for job_id in list(self._jobs):
+            self.cancel(job_id)
+
+    def clear_finished(self):
+        with self._lock:
+            for job_id in [i for i, j in self._jobs.items() if j.state in FINISHED_STATES]:
+                del self._jobs[job_id]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def table(self):
+        """任务表快照：运行中在前，然后是排队 (按执行顺序)，最后是已结束 (新的在前)"""
+        with self._lock:
+            order = {job_id: n for n, (_, _, job_id) in enumerate(sorted(self._heap))}
+            jobs = list(self._jobs.values())
+
+        def key(job):
+            if job.state in ("running", "cancelling"):
+                return (0, job.started or 0)
+            if job.state == "queued":
+                return (1, order.get(job.id, 0))
+            return (2, -(job.ended or 0))
+
+        return [job.snapshot() for job in sorted(jobs, key=key)]
+
+    def shutdown(self, wait=False):
+        """关闭管理器：取消全部任务，线程池不再接收新任务"""
+        with self._lock:
+            self._closed = True
+        self.cancel_all()
+        self._thread_pool.shutdown(wait=wait)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait)
+
+    # --- 内部 ---
+    def _dispatch(self, job, callback):
+        if callback is None:
+            return
+        target = self._root or job._widget
+        if target is None:
+            callback(job)
+            return
+        try:
+            target.after(0, lambda: callback(job))
+        except Exception:
+            # 主窗口已销毁 (关闭程序后任务才结束)，回调无处可去
+            pass
+
+    def _get_process_pool(self):
+        if self._process_pool is None:
+            # multiprocessing 较重，用到进程任务时才导入 (不拖慢主窗口启动)
+            from concurrent.futures import ProcessPoolExecutor
+            self._process_pool = ProcessPoolExecutor(max_workers=self.process_workers)
+        return self._process_pool
+
+    def _schedule(self):
+        """按优先级启动排队任务；受限 (并发上限 / exclusive 冲突) 的任务不阻塞后面的任务"""
+        starting = []
+        with self._lock:
+            if self._closed:
+                return
+            waiting = []
+            while self._heap:
+                item = heapq.heappop(self._heap)
+                job = self._jobs[item[2]]
+                limit = self.max_workers if job.kind == "thread" else self.process_workers
+                if self._running[job.kind] >= limit or (job.exclusive and job.exclusive in self._busy_groups):
+                    waiting.append(item)
+                    continue
+                job.state = "running"
+                job.started = time.time()
+                self._running[job.kind] += 1
+                if job.exclusive:
+                    self._busy_groups.add(job.exclusive)
+                starting.append(job)
+            for item in waiting:
+                heapq.heappush(self._heap, item)
+        # 在锁外提交：任务瞬间完成时 done 回调会在当前线程里同步执行
+        for job in starting:
+            self._start(job)
+
+    def _start(self, job):
+        if job.kind == "thread":
+            job._future = self._thread_pool.submit(self._run_thread_job, job)
+        else:
+            job._future = self._get_process_pool().submit(job._fn, *job._args, **job._kwargs)
+        job._future.add_done_callback(lambda f: self._on_future_done(job, f))
+
+    def _run_thread_job(self, job):
+        return job._fn(*job._args, progress=lambda done, total, message="": self._report(job, done, total, message),
+                       cancel_token=job, **job._kwargs)
+
+    def _report(self, job, done, total, message=""):
+        job.done, job.total, job.message = done, total, message
+        now = time.monotonic()
+        if done < total and now - job._last_progress < self.PROGRESS_INTERVAL:
+            return
+        job._last_progress = now
+        self._dispatch(job, job._on_progress)
+
+    def _finish(self, job, state):
+        job.state = state
+        job.ended = time.time()
+        # 释放参数引用 (可能是大图 / 大列表)
+        job._args, job._kwargs = (), {}
+
+    def _on_future_done(self, job, future):
+        with self._lock:
+            self._running[job.kind] -= 1
+            if job.exclusive:
+                self._busy_groups.discard(job.exclusive)
+            error = future.exception()
+            if isinstance(error, JobCancelled):
+                self._finish(job, "cancelled")
+            elif error is not None:
+                job.error = str(error) or error.__class__.__name__
+                job.traceback = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+                self._finish(job, "failed")
+            else:
+                job.result = future.result()
+                self._finish(job, "done")
+        self._dispatch(job, job._on_done)
+        self._schedule()
+
+
+# ===========================
+# 全局实例
+# ===========================
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    """所有工具共用的任务管理器 (首次调用时创建)"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
+
+
+def submit(fn, *args, **kwargs):
+    return get_manager().submit(fn, *args, **kwargs)
+
+
+def callback_parent(widget):
+    """完成回调里弹窗用的父窗口：工具窗口已关闭时返回 None (弹到主窗口上)"""
+    try:
+        return widget if widget is not None and widget.winfo_exists() else None
+    except Exception:
+        return None
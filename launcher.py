@@ -0,0 +1,348 @@
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11 只支持 JSON 配置
+    tomllib = None
+
+# ===========================
+# 外部程序注册表
+# ===========================
+# 配置文件 (JSON 或 TOML)，示例:
+# {
+#   "max_running": 4,
+#   "sample_interval": 1.0,
+#   "tools": [
+#     {"name": "示例脚本", "path": "python", "args": ["{cwd}/demo.py", "--seconds", "10"], "cwd": "scripts"},
+#     {"name": "转码", "path": "ffmpeg", "args": ["-i", "{input}", "{output}"],
+#      "cwd": "D:/work", "restart": "on-failure", "max_restarts": 3, "max_instances": 2}
+#   ]
+# }
+# args 中的 {变量} 在启动时替换；内置变量: {tool_dir} (程序所在目录)、{cwd} (工作目录)。
+# 相对路径以配置文件所在目录为基准；未给出 cwd 时使用程序所在目录
+# (很多软件依赖同目录下的 dll 或 config 文件)。
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "launcher_tools.json")
+
+TOOL_DEFAULTS = {
+    "args": [],
+    "cwd": None,
+    "env": {},
+    "restart": "no",        # no / on-failure / always
+    "max_restarts": 3,
+    "restart_delay": 1.0,
+    "max_instances": 0,     # 0 表示不限
+    "log": None,            # 子进程 stdout/stderr 追加写入的文件
+}
+
+RESTART_POLICIES = ("no", "on-failure", "always")
+
+
+def _resolve_program(path, base_dir):
+    if os.path.isabs(path):
+        return path
+    candidate = os.path.join(base_dir, path)
+    if os.path.exists(candidate):
+        return candidate
+    # 不含目录的命令名 (python / ffmpeg) 在 PATH 中查找
+    return shutil.which(path) or candidate
+
+
+def normalize_tool(raw, base_dir=""):
+    """补全一条工具配置的默认值并校验，返回标准化后的 dict"""
+    tool = dict(TOOL_DEFAULTS)
+    tool.update(raw)
+    for key in ("name", "path"):
+        if not tool.get(key):
+            raise ValueError(f"工具配置缺少字段: {key}")
+    if tool["restart"] not in RESTART_POLICIES:
+        raise ValueError(f"未知的重启策略: {tool['restart']} (可选: {', '.join(RESTART_POLICIES)})")
+
+    tool["path"] = _resolve_program(tool["path"], base_dir)
+    if tool["cwd"] and not os.path.isabs(tool["cwd"]):
+        tool["cwd"] = os.path.join(base_dir, tool["cwd"])
+    if tool["log"] and not os.path.isabs(tool["log"]):
+        tool["log"] = os.path.join(base_dir, tool["log"])
+    tool["args"] = [str(a) for a in tool["args"]]
+    tool["max_restarts"] = int(tool["max_restarts"])
+    tool["restart_delay"] = float(tool["restart_delay"])
+    tool["max_instances"] = int(tool["max_instances"])
+    return tool
+
+
+def load_registry(path=None):
+    """读取注册表，返回 {"max_running", "sample_interval", "tools": {名称: 配置}}"""
+    path = path or DEFAULT_CONFIG_PATH
+    if path.lower().endswith(".toml"):
+        if tomllib is None:
+            raise RuntimeError("当前 Python 版本不支持 TOML 配置，请改用 JSON")
+        with open(path, 'rb') as f:
+            data = tomllib.load(f)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    tools = {}
+    for raw in data.get("tools", []):
+        tool = normalize_tool(raw, base_dir)
+        if tool["name"] in tools:
+            raise ValueError(f"工具名称重复: {tool['name']}")
+        tools[tool["name"]] = tool
+    return {
+        "max_running": int(data.get("max_running", 0)),
+        "sample_interval": float(data.get("sample_interval", 1.0)),
+        "tools": tools,
+    }
+
+
+class _TemplateVars(dict):
+    def __missing__(self, key):
+        raise ValueError(f"参数模板缺少变量: {{{key}}}")
+
+
+def build_command(tool, variables=None):
+    """按模板生成 (命令行列表, 工作目录)"""
+    cwd = tool["cwd"] or os.path.dirname(tool["path"]) or None
+    values = _TemplateVars(variables or {})
+    values.setdefault("tool_dir", os.path.dirname(tool["path"]))
+    values.setdefault("cwd", cwd or "")
+    return [tool["path"]] + [a.format_map(values) for a in tool["args"]], cwd
+
+
+# ===========================
+# /proc 资源采样 (仅 Linux)
+# ===========================
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") and "SC_CLK_TCK" in os.sysconf_names else 100
+
+
+def _read_proc_sample(pid):
+    """返回 (CPU 累计秒数, RSS 字节)；非 Linux 或进程已退出时返回 None"""
+    try:
+        with open(f"/proc/{pid}/stat", 'r') as f:
+            stat = f.read()
+        with open(f"/proc/{pid}/status", 'r') as f:
+            status = f.read()
+    except OSError:
+        return None
+    # comm 字段可能包含空格，从最后一个 ')' 之后再切分
+    fields = stat[stat.rfind(")") + 2:].split()
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / _CLK_TCK  # utime + stime
+    rss = 0
+    for line in status.splitlines():
+        if line.startswith("VmRSS:"):
+            rss = int(line.split()[1]) * 1024
+            break
+    return cpu_seconds, rss
+
+
+# ===========================
+# 进程监管
+# ===========================
+class Supervisor:
+    """
+    受监管的进程表：记录每次启动的 PID、状态、退出码与重启次数，
+    按全局 max_running 与每个工具的 max_instances 限制并发 (超出时排队)，
+    定期从 /proc 采样 CPU% 与 RSS。
+    on_event(dict) 接收状态变化 (queued / started / exited / restarting / stopped / failed)，
+    回调在监管线程中执行，UI 需要自行用 after 切回主线程。
+    """
+
+    def __init__(self, registry, on_event=None):
+        self.registry = registry
+        self.on_event = on_event
+        self.max_running = registry.get("max_running", 0)
+        self.interval = max(0.1, registry.get("sample_interval", 1.0))
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._entries = {}
+        self._queue = deque()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._monitor, daemon=True)
+        self._thread.start()
+
+    def _notify(self, **event):
+        if self.on_event:
+            self.on_event(event)
+
+    # --- 启动 / 停止 ---
+    def launch(self, name, variables=None):
+        """登记一次启动并返回记录 id；达到并发上限时先排队"""
+        tool = self.registry["tools"].get(name)
+        if tool is None:
+            raise ValueError(f"未注册的工具: {name}")
+        command, cwd = build_command(tool, variables)
+        entry = {
+            "id": next(self._ids), "name": name, "command": command, "cwd": cwd,
+            "state": "queued", "pid": None, "exit_code": None, "restarts": 0,
+            "cpu": None, "rss": None, "started": None, "ended": None, "error": None,
+            "_proc": None, "_log": None, "_last_sample": None, "_restart_at": None,
+        }
+        with self._lock:
+            self._entries[entry["id"]] = entry
+            self._queue.append(entry["id"])
+        self._notify(event="queued", id=entry["id"], name=name)
+        self._schedule()
+        return entry["id"]
+
+    def stop(self, entry_id, timeout=5):
+        """结束一个进程 (或取消排队)，不会触发自动重启"""
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            if entry is None or entry["state"] in ("exited", "stopped", "failed"):
+                return
+            if entry["state"] in ("queued", "restarting"):
+                if entry_id in self._queue:
+                    self._queue.remove(entry_id)
+                entry["state"] = "stopped"
+                entry["ended"] = time.time()
+                proc = None
+            else:
+                proc = entry["_proc"]
+                if proc is not None:
+                    entry["state"] = "stopping"
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        self._reap()
+        self._notify(event="stopped", id=entry_id)
+
+    def stop_all(self):
+        for entry_id in list(self._entries):
+            self.stop(entry_id)
+
+    def shutdown(self, stop_children=False):
+        """停止监管线程；stop_children=True 时同时结束所有子进程"""
+        if stop_children:
+            self.stop_all()
+        self._stop.set()
+        self._thread.join(timeout=self.interval * 2)
+
+    def table(self):
+        """进程表快照 (不含内部字段)，按 id 排序"""
+        with self._lock:
+            return [{k: v for k, v in e.items() if not k.startswith("_")}
+                    for _, e in sorted(self._entries.items())]
+
+    # --- 内部 ---
+    def _running_count(self, name=None):
+        return sum(1 for e in self._entries.values()
+                   if e["state"] in ("running", "stopping") and (name is None or e["name"] == name))
+
+    def _can_start(self, tool):
+        if self.max_running and self._running_count() >= self.max_running:
+            return False
+        if tool["max_instances"] and self._running_count(tool["name"]) >= tool["max_instances"]:
+            return False
+        return True
+
+    def _start(self, entry):
+        tool = self.registry["tools"][entry["name"]]
+        env = None
+        if tool["env"]:
+            env = dict(os.environ)
+            env.update({k: str(v) for k, v in tool["env"].items()})
+        out = subprocess.DEVNULL
+        if tool["log"]:
+            entry["_log"] = open(tool["log"], 'ab')
+            out = entry["_log"]
+        try:
+            entry["_proc"] = subprocess.Popen(entry["command"], cwd=entry["cwd"], env=env,
+                                              stdin=subprocess.DEVNULL, stdout=out, stderr=out)
+        except OSError as e:
+            entry.update(state="failed", error=str(e), ended=time.time())
+            self._close_log(entry)
+            return ("failed", {"id": entry["id"], "name": entry["name"], "error": str(e)})
+        entry.update(state="running", pid=entry["_proc"].pid, started=time.time(), ended=None,
+                     exit_code=None, cpu=None, rss=None, _last_sample=None)
+        return ("started", {"id": entry["id"], "name": entry["name"], "pid": entry["pid"]})
+
+    def _close_log(self, entry):
+        if entry["_log"] is not None:
+            entry["_log"].close()
+            entry["_log"] = None
+
+    def _schedule(self):
+        """按并发上限启动排队中的进程 (先进先出；被限流的工具不阻塞其他工具)"""
+        events = []
+        with self._lock:
+            waiting = deque()
+            while self._queue:
+                entry_id = self._queue.popleft()
+                entry = self._entries[entry_id]
+                tool = self.registry["tools"][entry["name"]]
+                if self._can_start(tool):
+                    events.append(self._start(entry))
+                else:
+                    waiting.append(entry_id)
+            self._queue = waiting
+        for event, data in events:
+            self._notify(event=event, **data)
+
+    def _reap(self):
+        """回收已退出的进程，按重启策略决定是否重新排队"""
+        events = []
+        now = time.time()
+        with self._lock:
+            for entry in self._entries.values():
+                proc = entry["_proc"]
+                if entry["state"] == "restarting" and entry["_restart_at"] is not None and now >= entry["_restart_at"]:
+                    entry["_restart_at"] = None
+                    entry["state"] = "queued"
+                    self._queue.append(entry["id"])
+                    continue
+                if entry["state"] not in ("running", "stopping") or proc is None:
+                    continue
+                code = proc.poll()
+                if code is None:
+                    continue
+                self._close_log(entry)
+                entry.update(exit_code=code, ended=now, cpu=None, rss=None, _proc=None)
+                stopped = entry["state"] == "stopping"
+                entry["state"] = "stopped" if stopped else "exited"
+                events.append(("exited", {"id": entry["id"], "name": entry["name"], "exit_code": code}))
+
+                tool = self.registry["tools"][entry["name"]]
+                wants_restart = (tool["restart"] == "always"
+                                 or (tool["restart"] == "on-failure" and code != 0))
+                if not stopped and wants_restart and entry["restarts"] < tool["max_restarts"]:
+                    entry["restarts"] += 1
+                    entry["state"] = "restarting"
+                    entry["_restart_at"] = now + tool["restart_delay"]
+                    events.append(("restarting", {"id": entry["id"], "name": entry["name"],
+                                                  "restarts": entry["restarts"]}))
+        for event, data in events:
+            self._notify(event=event, **data)
+
+    def _sample(self):
+        now = time.monotonic()
+        with self._lock:
+            for entry in self._entries.values():
+                if entry["state"] != "running" or entry["pid"] is None:
+                    continue
+                sample = _read_proc_sample(entry["pid"])
+                if sample is None:
+                    continue
+                cpu_seconds, rss = sample
+                entry["rss"] = rss
+                last = entry["_last_sample"]
+                if last is not None and now > last[0]:
+                    entry["cpu"] = round((cpu_seconds - last[1]) / (now - last[0]) * 100, 1)
+                entry["_last_sample"] = (now, cpu_seconds)
+
+    def _monitor(self):
+        while not self._stop.wait(self.interval):
+            self._reap()
+            self._schedule()
+            self._sample()
@@ -1,21 +1,167 @@
+import time
+
+_T_START = time.perf_counter()
+
+import argparse
+import importlib
+import json
+import sys
+import threading
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, ttk
+
+import jobs
+import tracing
+
+# === 功能模块注册表 ===
+# 各工具模块在第一次点击时才导入 (python-pptx / lxml / OpenCV / NumPy / win32com 都很重)，
+# 主窗口显示后再由后台线程按顺序预热，预热完成前点击按钮会等待该模块导入完毕。
+TOOLS = [
+    # 第一行
+    ("PPT生成器", "a0"),
+    ("PPT改色/去空", "a1"),
+    ("导出透明PNG", "a2"),
+
+    # 第二行
+    ("图片转动画", "b0"),
+    ("FPS计算器", "b1"),
+    ("地图/API工具", "b2"),
+]
+
+_modules = {}
+_load_lock = threading.Lock()
+_import_report = []  # [{"module", "seconds", "new_modules", "trigger", "error"}]
+
+
+def _load_tool(name, trigger="click"):
+    """导入工具模块并记录耗时；同一模块只导入一次"""
+    with _load_lock:
+        if name in _modules:
+            return _modules[name]
+        before = len(sys.modules)
+        t0 = time.perf_counter()
+        entry = {"module": name, "trigger": trigger}
+        try:
+            module = importlib.import_module(name)
+        except ImportError as e:
+            entry.update(seconds=round(time.perf_counter() - t0, 4), new_modules=len(sys.modules) - before,
+                         error=str(e))
+            _import_report.append(entry)
+            raise
+        entry.update(seconds=round(time.perf_counter() - t0, 4), new_modules=len(sys.modules) - before, error=None)
+        _import_report.append(entry)
+        _modules[name] = module
+        return module
+
+
+def _open_tool(root, name):
+    try:
+        module = _load_tool(name)
+    except ImportError as e:
+        messagebox.showerror("缺少模块", f"无法加载 {name}:\n{e}\n\n请确保所有工具脚本与依赖库都已安装。", parent=root)
+        return
+    module.show_ui(root)
+
+
+def _prewarm(names):
+    """后台按顺序预热；失败的模块留到点击时再报错"""
+    for name in names:
+        try:
+            _load_tool(name, trigger="prewarm")
+        except ImportError:
+            pass
+
+
+def startup_report(window_seconds):
+    """启动报告：首屏时间 + 每个工具模块的导入耗时 (含其依赖)"""
+    with _load_lock:
+        imports = list(_import_report)
+    return {"window_shown_seconds": round(window_seconds, 4), "imports": imports}
+
+
+def format_startup_report(report):
+    lines = [f"首屏显示: {report['window_shown_seconds'] * 1000:.1f} ms",
+             f"{'module':<8}{'trigger':<10}{'ms':>10}{'new modules':>14}"]
+    for e in report["imports"]:
+        status = f"  失败: {e['error']}" if e["error"] else ""
+        lines.append(f"{e['module']:<8}{e['trigger']:<10}{e['seconds'] * 1000:>10.1f}{e['new_modules']:>14}{status}")
+    return "\n".join(lines)
+
+
+# === 任务面板 ===
+JOB_STATE_TEXT = {"queued": "排队", "running": "运行中", "cancelling": "取消中",
+                  "done": "完成", "failed": "失败", "cancelled": "已取消"}
+
+_jobs_window = None
 
-# === 导入功能模块 ===
-try:
-    import a0
-    import a1
-    import a2
-    import b0
-    import b1
-    import b2
-except ImportError as e:
-    print(f"严重错误：缺少模块文件 - {e}")
-    print("请确保所有工具脚本都在同一目录下。")
+
+def _active_jobs(rows):
+    return [r for r in rows if r["state"] not in jobs.FINISHED_STATES]
+
+
+def _show_jobs_panel(root):
+    """列出各工具提交的后台任务 (运行中 / 排队 / 已结束)，可取消选中的任务"""
+    global _jobs_window
+    if _jobs_window is not None and _jobs_window.winfo_exists():
+        _jobs_window.deiconify()
+        _jobs_window.lift()
+        return
+    manager = jobs.get_manager()
+    win = tk.Toplevel(root)
+    _jobs_window = win
+    win.title("后台任务")
+    win.geometry("640x320")
+
+    columns = ("id", "tool", "title", "state", "progress", "message")
+    headings = ("#", "工具", "任务", "状态", "进度", "信息")
+    widths = (30, 100, 160, 60, 60, 190)
+    tree = ttk.Treeview(win, columns=columns, show="headings", height=10)
+    for col, text, width in zip(columns, headings, widths):
+        tree.heading(col, text=text)
+        tree.column(col, width=width, anchor="w" if col in ("title", "message") else "center")
+    tree.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+
+    def refresh(schedule=True):
+        if not win.winfo_exists():
+            return
+        rows = manager.table()
+        alive = set()
+        for index, r in enumerate(rows):
+            iid = str(r["id"])
+            alive.add(iid)
+            message = r["error"] or r["message"]
+            progress = f"{r['percent']:.0f}%" if r["total"] or r["state"] == "done" else "-"
+            values = (r["id"], r["tool"], r["title"], JOB_STATE_TEXT[r["state"]], progress, message)
+            if tree.exists(iid):
+                tree.item(iid, values=values)
+                tree.move(iid, "", index)
+            else:
+                tree.insert("", index, iid=iid, values=values)
+        for iid in tree.get_children():
+            if iid not in alive:
+                tree.delete(iid)
+        if schedule:
+            win.after(500, refresh)
+
+    def cancel_selected():
+        for iid in tree.selection():
+            manager.cancel(int(iid))
+        refresh(schedule=False)
+
+    def clear_finished():
+        manager.clear_finished()
+        refresh(schedule=False)
+
+    frame_btn = tk.Frame(win)
+    frame_btn.pack(fill="x", padx=10, pady=(0, 10))
+    tk.Button(frame_btn, text="取消选中", command=cancel_selected).pack(side="left")
+    tk.Button(frame_btn, text="清除已结束", command=clear_finished).pack(side="left", padx=5)
+
+    refresh()
 
 
 # === 主程序逻辑 ===
-def create_main_interface():
+def create_main_interface(prewarm=True, report_path=None):
     root = tk.Tk()
     root.title("多功能工具箱 (v2.7)")
 
@@ -34,31 +180,80 @@ def create_main_interface():
     grid_config = {"padx": 15, "pady": 15}
 
     # === 按钮映射表 ===
-    # 这里的 lambda p=root: module.show_ui(p) 是关键
-    # 它将主窗口 root 传递给子模块
-    buttons_map = [
-        # 第一行
-        ("PPT生成器", lambda: a0.show_ui(root)),
-        ("PPT改色/去空", lambda: a1.show_ui(root)),
-        ("导出透明PNG", lambda: a2.show_ui(root)),
-
-        # 第二行
-        ("图片转动画", lambda: b0.show_ui(root)),
-        ("启动外部程序", lambda: b1.show_ui(root)),
-        ("地图/API工具", lambda: b2.show_ui(root)),
-    ]
-
+    # 按钮只记录模块名，点击时才导入并把主窗口 root 传给子模块的 show_ui
     idx = 0
     for row in range(2):
         for col in range(3):
-            if idx < len(buttons_map):
-                text, command_func = buttons_map[idx]
-                btn = tk.Button(frame_container, text=text, command=command_func, **btn_config)
+            if idx < len(TOOLS):
+                text, module_name = TOOLS[idx]
+                btn = tk.Button(frame_container, text=text, command=lambda m=module_name: _open_tool(root, m),
+                                **btn_config)
                 btn.grid(row=row, column=col, **grid_config)
                 idx += 1
 
+    def on_shown():
+        window_seconds = time.perf_counter() - _T_START
+        names = [name for _, name in TOOLS]
+        threads = []
+        if prewarm:
+            t = threading.Thread(target=_prewarm, args=(names,), daemon=True)
+            t.start()
+            threads.append(t)
+        if report_path:
+            def write_report():
+                for t in threads:
+                    t.join()
+                report = startup_report(window_seconds)
+                if report_path == "-":
+                    print(format_startup_report(report), file=sys.stderr)
+                else:
+                    with open(report_path, 'w', encoding='utf-8') as f:
+                        json.dump(report, f, ensure_ascii=False, indent=2)
+
+            threading.Thread(target=write_report, daemon=True).start()
+
+    # 任务入口：显示运行中 + 排队的任务数
+    manager = jobs.get_manager()
+    manager.attach_tk(root)
+    btn_jobs = tk.Button(root, text="后台任务", relief="flat", fg="gray", command=lambda: _show_jobs_panel(root))
+    btn_jobs.pack(side="bottom", anchor="e", padx=10, pady=5)
+
+    def update_jobs_button():
+        active = _active_jobs(manager.table())
+        btn_jobs.config(text=f"后台任务 ({len(active)})" if active else "后台任务",
+                        fg="#1565C0" if active else "gray")
+        root.after(1000, update_jobs_button)
+
+    def on_close():
+        active = _active_jobs(manager.table())
+        if active and not messagebox.askyesno("退出", f"还有 {len(active)} 个任务未完成，退出将取消这些任务。\n确定退出？",
+                                              parent=root):
+            return
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", on_close)
+    update_jobs_button()
+
+    root.after_idle(on_shown)
     root.mainloop()
+    manager.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多功能工具箱")
+    parser.add_argument("--no-prewarm", action="store_true", help="不在后台预热工具模块")
+    parser.add_argument("--startup-report", nargs="?", const="-", metavar="PATH",
+                        help="输出启动耗时报告 (默认打印到 stderr，给出路径则写 JSON)")
+    parser.add_argument("--trace", metavar="PATH", help="记录各工具的追踪数据，退出时导出 Chrome trace JSON")
+    args = parser.parse_args(argv)
+    if args.trace:
+        tracing.enable_to_file(args.trace)
+    create_main_interface(prewarm=not args.no_prewarm, report_path=args.startup_report)
 
 
 if __name__ == "__main__":
-    create_main_interface()
\ No newline at end of file
+    # 打包成 exe 后进程池任务需要
+    import multiprocessing
+
+    multiprocessing.freeze_support()
+    main()
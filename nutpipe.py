@@ -0,0 +1,115 @@
+import struct
+from fractions import Fraction
+
+
+# ===========================
+# NUT 管道封装 (只写 BGRA rawvideo 单视频流)
+# 格式说明: https://ffmpeg.org/~michael/nut.txt
+# ===========================
+# 每帧带显式 PTS，重复帧不必重发像素：FFmpeg 端按时间戳补帧 (CFR) 或直接保留时长 (VFR)。
+_FILE_ID = b"nut/multimedia container\x00"
+_MAIN_STARTCODE = 0x7A561F5F04AD + ((ord('N') << 8 | ord('M')) << 48)
+_STREAM_STARTCODE = 0x11405BF2F9DB + ((ord('N') << 8 | ord('S')) << 48)
+_SYNCPOINT_STARTCODE = 0xE4ADEECA4569 + ((ord('N') << 8 | ord('K')) << 48)
+
+_FLAG_KEY = 1
+_FLAG_CODED_PTS = 8
+_FLAG_SIZE_MSB = 32
+_FLAG_CHECKSUM = 64
+# 所有帧共用 frame_code 0：关键帧，PTS / 大小 / 帧头校验和全部显式写出
+_FRAME_FLAGS = _FLAG_KEY | _FLAG_CODED_PTS | _FLAG_SIZE_MSB | _FLAG_CHECKSUM
+
+_MAX_DISTANCE = 32768
+_MSB_PTS_SHIFT = 7
+
+
+def _crc_table():
+    table = []
+    for i in range(256):
+        c = i << 24
+        for _ in range(8):
+            c = ((c << 1) ^ 0x04C11DB7) if c & 0x80000000 else (c << 1)
+        table.append(c & 0xFFFFFFFF)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def _crc(data, crc=0):
+    """NUT 校验和：多项式 0x04C11DB7，初值 0，高位在前，无反转"""
+    for b in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC_TABLE[(crc >> 24) ^ b]
+    return crc
+
+
+def _v(value):
+    """无符号变长整数：7 位一组，高位在前，除最后一组外置 0x80"""
+    out = bytearray([value & 0x7F])
+    value >>= 7
+    while value:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def _s(value):
+    return _v(2 * value - 1 if value > 0 else -2 * value)
+
+
+def _packet(startcode, payload):
+    """startcode + forward_ptr (+ 头校验和) + 数据 + 数据校验和"""
+    head = struct.pack(">Q", startcode) + _v(len(payload) + 4)
+    if len(payload) + 4 > 4096:
+        head += struct.pack(">I", _crc(head))
+    return head + payload + struct.pack(">I", _crc(payload))
+
+
+class NUTPipeMuxer:
+    """
+    把 BGRA 帧封装为 NUT 流写入 stream (通常是 FFmpeg 的 stdin)。
+    fps 可以是数字或 "60/2" 这样的分数字符串，时间基取 1/fps，PTS 即帧序号。
+    每帧前写一个同步点，满足解复用器 "帧起点距上一同步点不超过 max_distance" 的要求。
+    """
+
+    def __init__(self, stream, size, fps):
+        self.stream = stream
+        rate = Fraction(str(fps))
+        width, height = size
+
+        main = bytearray()
+        main += _v(3)                        # version
+        main += _v(1)                        # stream_count
+        main += _v(_MAX_DISTANCE)
+        main += _v(1)                        # time_base_count
+        main += _v(rate.denominator) + _v(rate.numerator)
+        # frame code 表只有一组：tmp_pts=0, mul=1, stream=0, size_lsb=0, reserved=0, 覆盖全部 255 个码
+        main += _v(_FRAME_FLAGS) + _v(6) + _s(0) + _v(1) + _v(0) + _v(0) + _v(0) + _v(255)
+        main += _v(0)                        # header_count_minus1 (不使用 elision 头)
+
+        stream_head = bytearray()
+        stream_head += _v(0)                 # stream_id
+        stream_head += _v(0)                 # stream_class: video
+        stream_head += _v(4) + b"BGRA"       # fourcc -> rawvideo bgra
+        stream_head += _v(0)                 # time_base_id
+        stream_head += _v(_MSB_PTS_SHIFT)
+        stream_head += _v(rate.numerator // rate.denominator + 1)  # max_pts_distance
+        stream_head += _v(0)                 # decode_delay
+        stream_head += _v(0)                 # stream_flags
+        stream_head += _v(0)                 # codec_specific_data
+        stream_head += _v(width) + _v(height)
+        stream_head += _v(0) + _v(0)         # sample_aspect_ratio
+        stream_head += _v(0)                 # colorspace_type
+
+        self.stream.write(_FILE_ID + _packet(_MAIN_STARTCODE, bytes(main))
+                          + _packet(_STREAM_STARTCODE, bytes(stream_head)))
+
+    def frame_header(self, pts, size):
+        """同步点 + 帧头；调用方随后写出 size 字节的帧数据"""
+        sync = _packet(_SYNCPOINT_STARTCODE, _v(pts) + _v(0))  # global_key_pts, back_ptr_div16
+        head = b"\x00" + _v(pts + (1 << _MSB_PTS_SHIFT)) + _v(size)
+        return sync + head + struct.pack(">I", _crc(head))
+
+    def write_frame(self, pts, data):
+        self.stream.write(self.frame_header(pts, len(data)))
+        self.stream.write(data)
@@ -0,0 +1,112 @@
+import struct
+import numpy as np
+
+
+# ===========================
+# QOI 编码 (纯 NumPy 向量化实现)
+# 格式说明: https://qoiformat.org/qoi-specification.pdf
+# ===========================
+_QOI_OP_INDEX = 0x00
+_QOI_OP_DIFF = 0x40
+_QOI_OP_LUMA = 0x80
+_QOI_OP_RUN = 0xC0
+_QOI_OP_RGB = 0xFE
+_QOI_OP_RGBA = 0xFF
+_QOI_END = b"\x00" * 7 + b"\x01"
+
+
+def encode_qoi(img_bgra):
+    """
+    将 BGRA (OpenCV 通道顺序) 图像编码为 QOI 字节串。
+    逐像素的状态机 (游程 / 索引表 / 差分) 全部用数组运算一次性求出，
+    结果与参考实现 qoi.h 逐字节一致。
+    """
+    h, w = img_bgra.shape[:2]
+    px = np.ascontiguousarray(img_bgra.reshape(-1, 4)[:, [2, 1, 0, 3]])
+    n = px.shape[0]
+    header = b"qoif" + struct.pack(">IIBB", w, h, 4, 0)
+    if n == 0:
+        return header + _QOI_END
+
+    prev = np.empty_like(px)
+    prev[0] = (0, 0, 0, 255)
+    prev[1:] = px[:-1]
+
+    # 1. 游程：与上一像素相同
+    same = np.all(px == prev, axis=1)
+    idx = np.arange(n)
+    last_break = np.maximum.accumulate(np.where(same, -1, idx))
+    pos_in_run = idx - last_break - 1
+    next_differs = np.ones(n, dtype=bool)
+    next_differs[:-1] = ~same[1:]
+    run_end = same & ((pos_in_run % 62 == 61) | next_differs)
+    run_len = pos_in_run % 62 + 1
+
+    # 2. 索引表：找到同一哈希槽里上一个 "非游程" 像素
+    p32 = px.astype(np.int32)
+    hashes = (p32[:, 0] * 3 + p32[:, 1] * 5 + p32[:, 2] * 7 + p32[:, 3] * 11) % 64
+    lit = np.flatnonzero(~same)
+    lit_hash = hashes[lit]
+    order = np.argsort(lit_hash, kind='stable')  # lit 本身递增，稳定排序即按 (哈希, 位置) 排序
+    sorted_pos = lit[order]
+    prev_slot = np.full(len(lit), -1, dtype=np.int64)
+    if len(lit) > 1:
+        same_group = lit_hash[order][1:] == lit_hash[order][:-1]
+        prev_slot[order[1:]] = np.where(same_group, sorted_pos[:-1], -1)
+
+    has_prev = prev_slot >= 0
+    slot_px = np.zeros((len(lit), 4), dtype=np.uint8)  # 索引表初始为全 0
+    slot_px[has_prev] = px[prev_slot[has_prev]]
+    is_index_lit = np.all(slot_px == px[lit], axis=1)
+
+    is_index = np.zeros(n, dtype=bool)
+    is_index[lit[is_index_lit]] = True
+
+    # 3. 差分 (按 int8 回绕)
+    d = ((p32 - prev.astype(np.int32) + 128) % 256) - 128
+    dr, dg, db = d[:, 0], d[:, 1], d[:, 2]
+    alpha_same = d[:, 3] == 0
+    literal = ~same & ~is_index
+
+    is_diff = literal & alpha_same & np.all((d[:, :3] >= -2) & (d[:, :3] <= 1), axis=1)
+    dr_dg = dr - dg
+    db_dg = db - dg
+    is_luma = (literal & alpha_same & ~is_diff & (dg >= -32) & (dg <= 31)
+               & (dr_dg >= -8) & (dr_dg <= 7) & (db_dg >= -8) & (db_dg <= 7))
+    is_rgb = literal & alpha_same & ~is_diff & ~is_luma
+    is_rgba = literal & ~alpha_same
+
+    # 4. 计算每个像素输出的字节数，再按偏移量散列写入
+    lengths = np.zeros(n, dtype=np.int64)
+    lengths[run_end | is_index | is_diff] = 1
+    lengths[is_luma] = 2
+    lengths[is_rgb] = 4
+    lengths[is_rgba] = 5
+    offsets = np.cumsum(lengths) - lengths
+    out = np.empty(int(lengths.sum()), dtype=np.uint8)
+
+    o = offsets[run_end]
+    out[o] = _QOI_OP_RUN | (run_len[run_end] - 1)
+
+    o = offsets[is_index]
+    out[o] = _QOI_OP_INDEX | hashes[is_index]
+
+    o = offsets[is_diff]
+    out[o] = _QOI_OP_DIFF | ((dr[is_diff] + 2) << 4) | ((dg[is_diff] + 2) << 2) | (db[is_diff] + 2)
+
+    o = offsets[is_luma]
+    out[o] = _QOI_OP_LUMA | (dg[is_luma] + 32)
+    out[o + 1] = ((dr_dg[is_luma] + 8) << 4) | (db_dg[is_luma] + 8)
+
+    o = offsets[is_rgb]
+    out[o] = _QOI_OP_RGB
+    out[o + 1] = px[is_rgb, 0]
+    out[o + 2] = px[is_rgb, 1]
+    out[o + 3] = px[is_rgb, 2]
+
+    o = offsets[is_rgba]
+    out[o] = _QOI_OP_RGBA
+    for k in range(4):
+        out[o + 1 + k] = px[is_rgba, k]
+
+    return header + out.tobytes() + _QOI_END
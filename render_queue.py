@@ -0,0 +1,283 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import b0
+import imgio
+import source_cache
+
+# ===========================
+# 任务清单 (Manifest)
+# ===========================
+# 清单格式 (JSON):
+# {
+#   "defaults": {"resolution": "1080p", "fps": 60, "encoder": "prores4444"},
+#   "jobs": [
+#     {"image": "a.png", "output": "out/a.mov", "angle": 0, "distance": 500, "speed": 100},
+#     {"image": "a.png", "output": "out/a_4k.mov", "resolution": [3840, 2160], "fps": 120, ...},
+#     {"image": "pano.png", "output": "out/pano.mov", "mmap": true, ...}
+#   ]
+# }
+# 相对路径以清单文件所在目录为基准。
+
+RESOLUTION_PRESETS = {"1080p": (1920, 1080), "4k": (3840, 2160)}
+
+JOB_DEFAULTS = {
+    "resolution": "1080p",
+    "fps": 60,
+    "angle": 0.0,
+    "distance": 500.0,
+    "speed": 100.0,
+    "encoder": b0.DEFAULT_PROFILE,
+    "mmap": False,
+    "motion_blur": 0,
+    "vfr": False,
+    "segment_frames": 0,
+}
+
+
+def _parse_resolution(value):
+    if isinstance(value, str):
+        key = value.lower()
+        if key in RESOLUTION_PRESETS:
+            return RESOLUTION_PRESETS[key]
+        w, _, h = key.partition("x")
+        return int(w), int(h)
+    w, h = value
+    return int(w), int(h)
+
+
+def normalize_job(raw, base_dir="", defaults=None):
+    """把清单中的一条任务补全默认值并校验，返回标准化后的 dict"""
+    job = dict(JOB_DEFAULTS)
+    job.update(defaults or {})
+    job.update(raw)
+
+    for key in ("image", "output"):
+        if not job.get(key):
+            raise ValueError(f"任务缺少字段: {key}")
+        if not os.path.isabs(job[key]):
+            job[key] = os.path.join(base_dir, job[key])
+
+    job["resolution"] = _parse_resolution(job["resolution"])
+    job["fps"] = int(job["fps"])
+    job["motion_blur"] = int(job["motion_blur"])
+    job["segment_frames"] = int(job["segment_frames"])
+    for key in ("angle", "distance", "speed"):
+        job[key] = float(job[key])
+    if job["speed"] <= 0:
+        raise ValueError(f"速度必须为正数: {job['output']}")
+    b0.get_profile(job["encoder"])
+    return job
+
+
+def load_manifest(path):
+    """读取任务清单并返回标准化的任务列表"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {"jobs": data}
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    defaults = data.get("defaults", {})
+    return [normalize_job(raw, base_dir, defaults) for raw in data.get("jobs", [])]
+
+
+# ===========================
+# 并发度估算
+# ===========================
+def _available_memory_bytes():
+    """可用物理内存；无法获取时返回 None"""
+    try:
+        with open("/proc/meminfo", 'r') as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def estimate_job_memory(job):
+    """
+    粗略估算单个任务的峰值内存：
+    若干帧画布缓冲 (Python 端 + 管道 + 编码器内部队列) 再加 FFmpeg 进程本身的开销。
+    """
+    w, h = job["resolution"]
+    return w * h * 4 * 16 + 256 * 1024 * 1024
+
+
+def auto_concurrency(jobs, max_workers=None):
+    """
+    按 CPU 核数与可用内存计算同时运行的 FFmpeg 进程数。
+    每个 FFmpeg 自身会多线程编码，因此每 4 个核心分配一个任务。
+    显式给出 max_workers (> 0) 时以用户设置为准。
+    """
+    if max_workers and max_workers > 0:
+        return max(1, min(max_workers, len(jobs) or 1))
+
+    cores = os.cpu_count() or 4
+    limit = max(1, cores // 4)
+
+    mem = _available_memory_bytes()
+    if mem and jobs:
+        per_job = max(estimate_job_memory(j) for j in jobs)
+        limit = min(limit, max(1, int(mem * 0.8 // per_job)))
+
+    return max(1, min(limit, len(jobs) or 1))
+
+
+# ===========================
+# 共享源图缓存
+# ===========================
+class _SourceCache:
+    """
+    同一张源图只解码一次，供引用它的所有任务共用。
+    按剩余引用计数释放，避免整个队列期间一直占用内存。
+    """
+
+    def __init__(self, jobs):
+        self._refs = {}
+        self._mmap = set()
+        for job in jobs:
+            key = os.path.abspath(job["image"])
+            self._refs[key] = self._refs.get(key, 0) + 1
+            if job.get("mmap"):
+                self._mmap.add(key)
+        self._images = {}
+        self._locks = {key: threading.Lock() for key in self._refs}
+        self.decode_count = 0
+
+    def acquire(self, path):
+        key = os.path.abspath(path)
+        with self._locks[key]:
+            if key not in self._images:
+                if key in self._mmap:
+                    self._images[key] = source_cache.load_source_mmap(key)
+                else:
+                    self._images[key] = imgio.read_bgra(key)
+                self.decode_count += 1
+            return self._images[key]
+
+    def release(self, path):
+        key = os.path.abspath(path)
+        with self._locks[key]:
+            self._refs[key] -= 1
+            if self._refs[key] <= 0:
+                self._images.pop(key, None)
+
+
+# ===========================
+# 渲染队列
+# ===========================
+class RenderQueue:
+    """
+    批量渲染队列：按并发上限调度任务，失败任务按指数退避重试。
+    on_event(dict) 接收任务状态变化 (queued / running / retry / done / failed)，
+    UI 与无界面批处理都通过它获取进度。
+    """
+
+    def __init__(self, jobs, max_workers=None, retries=1, retry_delay=2.0, on_event=None, log_dir=None,
+                 cancel_token=None):
+        self.jobs = list(jobs)
+        self.cancel_token = cancel_token
+        self.workers = auto_concurrency(self.jobs, max_workers)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.on_event = on_event
+        self.log_dir = log_dir
+        self.sources = _SourceCache(self.jobs)
+
+    def _notify(self, **event):
+        if self.on_event:
+            self.on_event(event)
+
+    def _run_job(self, index, job):
+        attempts = 0
+        t0 = time.perf_counter()
+        try:
+            while True:
+                if self.cancel_token is not None and self.cancel_token.cancelled:
+                    result = {"index": index, "ok": False, "output": job["output"], "attempts": attempts,
+                              "error": "已取消", "cancelled": True, "seconds": round(time.perf_counter() - t0, 3)}
+                    self._notify(event="failed", **result)
+                    return result
+                attempts += 1
+                self._notify(event="running", index=index, output=job["output"], attempt=attempts)
+                try:
+                    log_path = None
+                    if self.log_dir:
+                        log_path = os.path.join(self.log_dir, f"job_{index:04d}.telemetry.jsonl")
+                    telemetry = b0.RenderTelemetry(log_path=log_path, interval=1.0)
+                    final_path = b0.render_video(
+                        job["image"], job["output"], job["resolution"], job["fps"], job["angle"],
+                        job["distance"], job["speed"], job["encoder"],
+                        telemetry=telemetry, source=self.sources.acquire(job["image"]),
+                        motion_blur=job["motion_blur"], vfr=bool(job["vfr"]), cancel_token=self.cancel_token,
+                        segment_frames=job["segment_frames"])
+                    result = {"index": index, "ok": True, "output": final_path, "attempts": attempts,
+                              "frames": telemetry.total_frames, "skipped_frames": telemetry.frames_skipped,
+                              "seconds": round(time.perf_counter() - t0, 3)}
+                    self._notify(event="done", **result)
+                    return result
+                except b0.RenderCancelled:
+                    continue
+                except Exception as e:
+                    if attempts > self.retries:
+                        result = {"index": index, "ok": False, "output": job["output"], "attempts": attempts,
+                                  "error": str(e), "seconds": round(time.perf_counter() - t0, 3)}
+                        self._notify(event="failed", **result)
+                        return result
+                    self._notify(event="retry", index=index, output=job["output"], attempt=attempts, error=str(e))
+                    time.sleep(self.retry_delay * (2 ** (attempts - 1)))
+        finally:
+            self.sources.release(job["image"])
+
+    def run(self):
+        """执行全部任务，按清单顺序返回结果列表"""
+        if self.log_dir:
+            os.makedirs(self.log_dir, exist_ok=True)
+        for index, job in enumerate(self.jobs):
+            self._notify(event="queued", index=index, output=job["output"])
+
+        results = [None] * len(self.jobs)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self._run_job, i, job): i for i, job in enumerate(self.jobs)}
+            for fut in as_completed(futures):
+                results[futures[fut]] = fut.result()
+        return results
+
+
+def run_manifest(path, max_workers=None, retries=1, on_event=None, log_dir=None, cancel_token=None):
+    """读取清单并执行，返回 (结果列表, 队列对象)"""
+    queue = RenderQueue(load_manifest(path), max_workers=max_workers, retries=retries, on_event=on_event,
+                        log_dir=log_dir, cancel_token=cancel_token)
+    return queue.run(), queue
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="b0 批量渲染队列")
+    parser.add_argument("manifest", help="任务清单 JSON")
+    parser.add_argument("--workers", type=int, default=0, help="并发 FFmpeg 进程上限 (默认按 CPU/内存自动计算)")
+    parser.add_argument("--retries", type=int, default=1, help="失败重试次数")
+    parser.add_argument("--log-dir", help="每个任务的遥测日志目录")
+    args = parser.parse_args(argv)
+
+    def on_event(event):
+        print(json.dumps(event, ensure_ascii=False), file=sys.stderr)
+
+    results, queue = run_manifest(args.manifest, args.workers, args.retries, on_event, args.log_dir)
+    print(json.dumps({"workers": queue.workers, "decoded_sources": queue.sources.decode_count,
+                      "results": results}, ensure_ascii=False, indent=2))
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import cv2
+import numpy as np
+
+import imgio
+
+# ===========================
+# 源图内存映射缓存
+# ===========================
+# 大尺寸源图 (全景平移) 只解码一次，保存为原始 BGRA 文件，之后用 np.memmap 映射：
+# 每一帧只会读入当前 ROI 覆盖到的页面，不再把整张图常驻内存。
+# 缓存以文件内容 SHA-1 为键；源文件变化后旧缓存自动失效并删除。
+#
+# 目录结构:
+#   <cache_dir>/index.json         源路径 -> {size, mtime_ns, digest}
+#   <cache_dir>/<digest>.bgra      原始像素 (h * w * 4 字节)
+#   <cache_dir>/<digest>.json      形状信息 {"height": h, "width": w}
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "smallpov_source_cache")
+
+# _index_lock 只保护 index.json 的读写；解码按内容哈希各自加锁，不同源图可以并行解码
+_index_lock = threading.Lock()
+_decode_locks = {}  # digest -> Lock
+_decode_locks_guard = threading.Lock()
+
+
+def _decode_lock(digest):
+    with _decode_locks_guard:
+        return _decode_locks.setdefault(digest, threading.Lock())
+
+
+def _file_digest(path, chunk_size=4 * 1024 * 1024):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _read_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "index.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(cache_dir, index):
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, os.path.join(cache_dir, "index.json"))
+
+
+def _remove_entry(cache_dir, digest):
+    for ext in (".bgra", ".json"):
+        try:
+            os.remove(os.path.join(cache_dir, digest + ext))
+        except OSError:
+            pass
+
+
+def _decode_into_cache(img_path, cache_dir, digest):
+    """
+    解码源图并直接写入缓存文件。
+    PNG 本身也通过 memmap 读入，cvtColor 的输出直接落在目标 memmap 上，
+    省掉一份整图大小的 BGRA 中间拷贝。
+    """
+    img = imgio.decode_file(img_path)
+    if img.dtype != np.uint8:
+        img = cv2.convertScaleAbs(img, alpha=255.0 / 65535.0)
+
+    h, w = img.shape[:2]
+    fd, tmp_raw = tempfile.mkstemp(dir=cache_dir, suffix=".bgra.tmp")
+    os.close(fd)
+    try:
+        out = np.memmap(tmp_raw, dtype=np.uint8, mode='w+', shape=(h, w, 4))
+        imgio.to_bgra(img, dst=out)
+        del img
+        out.flush()
+        del out
+        os.replace(tmp_raw, os.path.join(cache_dir, digest + ".bgra"))
+    except Exception:
+        try:
+            os.remove(tmp_raw)
+        except OSError:
+            pass
+        raise
+
+    fd, tmp_meta = tempfile.mkstemp(dir=cache_dir, suffix=".json.tmp")
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump({"height": h, "width": w}, f)
+    os.replace(tmp_meta, os.path.join(cache_dir, digest + ".json"))
+
+
+def load_source_mmap(img_path, cache_dir=None):
+    """
+    返回源图的只读 BGRA memmap (h, w, 4)。
+    同一内容的图片在多次渲染之间复用缓存；文件大小或修改时间变化时重新计算哈希，
+    内容确实变了则重建缓存并删除旧条目。
+    """
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    key = os.path.abspath(img_path)
+    st = os.stat(key)
+
+    with _index_lock:
+        entry = _read_index(cache_dir).get(key)
+    if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+        digest = entry["digest"]
+    else:
+        # 哈希整个文件较慢，放在锁外计算
+        digest = _file_digest(key)
+        with _index_lock:
+            index = _read_index(cache_dir)
+            entry = index.get(key)
+            if entry and entry["digest"] != digest:
+                # 源文件内容已变化：没有其他路径引用旧缓存时删除
+                still_used = any(v["digest"] == entry["digest"] for k, v in index.items() if k != key)
+                if not still_used:
+                    _remove_entry(cache_dir, entry["digest"])
+            index[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "digest": digest}
+            _write_index(cache_dir, index)
+
+    raw_path = os.path.join(cache_dir, digest + ".bgra")
+    meta_path = os.path.join(cache_dir, digest + ".json")
+    with _decode_lock(digest):
+        if not (os.path.exists(raw_path) and os.path.exists(meta_path)):
+            _decode_into_cache(key, cache_dir, digest)
+
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    return np.memmap(raw_path, dtype=np.uint8, mode='r', shape=(meta["height"], meta["width"], 4))
+
+
+def clear_source_cache(cache_dir=None):
+    """删除全部缓存文件，返回释放的字节数"""
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    freed = 0
+    with _index_lock:
+        if not os.path.isdir(cache_dir):
+            return 0
+        for entry in os.scandir(cache_dir):
+            if entry.is_file():
+                freed += entry.stat().st_size
+                os.remove(entry.path)
+    return freed
@@ -0,0 +1,106 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# 工具模块都在仓库根目录 (没有打包)，测试直接从根目录导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def wait_until(predicate, timeout=10.0, interval=0.05):
+    """轮询直到 predicate() 为真，超时返回 False"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return predicate()
+
+
+# ===========================
+# 本地 HTTP 桩服务
+# ===========================
+class StubServer:
+    """
+    127.0.0.1 上的多线程 HTTP/1.1 服务。route(handler, method, path) 返回 (status, headers, body)；
+    记录每个请求的 (method, path)、同时处理中的最大请求数与服务端接受的连接数。
+    """
+
+    def __init__(self, route):
+        self.route = route
+        self.requests = []
+        self.connections = 0
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub.lock:
+                    stub.connections += 1
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                with stub.lock:
+                    stub.requests.append((self.command, self.path))
+                    stub.active += 1
+                    stub.peak = max(stub.peak, stub.active)
+                try:
+                    status, headers, body = stub.route(self, self.command, self.path)
+                finally:
+                    with stub.lock:
+                        stub.active -= 1
+                try:
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    if self.command != "HEAD":
+                        self.wfile.write(body)
+                except OSError:
+                    # 客户端已超时断开
+                    self.close_connection = True
+
+            do_GET = do_HEAD = do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def count(self, path):
+        with self.lock:
+            return sum(1 for _, p in self.requests if p == path)
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    """工厂: stub_server(route) 启动一个 StubServer，测试结束时关闭"""
+    servers = []
+
+    def start(route):
+        server = StubServer(route)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
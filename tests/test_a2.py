@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+import a2
+
+
+def test_downsample_keeps_color_at_low_alpha():
+    img = np.empty((8, 8, 4), dtype=np.uint8)
+    img[:] = (200, 100, 50, 3)
+    small = a2.downsample_bgra(img, (2, 2))
+    assert small.dtype == np.uint8
+    assert (small == (200, 100, 50, 3)).all()
+
+
+def test_downsample_ignores_transparent_background():
+    img = np.zeros((4, 4, 4), dtype=np.uint8)
+    img[:, :, :3] = 255          # 透明区域的底色为白色
+    img[:, 2:] = (0, 0, 255, 255)
+    small = a2.downsample_bgra(img, (1, 1))
+    # 白色底色不会渗进边缘：颜色只来自不透明的红色，Alpha 取平均
+    assert small[0, 0].tolist() == [0, 0, 255, 128]
@@ -0,0 +1,67 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+import atlas
+import imgio
+
+
+def write_sprite(folder, name, w, h, color):
+    img = np.zeros((h + 4, w + 4, 4), dtype=np.uint8)
+    img[2:2 + h, 2:2 + w] = color
+    cv2.imwrite(os.path.join(folder, name), img)
+
+
+@pytest.fixture
+def sprites(tmp_path):
+    folder = tmp_path / "sprites"
+    folder.mkdir()
+    for i in range(1, 6):
+        write_sprite(str(folder), f"slide_{i}.png", 10 * i, 8, (i * 40, 0, 0, 255))
+    return str(folder)
+
+
+def test_build_atlas_places_trimmed_frames(sprites, tmp_path):
+    out = str(tmp_path / "out")
+    result = atlas.build_atlas(sprites, out, max_size=64, padding=1)
+    assert result["frames"] == 5
+    with open(result["manifest"], encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert list(manifest["frames"]) == [f"slide_{i}.png" for i in range(1, 6)]
+    sheets = [imgio.read_bgra(p, cache=False) for p in result["atlases"]]
+    for i, (rel, frame) in enumerate(manifest["frames"].items(), 1):
+        assert frame["spriteSourceSize"] == {"x": 2, "y": 2, "w": 10 * i, "h": 8}
+        box = frame["frame"]
+        region = sheets[frame["atlas"]][box["y"]:box["y"] + box["h"], box["x"]:box["x"] + box["w"]]
+        assert (region == (i * 40, 0, 0, 255)).all()
+
+
+def test_pot_requires_power_of_two_max_size(sprites, tmp_path):
+    with pytest.raises(ValueError):
+        atlas.build_atlas(sprites, str(tmp_path / "out"), max_size=100, pot=True)
+    result = atlas.build_atlas(sprites, str(tmp_path / "out"), max_size=64, pot=True)
+    for path in result["atlases"]:
+        h, w = imgio.read_bgra(path, cache=False).shape[:2]
+        assert w <= 64 and h <= 64
+        assert w & (w - 1) == 0 and h & (h - 1) == 0
+
+
+def test_frame_changed_between_passes_aborts(sprites, tmp_path, monkeypatch):
+    original = atlas.trim_rect
+
+    def trim_then_resize(img):
+        rect = original(img)
+        # 分析完 slide_3 后把它换成另一尺寸的图片
+        if img.shape[1] == 34:
+            write_sprite(sprites, "slide_3.png", 50, 50, (0, 255, 0, 255))
+        return rect
+
+    monkeypatch.setattr(atlas, "trim_rect", trim_then_resize)
+    out = tmp_path / "out"
+    with pytest.raises(ValueError):
+        atlas.build_atlas(sprites, str(out), max_size=64)
+    assert not (out / "atlas.json").exists()
@@ -0,0 +1,98 @@
+import io
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+import b0
+
+
+def test_segmentable_profiles():
+    assert b0.supports_segments("prores4444")
+    assert not b0.supports_segments("webp_anim")
+    assert not b0.supports_segments("png_seq")
+
+
+@pytest.mark.parametrize("profile, segmented", [("prores4444", True), ("webp_anim", False)])
+def test_segment_gate(profile, segmented, monkeypatch, tmp_path):
+    calls = []
+
+    class FakeWriter:
+        def write(self, frame):
+            pass
+
+        def write_repeat(self):
+            pass
+
+        def close(self):
+            calls.append("single")
+
+        def abort(self):
+            pass
+
+    monkeypatch.setattr(b0, "_render_segmented", lambda *args: calls.append("segmented"))
+    monkeypatch.setattr(b0, "_open_writer", lambda *args, **kwargs: FakeWriter())
+    source = np.zeros((64, 64, 4), dtype=np.uint8)
+    src = tmp_path / "src.png"
+    src.write_bytes(b"png")
+    b0.render_video(str(src), str(tmp_path / ("out" + b0.get_profile(profile)["ext"])), (32, 32), 10, 0, 20, 100,
+                    profile, source=source, segment_frames=5)
+    assert calls == ["segmented" if segmented else "single"]
+
+
+class FakeProcess:
+    """代替 FFmpeg 进程：记录命令行与写入 stdin 的字节"""
+
+    def __init__(self, command, **kwargs):
+        self.command = command
+        self.stdin = io.BytesIO()
+        self.stdin.close = lambda: None
+        self.stdout = []
+        self.stderr = []
+        self.returncode = 0
+
+    def wait(self, timeout=None):
+        return 0
+
+
+def _write_sequence(writer, frame_size):
+    # 0 0 0 1 1 2 2 : 7 帧里只有 3 帧不同
+    for value in [0, None, None, 1, None, 2, None]:
+        if value is None:
+            writer.write_repeat()
+        else:
+            writer.write(np.full(frame_size, value, dtype=np.uint8))
+
+
+def test_ffmpeg_writer_skips_duplicate_frames(monkeypatch, tmp_path):
+    procs = []
+    monkeypatch.setattr(b0, "check_ffmpeg", lambda: True)
+    monkeypatch.setattr(b0.subprocess, "Popen", lambda command, **kw: procs.append(FakeProcess(command)) or procs[-1])
+
+    writer = b0._FFmpegWriter(str(tmp_path / "out.mov"), (64, 48), 30, "prores4444")
+    _write_sequence(writer, (48, 64, 4))
+    writer.close()
+
+    command = procs[0].command
+    assert command[command.index("-f") + 1] == "nut"
+    assert "fps=30" in command
+    frame_bytes = 64 * 48 * 4
+    sent = procs[0].stdin.getvalue()
+    # 3 个不同帧 + 结尾补发一次，重复帧不经过管道
+    assert frame_bytes * 4 < len(sent) < frame_bytes * 5
+
+    b0._FFmpegWriter(str(tmp_path / "out.mkv"), (64, 48), "60/2", "ffv1", vfr=True)
+    assert "passthrough" in procs[1].command
+
+
+@pytest.mark.skipif(not b0.check_ffmpeg(), reason="需要 ffmpeg")
+@pytest.mark.parametrize("vfr, expected", [(False, list(range(7))), (True, [0, 3, 5, 6])])
+def test_ffmpeg_writer_timestamps(vfr, expected, tmp_path):
+    output = str(tmp_path / "out.mkv")
+    writer = b0._FFmpegWriter(output, (64, 48), 30, "ffv1", vfr=vfr)
+    _write_sequence(writer, (48, 64, 4))
+    writer.close()
+    result = b0.subprocess.run(["ffmpeg", "-i", output, "-f", "framecrc", "-"], capture_output=True, text=True)
+    pts = [int(line.split(",")[1]) for line in result.stdout.splitlines() if line.startswith("0,")]
+    assert pts == expected
@@ -0,0 +1,40 @@
+import json
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+import cli
+
+
+def test_batch_failures_keep_stdout_json_and_fail_the_job(tmp_path, capsys):
+    folder = tmp_path / "imgs"
+    folder.mkdir()
+    cv2.imwrite(str(folder / "good.png"), np.full((8, 8, 4), 255, dtype=np.uint8))
+    (folder / "broken.png").write_bytes(b"not a png")
+
+    code = cli.main(["crop", str(folder), "--top", "1"])
+    out, err = capsys.readouterr()
+
+    report = json.loads(out)
+    assert code == 1
+    assert not report["ok"]
+    result = report["results"][0]
+    assert not result["ok"]
+    assert result["result"]["failed"] == 1
+    assert result["result"]["success"] == 1
+    assert "broken.png" in err
+    assert cv2.imread(str(folder / "good.png"), cv2.IMREAD_UNCHANGED).shape[:2] == (7, 8)
+
+
+def test_clean_batch_is_ok(tmp_path, capsys):
+    folder = tmp_path / "imgs"
+    folder.mkdir()
+    cv2.imwrite(str(folder / "a.png"), np.zeros((8, 8, 4), dtype=np.uint8))
+
+    code = cli.main(["crop", str(folder), "--left", "2"])
+    report = json.loads(capsys.readouterr().out)
+    assert code == 0
+    assert report["ok"]
+    assert report["results"][0]["result"]["failed"] == 0
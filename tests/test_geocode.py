@@ -0,0 +1,146 @@
+import asyncio
+import time
+
+import pytest
+
+from geocode import Geocoder, GeocodeCache, MockProvider, RateLimiter, make_provider
+
+
+def geocoder_for(tmp_path, provider):
+    return Geocoder(provider, db_path=str(tmp_path / "cache.sqlite3"))
+
+
+class RecordingProvider(MockProvider):
+    """记录每批请求的地址；fail_first=True 时第一批请求抛出异常"""
+
+    name = "recording"
+
+    def __init__(self, fail_first=False, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_first = fail_first
+        self.batches = []
+
+    async def geocode_batch(self, client, addresses):
+        self.batches.append(list(addresses))
+        if self.fail_first and len(self.batches) == 1:
+            self.requests += 1
+            raise RuntimeError("服务不可用")
+        return await super().geocode_batch(client, addresses)
+
+
+def test_repeated_addresses_are_served_from_cache(tmp_path):
+    provider = MockProvider(batch_size=5)
+    addresses = [f"测试市第{i % 4}号" for i in range(12)]
+
+    geocoder = geocoder_for(tmp_path, provider)
+    try:
+        first = geocoder.geocode(addresses)
+        assert provider.requests == 1
+        assert geocoder.stats["network"] == 4
+        assert [r["status"] for r in first] == ["ok"] * 12
+        assert first[0]["lng"] == first[4]["lng"]
+
+        second = geocoder.geocode(addresses + ["  测试市第1号 "])
+    finally:
+        geocoder.close()
+    assert provider.requests == 1
+    assert geocoder.stats["cache_hits"] == 4
+    assert all(r["source"] == "cache" for r in second)
+    assert [(r["lng"], r["lat"]) for r in second[:12]] == [(r["lng"], r["lat"]) for r in first]
+    assert second[-1]["lng"] == first[1]["lng"]
+
+
+def test_not_found_is_cached(tmp_path):
+    provider = MockProvider()
+    geocoder = geocoder_for(tmp_path, provider)
+    try:
+        assert geocoder.geocode(["不存在的地址"])[0]["status"] == "not_found"
+        again = geocoder.geocode(["不存在的地址"])[0]
+    finally:
+        geocoder.close()
+    assert again["status"] == "not_found"
+    assert again["source"] == "cache"
+    assert provider.requests == 1
+
+
+def test_provider_error_marks_batch_and_is_not_cached(tmp_path):
+    provider = RecordingProvider(fail_first=True, batch_size=2, concurrency=1)
+    addresses = ["甲路1号", "甲路2号", "乙路1号"]
+
+    geocoder = geocoder_for(tmp_path, provider)
+    try:
+        results = geocoder.geocode(addresses)
+        failed = set(provider.batches[0])
+        for r in results:
+            if r["address"] in failed:
+                assert r["status"] == "error"
+                assert "服务不可用" in r["error"]
+            else:
+                assert r["status"] == "ok"
+        assert geocoder.stats["errors"] == 2
+
+        cache = GeocodeCache(geocoder.cache.db_path)
+        try:
+            assert set(cache.lookup(provider.name, addresses)) == set(addresses) - failed
+        finally:
+            cache.close()
+
+        # 失败的地址下次重新请求
+        retry = geocoder.geocode(addresses)
+    finally:
+        geocoder.close()
+    assert [r["status"] for r in retry] == ["ok"] * 3
+    assert sorted(provider.batches[-1]) == sorted(failed)
+
+
+def test_misses_are_split_by_batch_size(tmp_path):
+    provider = RecordingProvider(batch_size=3)
+    geocoder = geocoder_for(tmp_path, provider)
+    try:
+        geocoder.geocode([f"丙路{i}号" for i in range(8)])
+    finally:
+        geocoder.close()
+    assert sorted(len(b) for b in provider.batches) == [2, 3, 3]
+    assert sorted(a for b in provider.batches for a in b) == sorted(f"丙路{i}号" for i in range(8))
+    assert geocoder.stats["requests"] == 3
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(20)
+
+    async def go():
+        stamps = []
+        for _ in range(5):
+            await limiter.acquire()
+            stamps.append(time.monotonic())
+        return stamps
+
+    stamps = asyncio.run(go())
+    # 20 次/秒：相邻请求至少间隔 0.05 秒 (首个请求立即发放)
+    assert stamps[-1] - stamps[0] >= 4 * 0.05 - 0.01
+    assert RateLimiter(0).interval == 0.0
+
+
+def test_rate_limit_applies_to_geocoder(tmp_path):
+    provider = MockProvider(batch_size=1, rate_limit=20, concurrency=8)
+    geocoder = geocoder_for(tmp_path, provider)
+    try:
+        t0 = time.monotonic()
+        geocoder.geocode([f"丁路{i}号" for i in range(5)])
+        elapsed = time.monotonic() - t0
+    finally:
+        geocoder.close()
+    assert provider.requests == 5
+    assert elapsed >= 4 * 0.05 - 0.01
+
+
+def test_empty_address_is_an_error(tmp_path):
+    geocoder = geocoder_for(tmp_path, MockProvider())
+    try:
+        row = geocoder.geocode(["   "])[0]
+    finally:
+        geocoder.close()
+    assert row["status"] == "error"
+    assert row["error"]
+    with pytest.raises(ValueError):
+        make_provider("nope")
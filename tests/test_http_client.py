@@ -0,0 +1,185 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from http_client import AsyncHTTPClient, TTLCache
+
+
+def run(coro_fn, **client_kwargs):
+    """在新事件循环中创建客户端并执行 coro_fn(client)，结束后关闭连接"""
+    async def main():
+        client = AsyncHTTPClient(**client_kwargs)
+        try:
+            return await coro_fn(client)
+        finally:
+            await client.close()
+    return asyncio.run(main())
+
+
+def ok_route(handler, method, path):
+    return 200, {"Content-Type": "text/plain; charset=utf-8"}, f"{method} {path}".encode("utf-8")
+
+
+def test_keepalive_reuses_connection(stub_server):
+    server = stub_server(ok_route)
+
+    async def go(client):
+        bodies = [(await client.get(f"{server.url}/item/{i}")).text() for i in range(5)]
+        return bodies, dict(client.stats)
+
+    bodies, stats = run(go)
+    assert bodies == [f"GET /item/{i}" for i in range(5)]
+    assert stats["connections"] == 1
+    assert stats["reused"] == 4
+    assert server.connections == 1
+
+
+def test_per_host_limit(stub_server):
+    def slow_route(handler, method, path):
+        time.sleep(0.1)
+        return ok_route(handler, method, path)
+
+    server = stub_server(slow_route)
+
+    async def go(client):
+        return await client.get_many([f"{server.url}/n/{i}" for i in range(12)])
+
+    results = run(go, max_per_host=3)
+    assert all(r.status == 200 for r in results)
+    assert server.peak == 3
+    assert server.count("/n/0") == 1
+
+
+def test_timeout_raises(stub_server):
+    release = threading.Event()
+
+    def hang_route(handler, method, path):
+        release.wait(5)
+        return ok_route(handler, method, path)
+
+    server = stub_server(hang_route)
+
+    async def go(client):
+        t0 = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            await client.get(f"{server.url}/hang")
+        return time.monotonic() - t0
+
+    try:
+        elapsed = run(go, timeout=0.2, retries=0)
+    finally:
+        release.set()
+    assert elapsed < 2.0
+
+
+def test_retry_with_backoff_on_retry_status(stub_server):
+    calls = {"n": 0}
+
+    def flaky_route(handler, method, path):
+        calls["n"] += 1
+        if calls["n"] <= 2:
+            return 503, {}, b"busy"
+        return ok_route(handler, method, path)
+
+    server = stub_server(flaky_route)
+    stats = {}
+
+    async def go(client):
+        t0 = time.monotonic()
+        resp = await client.get(f"{server.url}/flaky")
+        stats.update(client.stats)
+        return resp, time.monotonic() - t0
+
+    resp, elapsed = run(go, retries=2, backoff=0.1)
+    assert resp.status == 200
+    assert server.count("/flaky") == 3
+    assert stats["retries"] == 2
+    # 退避 0.1 + 0.2 秒
+    assert elapsed >= 0.3
+
+
+def test_retry_exhausted_returns_last_status(stub_server):
+    server = stub_server(lambda h, m, p: (503, {"Retry-After": "0"}, b"busy"))
+
+    async def go(client):
+        return await client.get(f"{server.url}/down")
+
+    resp = run(go, retries=2, backoff=0.01)
+    assert resp.status == 503
+    assert not resp.ok
+    assert server.count("/down") == 3
+
+
+def test_post_is_never_retried(stub_server):
+    server = stub_server(lambda h, m, p: (503, {}, b"busy"))
+
+    async def go(client):
+        return await client.request("POST", f"{server.url}/submit", body=b"payload")
+
+    resp = run(go, retries=3, backoff=0.01)
+    assert resp.status == 503
+    assert server.count("/submit") == 1
+
+
+def test_post_network_error_is_not_retried(stub_server):
+    def drop_route(handler, method, path):
+        # 不返回响应直接断开连接
+        handler.close_connection = True
+        handler.connection.shutdown(2)
+        return ok_route(handler, method, path)
+
+    server = stub_server(drop_route)
+
+    async def go(client):
+        with pytest.raises(Exception):
+            await client.request("POST", f"{server.url}/submit", body=b"payload")
+
+    run(go, retries=3, backoff=0.01)
+    assert server.count("/submit") == 1
+
+
+def test_get_responses_are_cached(stub_server):
+    server = stub_server(ok_route)
+    cache = TTLCache(ttl=60)
+
+    async def go(client):
+        first = await client.get(f"{server.url}/cached")
+        second = await client.get(f"{server.url}/cached")
+        return first, second
+
+    first, second = run(go, cache=cache)
+    assert not first.from_cache
+    assert second.from_cache
+    assert second.body == first.body
+    assert server.count("/cached") == 1
+    assert cache.hits == 1
+
+
+def test_cache_entries_expire(stub_server):
+    server = stub_server(ok_route)
+
+    async def go(client):
+        await client.get(f"{server.url}/short", cache_ttl=0.1)
+        await asyncio.sleep(0.2)
+        return await client.get(f"{server.url}/short", cache_ttl=0.1)
+
+    resp = run(go)
+    assert not resp.from_cache
+    assert server.count("/short") == 2
+
+
+def test_ttl_cache_lru_and_expiry():
+    cache = TTLCache(maxsize=2, ttl=0.1)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    # b 最久未使用，被挤出
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    time.sleep(0.15)
+    assert cache.get("a") is None
+    assert len(cache) == 1
+    assert (cache.hits, cache.misses) == (2, 2)
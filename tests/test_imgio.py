@@ -0,0 +1,57 @@
+import os
+import stat
+import sys
+
+import pytest
+
+pytest.importorskip("cv2")
+
+import imgio
+
+posix_only = pytest.mark.skipif(sys.platform == "win32", reason="POSIX 权限位")
+
+
+def mode_of(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+@posix_only
+def test_new_file_gets_umask_default_mode(tmp_path):
+    path = tmp_path / "new.bin"
+    imgio.atomic_write_bytes(str(path), b"data")
+    assert path.read_bytes() == b"data"
+    assert mode_of(path) == 0o666 & ~imgio._UMASK
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="需要 /proc")
+def test_umask_is_read_without_changing_it(monkeypatch):
+    expected = imgio._UMASK
+
+    def fail(mask):
+        raise AssertionError("os.umask 不应被调用")
+
+    monkeypatch.setattr(imgio.os, "umask", fail)
+    assert imgio._read_umask() == expected
+
+
+@posix_only
+def test_overwrite_keeps_existing_mode(tmp_path):
+    path = tmp_path / "shared.png"
+    path.write_bytes(b"old")
+    os.chmod(path, 0o640)
+    imgio.atomic_write_bytes(str(path), b"new")
+    assert path.read_bytes() == b"new"
+    assert mode_of(path) == 0o640
+
+
+def test_failed_write_leaves_target_untouched(tmp_path):
+    path = tmp_path / "keep.bin"
+    path.write_bytes(b"old")
+
+    def refuse(tmp):
+        raise RuntimeError("abort")
+
+    with pytest.raises(RuntimeError):
+        imgio.atomic_write_bytes(str(path), b"new", before_replace=refuse)
+    assert path.read_bytes() == b"old"
+    assert os.listdir(tmp_path) == ["keep.bin"]
@@ -0,0 +1,116 @@
+import sys
+import textwrap
+
+import pytest
+
+import launcher
+from conftest import wait_until
+
+DUMMY_SCRIPT = textwrap.dedent("""
+    import sys, time
+    seconds, code = float(sys.argv[1]), int(sys.argv[2])
+    mode = sys.argv[3] if len(sys.argv) > 3 else "sleep"
+    if mode == "busy":
+        ballast = bytearray(64 * 1024 * 1024)
+        for i in range(0, len(ballast), 4096):
+            ballast[i] = 1
+        end = time.time() + seconds
+        while time.time() < end:
+            pass
+    else:
+        time.sleep(seconds)
+    sys.exit(code)
+""")
+
+
+@pytest.fixture
+def dummy(tmp_path):
+    path = tmp_path / "dummy.py"
+    path.write_text(DUMMY_SCRIPT, encoding="utf-8")
+    return str(path)
+
+
+def make_registry(tools, max_running=0, interval=0.1):
+    return {"max_running": max_running, "sample_interval": interval,
+            "tools": {t["name"]: launcher.normalize_tool(t) for t in tools}}
+
+
+def test_default_registry_has_no_external_tools():
+    assert launcher.load_registry()["tools"] == {}
+
+
+def test_restart_on_failure_until_limit(dummy):
+    registry = make_registry([{"name": "fail", "path": sys.executable, "args": [dummy, "0", "3"],
+                               "restart": "on-failure", "max_restarts": 2, "restart_delay": 0.1}])
+    events = []
+    sup = launcher.Supervisor(registry, on_event=events.append)
+    try:
+        entry_id = sup.launch("fail")
+        assert wait_until(lambda: sup.table()[0]["state"] == "exited" and sup.table()[0]["restarts"] == 2)
+        entry = sup.table()[0]
+        assert entry["id"] == entry_id and entry["exit_code"] == 3
+        assert [e["event"] for e in events].count("restarting") == 2
+        assert [e["event"] for e in events].count("started") == 3
+    finally:
+        sup.shutdown(stop_children=True)
+
+
+def test_no_restart_after_success(dummy):
+    registry = make_registry([{"name": "ok", "path": sys.executable, "args": [dummy, "0", "0"],
+                               "restart": "on-failure", "restart_delay": 0.1}])
+    sup = launcher.Supervisor(registry)
+    try:
+        sup.launch("ok")
+        assert wait_until(lambda: sup.table()[0]["state"] == "exited")
+        assert sup.table()[0]["restarts"] == 0 and sup.table()[0]["exit_code"] == 0
+    finally:
+        sup.shutdown(stop_children=True)
+
+
+def test_global_and_per_tool_concurrency_limits(dummy):
+    registry = make_registry([
+        {"name": "slow", "path": sys.executable, "args": [dummy, "1.0", "0"], "max_instances": 1},
+        {"name": "other", "path": sys.executable, "args": [dummy, "1.0", "0"]},
+    ], max_running=2)
+    sup = launcher.Supervisor(registry)
+    try:
+        for name in ("slow", "slow", "other", "other"):
+            sup.launch(name)
+        states = {e["id"]: e["state"] for e in sup.table()}
+        # slow 每次最多 1 个实例，全局最多 2 个：slow#1 + other#3 运行，其余排队
+        assert states == {1: "running", 2: "queued", 3: "running", 4: "queued"}
+        peak = []
+
+        def all_done():
+            table = sup.table()
+            peak.append(sum(e["state"] == "running" for e in table))
+            return all(e["state"] == "exited" for e in table)
+
+        assert wait_until(all_done, timeout=15)
+        assert max(peak) <= 2
+    finally:
+        sup.shutdown(stop_children=True)
+
+
+def test_stop_does_not_restart(dummy):
+    registry = make_registry([{"name": "long", "path": sys.executable, "args": [dummy, "30", "0"],
+                               "restart": "always", "restart_delay": 0.1}])
+    sup = launcher.Supervisor(registry)
+    try:
+        entry_id = sup.launch("long")
+        sup.stop(entry_id)
+        assert wait_until(lambda: sup.table()[0]["state"] == "stopped")
+        assert sup.table()[0]["restarts"] == 0
+    finally:
+        sup.shutdown(stop_children=True)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="/proc 采样仅支持 Linux")
+def test_proc_sampling_reports_cpu_and_rss(dummy):
+    registry = make_registry([{"name": "busy", "path": sys.executable, "args": [dummy, "3", "0", "busy"]}])
+    sup = launcher.Supervisor(registry)
+    try:
+        sup.launch("busy")
+        assert wait_until(lambda: (sup.table()[0]["cpu"] or 0) > 20 and (sup.table()[0]["rss"] or 0) > 60 * 2 ** 20)
+    finally:
+        sup.shutdown(stop_children=True)
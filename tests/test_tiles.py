@@ -0,0 +1,167 @@
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import tiles
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+WORLD = (-180.0, -85.0, 180.0, 85.0)
+
+
+def tile_png(z, x, y):
+    return PNG_SIGNATURE + f"tile {z}/{x}/{y}".encode("ascii")
+
+
+def parse_tile_path(path):
+    z, x, y = path.strip("/").split(".")[0].split("/")
+    return int(z), int(x), int(y)
+
+
+def tile_route(handler, method, path):
+    return 200, {"Content-Type": "image/png"}, tile_png(*parse_tile_path(path))
+
+
+def source_for(server):
+    return {"label": "stub", "url": server.url + "/{z}/{x}/{y}.png", "format": "png", "subdomains": "", "bulk": True}
+
+
+def test_tile_ranges_for_bbox():
+    # 北京五环附近
+    bbox = (116.2, 39.8, 116.5, 40.0)
+    assert tiles.tile_ranges(bbox, 10, 10) == [(10, 842, 843, 387, 388)]
+    assert tiles.count_tiles(WORLD, 0, 2) == 1 + 4 + 16
+    assert len(list(tiles.iter_tiles(bbox, 10, 12))) == tiles.count_tiles(bbox, 10, 12)
+    with pytest.raises(ValueError):
+        tiles.tile_ranges((10, 0, 5, 1), 1, 1)
+
+
+def test_prefetch_downloads_every_tile_once(stub_server, tmp_path):
+    server = stub_server(tile_route)
+    path = str(tmp_path / "world.mbtiles")
+
+    report = tiles.prefetch(path, WORLD, 0, 2, source=source_for(server), concurrency=4)
+    assert report["total"] == 21
+    assert report["downloaded"] == 21
+    assert report["failed"] == 0
+    assert report["tiles"] == 21
+    assert len(server.requests) == 21
+    assert {parse_tile_path(p) for _, p in server.requests} == set(tiles.iter_tiles(WORLD, 0, 2))
+
+    # 再次运行时已有瓦片全部跳过
+    again = tiles.prefetch(path, WORLD, 0, 2, source=source_for(server), concurrency=4)
+    assert again["skipped"] == 21
+    assert again["downloaded"] == 0
+    assert len(server.requests) == 21
+
+
+def test_prefetch_parallelism_is_bounded(stub_server, tmp_path):
+    def slow_route(handler, method, path):
+        time.sleep(0.05)
+        return tile_route(handler, method, path)
+
+    server = stub_server(slow_route)
+    report = tiles.prefetch(str(tmp_path / "t.mbtiles"), WORLD, 0, 3, source=source_for(server), concurrency=3)
+    assert report["downloaded"] == 85
+    assert server.peak == 3
+
+
+def test_prefetch_counts_failed_tiles(stub_server, tmp_path):
+    def sparse_route(handler, method, path):
+        z, x, y = parse_tile_path(path)
+        if z == 2 and x == 0:
+            return 404, {}, b"missing"
+        return tile_route(handler, method, path)
+
+    server = stub_server(sparse_route)
+    report = tiles.prefetch(str(tmp_path / "t.mbtiles"), WORLD, 0, 2, source=source_for(server))
+    assert report["failed"] == 4
+    assert report["downloaded"] == 17
+    assert report["tiles"] == 17
+
+
+def test_identical_tiles_are_stored_once(stub_server, tmp_path):
+    ocean = PNG_SIGNATURE + b"ocean"
+
+    def ocean_route(handler, method, path):
+        z, x, y = parse_tile_path(path)
+        body = tile_png(z, x, y) if (x, y) == (0, 0) else ocean
+        return 200, {"Content-Type": "image/png"}, body
+
+    server = stub_server(ocean_route)
+    path = str(tmp_path / "t.mbtiles")
+    report = tiles.prefetch(path, WORLD, 0, 2, source=source_for(server))
+    assert report["tiles"] == 21
+    # 每级 (0, 0) 各一张 + 共用的 ocean
+    assert report["unique_images"] == 4
+    assert report["new_images"] == 4
+
+    store = tiles.MBTilesStore(path)
+    try:
+        assert store.get(2, 3, 3) == ocean
+        assert store.get(2, 0, 0) == tile_png(2, 0, 0)
+        assert store.put_many([(3, 0, 0, ocean)]) == 0
+        assert store.stats()["unique_images"] == 4
+    finally:
+        store.close()
+
+
+def test_serve_returns_stored_tiles(stub_server, tmp_path):
+    server = stub_server(tile_route)
+    path = str(tmp_path / "t.mbtiles")
+    tiles.prefetch(path, WORLD, 0, 1, source=source_for(server))
+
+    httpd, url = tiles.serve(path)
+    try:
+        with urllib.request.urlopen(url + "1/1/0.png", timeout=5) as resp:
+            assert resp.status == 200
+            assert resp.headers["Content-Type"] == "image/png"
+            assert resp.read() == tile_png(1, 1, 0)
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            assert b'"minzoom": "0"' in resp.read()
+        with pytest.raises(urllib.error.HTTPError) as err:
+            urllib.request.urlopen(url + "5/0/0.png", timeout=5)
+        assert err.value.code == 404
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_prefetch_cancel(stub_server, tmp_path):
+    cancel = threading.Event()
+
+    def cancelling_route(handler, method, path):
+        cancel.set()
+        return tile_route(handler, method, path)
+
+    server = stub_server(cancelling_route)
+    report = tiles.prefetch(str(tmp_path / "t.mbtiles"), WORLD, 0, 4, source=source_for(server),
+                            concurrency=2, cancel_event=cancel)
+    assert report["cancelled"]
+    assert report["downloaded"] + report["failed"] < report["total"]
+
+
+def test_public_tile_services_are_not_bulk_targets():
+    assert tiles.TILE_SOURCES == {}
+    with pytest.raises(ValueError):
+        tiles.resolve_source("https://tile.openstreetmap.org/{z}/{x}/{y}.png")
+    with pytest.raises(ValueError):
+        tiles.resolve_source("https://webrd01.is.autonavi.com/appmaptile?x={x}&y={y}&z={z}")
+    with pytest.raises(ValueError):
+        tiles.resolve_source({"label": "x", "url": "https://tiles.example.com/{z}/{x}/{y}.png"})
+    with pytest.raises(ValueError):
+        tiles.resolve_source("osm")
+    src = tiles.resolve_source("https://tiles.example.com/{z}/{x}/{y}.jpg")
+    assert src["bulk"] and src["format"] == "jpg"
+
+
+def test_public_hosts_are_capped_at_two_connections():
+    public = tiles.resolve_source("https://tiles.example.com/{z}/{x}/{y}.png")
+    assert tiles.effective_concurrency(public, 8) == tiles.PUBLIC_HOST_CONCURRENCY == 2
+    assert tiles.effective_concurrency(dict(public, max_connections=6), 8) == 6
+    local = tiles.resolve_source("http://127.0.0.1:8080/{z}/{x}/{y}.png")
+    assert tiles.effective_concurrency(local, 8) == 8
+    lan = tiles.resolve_source("http://192.168.1.20/{z}/{x}/{y}.png")
+    assert tiles.effective_concurrency(lan, 8) == 8
@@ -0,0 +1,442 @@
+import argparse
+import asyncio
+import hashlib
+import ipaddress
+import json
+import math
+import sqlite3
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+import http_client
+
+# ===========================
+# 离线瓦片 (预下载 + MBTiles 存储 + 本地浏览)
+# ===========================
+# MBTiles 采用去重布局: images 表按内容哈希只存一份 (海洋、空白区域的瓦片大量重复)，
+# map 表记录 (z, x, y) -> tile_id，再由 tiles 视图对外提供标准 MBTiles 接口。
+# tile_row 按 MBTiles 规范使用 TMS 行号 (y 轴翻转)。
+#
+# 瓦片源: 公共瓦片服务 (OpenStreetMap、高德等) 的使用条款禁止批量预下载，这里不内置任何公共源。
+# 预下载需要用户填写自己有权批量下载的 URL 模板 (自建 / 已购买的瓦片服务)，
+# 或在 TILE_SOURCES 中登记并标记 "bulk": True 的源。
+# 非本机 / 内网主机的并发固定不超过 PUBLIC_HOST_CONCURRENCY (源里显式写了 max_connections 的除外)。
+#
+# 源字段: label, url ({z} {x} {y}，可选 {s} 子域名), format, subdomains, bulk, max_connections (可选)
+
+TILE_SOURCES = {}
+
+# 条款明确禁止批量下载的公共瓦片主机：即使用户手动填写也拒绝
+BULK_FORBIDDEN_HOSTS = ("tile.openstreetmap.org", "autonavi.com")
+PUBLIC_HOST_CONCURRENCY = 2
+DEFAULT_CONCURRENCY = 4
+# 界面上的预下载限制 (级别上限 / 超过多少块时需要确认)
+PREFETCH_MAX_ZOOM = 18
+PREFETCH_CONFIRM_TILES = 2000
+
+MAX_LAT = 85.05112878
+
+
+# ===========================
+# 瓦片坐标
+# ===========================
+def lonlat_to_tile(lon, lat, zoom):
+    """经纬度 -> 该级别下的瓦片列号/行号 (XYZ，左上角为原点)"""
+    lat = max(-MAX_LAT, min(MAX_LAT, lat))
+    n = 1 << zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_ranges(bbox, min_zoom, max_zoom):
+    """bbox = (min_lon, min_lat, max_lon, max_lat)，返回每个级别的 (z, x0, x1, y0, y1) (闭区间)"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("范围无效: 最小值必须不大于最大值")
+    ranges = []
+    for z in range(min_zoom, max_zoom + 1):
+        x0, y0 = lonlat_to_tile(min_lon, max_lat, z)
+        x1, y1 = lonlat_to_tile(max_lon, min_lat, z)
+        ranges.append((z, x0, x1, y0, y1))
+    return ranges
+
+
+def count_tiles(bbox, min_zoom, max_zoom):
+    return sum((x1 - x0 + 1) * (y1 - y0 + 1) for _, x0, x1, y0, y1 in tile_ranges(bbox, min_zoom, max_zoom))
+
+
+def iter_tiles(bbox, min_zoom, max_zoom):
+    for z, x0, x1, y0, y1 in tile_ranges(bbox, min_zoom, max_zoom):
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield z, x, y
+
+
+def _source_hosts(source):
+    subdomains = source.get("subdomains") or ""
+    return {urlsplit(source["url"].format(z=0, x=0, y=0, s=s)).hostname or "" for s in (subdomains or [""])}
+
+
+def _is_local_host(host):
+    if host == "localhost":
+        return True
+    try:
+        addr = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return addr.is_loopback or addr.is_private
+
+
+def resolve_source(source):
+    """
+    source 可以是 URL 模板 (含 {z} {x} {y})、TILE_SOURCES 中的名称或源 dict。
+    返回源 dict；不允许批量下载的源抛出 ValueError。
+    """
+    if isinstance(source, dict):
+        src = dict(source)
+    elif "{" in source:
+        path = urlsplit(source).path.lower()
+        fmt = "jpg" if path.endswith((".jpg", ".jpeg")) else "png"
+        src = {"label": urlsplit(source).hostname or "tiles", "url": source, "format": fmt, "subdomains": "",
+               "bulk": True}
+    elif source in TILE_SOURCES:
+        src = dict(TILE_SOURCES[source])
+    else:
+        raise ValueError(f"未知的瓦片源: {source}\n请填写 URL 模板，如 http://tiles.example.lan/{{z}}/{{x}}/{{y}}.png")
+    url = src.get("url", "")
+    if not all(k in url for k in ("{z}", "{x}", "{y}")):
+        raise ValueError(f"瓦片 URL 模板必须包含 {{z}} {{x}} {{y}}: {url}")
+    if urlsplit(url).scheme.lower() not in ("http", "https"):
+        raise ValueError(f"瓦片 URL 必须以 http:// 或 https:// 开头: {url}")
+    hosts = _source_hosts(src)
+    if any(h == f or h.endswith("." + f) for h in hosts for f in BULK_FORBIDDEN_HOSTS):
+        raise ValueError("该公共瓦片服务的使用条款禁止批量预下载，请使用自建或已授权的瓦片服务。")
+    if not src.get("bulk"):
+        raise ValueError(f"瓦片源 {src.get('label', url)} 未标记允许批量下载 (bulk)。")
+    return src
+
+
+def effective_concurrency(source, requested):
+    """本机 / 内网主机按请求的并发；公网主机不超过源的 max_connections (默认 PUBLIC_HOST_CONCURRENCY)"""
+    requested = max(1, requested)
+    if all(_is_local_host(h) for h in _source_hosts(source)):
+        return requested
+    return min(requested, source.get("max_connections", PUBLIC_HOST_CONCURRENCY))
+
+
+def tile_url(source, z, x, y):
+    subdomains = source.get("subdomains") or ""
+    s = subdomains[(x + y) % len(subdomains)] if subdomains else ""
+    return source["url"].format(z=z, x=x, y=y, s=s)
+
+
+# ===========================
+# MBTiles 存储
+# ===========================
+class MBTilesStore:
+    def __init__(self, path, check_same_thread=True):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=check_same_thread)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS images (tile_id TEXT PRIMARY KEY, tile_data BLOB);
+            CREATE TABLE IF NOT EXISTS map (
+                zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_id TEXT,
+                PRIMARY KEY (zoom_level, tile_column, tile_row)
+            );
+            CREATE VIEW IF NOT EXISTS tiles AS
+                SELECT map.zoom_level AS zoom_level, map.tile_column AS tile_column,
+                       map.tile_row AS tile_row, images.tile_data AS tile_data
+                FROM map JOIN images ON images.tile_id = map.tile_id;
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def _tms_row(z, y):
+        return (1 << z) - 1 - y
+
+    def has_tiles(self, z, x0, x1, y0, y1):
+        """返回指定范围内已存在的 (x, y) 集合"""
+        rows = self.conn.execute(
+            "SELECT tile_column, tile_row FROM map WHERE zoom_level = ? AND tile_column BETWEEN ? AND ? "
+            "AND tile_row BETWEEN ? AND ?", (z, x0, x1, self._tms_row(z, y1), self._tms_row(z, y0)))
+        return {(x, self._tms_row(z, row)) for x, row in rows}
+
+    def put_many(self, tiles):
+        """写入 [(z, x, y, data)]，相同内容只存一份；返回新增的图片数"""
+        images = {}
+        mapping = []
+        for z, x, y, data in tiles:
+            tile_id = hashlib.sha1(data).hexdigest()
+            images[tile_id] = data
+            mapping.append((z, x, self._tms_row(z, y), tile_id))
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO images (tile_id, tile_data) VALUES (?, ?)",
+                                  list(images.items()))
+            added = self.conn.total_changes - before
+            self.conn.executemany("INSERT OR REPLACE INTO map VALUES (?, ?, ?, ?)", mapping)
+        return added
+
+    def get(self, z, x, y):
+        row = self.conn.execute(
+            "SELECT images.tile_data FROM map JOIN images ON images.tile_id = map.tile_id "
+            "WHERE map.zoom_level = ? AND map.tile_column = ? AND map.tile_row = ?",
+            (z, x, self._tms_row(z, y))).fetchone()
+        return row[0] if row else None
+
+    def set_metadata(self, **values):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?)",
+                                  [(k, str(v)) for k, v in values.items()])
+
+    def metadata(self):
+        return dict(self.conn.execute("SELECT name, value FROM metadata"))
+
+    def stats(self):
+        tiles = self.conn.execute("SELECT COUNT(*) FROM map").fetchone()[0]
+        images, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(tile_data)), 0) FROM images").fetchone()
+        return {"tiles": tiles, "unique_images": images, "bytes": size}
+
+    def close(self):
+        self.conn.close()
+
+
+# ===========================
+# 预下载
+# ===========================
+async def _prefetch_async(store, source, bbox, min_zoom, max_zoom, concurrency, progress, cancel_event,
+                          commit_every=200):
+    todo = []
+    for z, x0, x1, y0, y1 in tile_ranges(bbox, min_zoom, max_zoom):
+        existing = store.has_tiles(z, x0, x1, y0, y1)
+        todo.extend((z, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1) if (x, y) not in existing)
+
+    total = count_tiles(bbox, min_zoom, max_zoom)
+    report = {"total": total, "skipped": total - len(todo), "downloaded": 0, "failed": 0, "new_images": 0}
+    if progress:
+        progress(report["skipped"], total)
+
+    client = http_client.AsyncHTTPClient(max_per_host=concurrency, max_connections=concurrency * 4,
+                                         timeout=20.0, retries=3, cache=http_client.TTLCache(maxsize=0))
+    pending = []
+    queue = asyncio.Queue()
+    for item in todo:
+        queue.put_nowait(item)
+
+    def flush():
+        if pending:
+            report["new_images"] += store.put_many(pending)
+            pending.clear()
+
+    async def worker():
+        while not queue.empty():
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            z, x, y = queue.get_nowait()
+            try:
+                resp = await client.get(tile_url(source, z, x, y), use_cache=False)
+                resp.raise_for_status()
+                pending.append((z, x, y, resp.body))
+                report["downloaded"] += 1
+            except Exception:
+                report["failed"] += 1
+            if len(pending) >= commit_every:
+                flush()
+            if progress:
+                progress(report["skipped"] + report["downloaded"] + report["failed"], total)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        flush()
+        await client.close()
+    report["cancelled"] = bool(cancel_event is not None and cancel_event.is_set())
+    return report
+
+
+def prefetch(mbtiles_path, bbox, min_zoom, max_zoom, source, concurrency=DEFAULT_CONCURRENCY, progress=None,
+             cancel_event=None):
+    """
+    下载 bbox 在 [min_zoom, max_zoom] 级别内的全部瓦片到 MBTiles。
+    source 见 resolve_source；公网主机的并发由 effective_concurrency 限制。
+    已存在的瓦片直接跳过，中断后再次调用即从断点继续。返回统计 dict。
+    """
+    src = resolve_source(source)
+    concurrency = effective_concurrency(src, concurrency)
+    store = MBTilesStore(mbtiles_path)
+    try:
+        meta = store.metadata()
+        old_bounds = [float(v) for v in meta["bounds"].split(",")] if "bounds" in meta else list(bbox)
+        bounds = (min(old_bounds[0], bbox[0]), min(old_bounds[1], bbox[1]),
+                  max(old_bounds[2], bbox[2]), max(old_bounds[3], bbox[3]))
+        store.set_metadata(
+            name=meta.get("name", src.get("label", "tiles")), format=src.get("format", "png"), type="baselayer",
+            bounds=",".join(f"{v:.6f}" for v in bounds),
+            minzoom=min(int(meta.get("minzoom", min_zoom)), min_zoom),
+            maxzoom=max(int(meta.get("maxzoom", max_zoom)), max_zoom))
+        t0 = time.perf_counter()
+        report = asyncio.run(_prefetch_async(store, src, bbox, min_zoom, max_zoom, concurrency, progress,
+                                             cancel_event))
+        report["seconds"] = round(time.perf_counter() - t0, 3)
+        report["concurrency"] = concurrency
+        report.update(store.stats())
+        return report
+    finally:
+        store.close()
+
+
+# ===========================
+# 本地浏览
+# ===========================
+VIEWER_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>离线地图</title>
+<style>html,body{margin:0;height:100%;overflow:hidden;background:#ddd;font:12px sans-serif}
+#map{position:absolute;inset:0;cursor:grab}#map img{position:absolute;width:256px;height:256px;user-select:none}
+#info{position:absolute;left:8px;bottom:8px;background:#fff9;padding:2px 6px}</style></head>
+<body><div id="map"></div><div id="info"></div><script>
+const meta = __META__;
+const b = meta.bounds.split(",").map(Number);
+const minZ = +meta.minzoom, maxZ = +meta.maxzoom;
+let z = Math.min(maxZ, Math.max(minZ, Math.round((minZ + maxZ) / 2)));
+function project(lon, lat, z) {
+  const n = 256 * 2 ** z, r = lat * Math.PI / 180;
+  return [(lon + 180) / 360 * n, (1 - Math.asinh(Math.tan(r)) / Math.PI) / 2 * n];
+}
+let [cx, cy] = project((b[0] + b[2]) / 2, (b[1] + b[3]) / 2, z);
+const map = document.getElementById("map"), info = document.getElementById("info");
+function draw() {
+  const w = map.clientWidth, h = map.clientHeight, n = 2 ** z;
+  const x0 = Math.floor((cx - w / 2) / 256), x1 = Math.floor((cx + w / 2) / 256);
+  const y0 = Math.floor((cy - h / 2) / 256), y1 = Math.floor((cy + h / 2) / 256);
+  const keep = new Set();
+  for (let x = x0; x <= x1; x++) for (let y = Math.max(0, y0); y <= Math.min(n - 1, y1); y++) {
+    const tx = ((x % n) + n) % n, key = `${z}/${tx}/${y}`, id = "t" + key + "@" + x;
+    keep.add(id);
+    let img = document.getElementById(id);
+    if (!img) { img = document.createElement("img"); img.id = id; img.src = `/${key}.${meta.format}`;
+      img.onerror = () => img.style.visibility = "hidden"; map.appendChild(img); }
+    img.style.left = (x * 256 - cx + w / 2) + "px"; img.style.top = (y * 256 - cy + h / 2) + "px";
+  }
+  for (const img of [...map.children]) if (!keep.has(img.id)) img.remove();
+  info.textContent = `z=${z}  (${minZ}-${maxZ})`;
+}
+let drag = null;
+map.onmousedown = e => drag = [e.clientX, e.clientY];
+window.onmouseup = () => drag = null;
+window.onmousemove = e => { if (!drag) return; cx -= e.clientX - drag[0]; cy -= e.clientY - drag[1];
+  drag = [e.clientX, e.clientY]; draw(); };
+map.onwheel = e => { e.preventDefault(); const nz = Math.min(maxZ, Math.max(minZ, z + (e.deltaY < 0 ? 1 : -1)));
+  if (nz === z) return; const f = 2 ** (nz - z), ox = e.clientX - map.clientWidth / 2, oy = e.clientY - map.clientHeight / 2;
+  cx = (cx + ox) * f - ox; cy = (cy + oy) * f - oy; z = nz; draw(); };
+window.onresize = draw; draw();
+</script></body></html>
+"""
+
+
+class _TileHandler(BaseHTTPRequestHandler):
+    store = None
+    lock = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code, body, ctype, cache=True):
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        if cache:
+            self.send_header("Cache-Control", "max-age=86400")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        with self.lock:
+            meta = self.store.metadata()
+        if path in ("/", "/index.html"):
+            html = VIEWER_HTML.replace("__META__", json.dumps(meta))
+            self._send(200, html.encode("utf-8"), "text/html; charset=utf-8", cache=False)
+            return
+        parts = path.strip("/").split("/")
+        try:
+            z, x = int(parts[0]), int(parts[1])
+            y = int(parts[2].split(".")[0])
+        except (IndexError, ValueError):
+            self._send(404, b"not found", "text/plain")
+            return
+        with self.lock:
+            data = self.store.get(z, x, y)
+        if data is None:
+            self._send(404, b"tile not found", "text/plain")
+            return
+        ctype = "image/jpeg" if meta.get("format") in ("jpg", "jpeg") else "image/png"
+        self._send(200, data, ctype)
+
+
+def serve(mbtiles_path, host="127.0.0.1", port=0):
+    """
+    在后台线程中启动只读瓦片服务: / 为离线浏览页面，/{z}/{x}/{y}.png 为瓦片。
+    返回 (server, url)，用完调用 server.shutdown()。
+    """
+    store = MBTilesStore(mbtiles_path, check_same_thread=False)
+    handler = type("TileHandler", (_TileHandler,), {"store": store, "lock": threading.Lock()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+
+    def run():
+        try:
+            server.serve_forever()
+        finally:
+            store.close()
+
+    threading.Thread(target=run, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="离线瓦片预下载 / 本地浏览")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("prefetch", help="按范围与级别预下载瓦片")
+    p.add_argument("mbtiles")
+    p.add_argument("--bbox", required=True, help="min_lon,min_lat,max_lon,max_lat")
+    p.add_argument("--zoom", required=True, help="最小级别-最大级别，如 10-14")
+    p.add_argument("--source", required=True,
+                   help="允许批量下载的瓦片 URL 模板 (如 http://tiles.example.lan/{z}/{x}/{y}.png) 或已登记的源名称")
+    p.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                   help=f"并发数 (公网主机最多 {PUBLIC_HOST_CONCURRENCY})")
+    s = sub.add_parser("serve", help="启动本地浏览服务")
+    s.add_argument("mbtiles")
+    s.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "prefetch":
+        bbox = tuple(float(v) for v in args.bbox.split(","))
+        zmin, _, zmax = args.zoom.partition("-")
+        try:
+            report = prefetch(args.mbtiles, bbox, int(zmin), int(zmax or zmin), args.source, args.concurrency)
+        except ValueError as e:
+            print(json.dumps({"error": str(e)}, ensure_ascii=False))
+            return 2
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0 if report["failed"] == 0 else 1
+
+    server, url = serve(args.mbtiles, port=args.port)
+    print(f"离线地图: {url}  (Ctrl+C 退出)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
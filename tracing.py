@@ -0,0 +1,223 @@
+import json
+import os
+import threading
+import time
+
+# ===========================
+# 跨工具追踪 (span / counter)
+# ===========================
+# 用法:
+#   with tracing.span("a0.duplicate_slide", "a0", index=i):
+#       ...
+#   tracing.counter("b0.frames", written=n)
+#
+# 默认关闭：关闭时 span() 直接返回共享的空上下文，开销只有一次函数调用。
+# 打开方式: tracing.enable()，或设置环境变量 SMALLPOV_TRACE=trace.json (进程退出时自动导出)，
+# main.py / cli.py 也提供 --trace 参数。
+# 导出格式为 Chrome trace-event JSON，可直接拖进 chrome://tracing 或 https://ui.perfetto.dev 查看；
+# summary() / format_summary() 给出按 span 名称汇总的耗时表。
+
+_enabled = False
+_events = []
+_lock = threading.Lock()
+_t0_ns = time.perf_counter_ns()
+_threads = {}  # thread ident -> (tid, name)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _tid():
+    ident = threading.get_ident()
+    entry = _threads.get(ident)
+    if entry is None:
+        with _lock:
+            entry = _threads.get(ident)
+            if entry is None:
+                entry = (len(_threads) + 1, threading.current_thread().name)
+                _threads[ident] = entry
+    return entry[0]
+
+
+class _Span:
+    __slots__ = ("name", "cat", "args", "start")
+
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        # list.append 在 CPython 中是原子操作，记录热路径上不加锁
+        _events.append(("X", self.name, self.cat, self.start, end - self.start, _tid(), self.args))
+        return False
+
+    def set(self, **args):
+        """在 span 结束前补充参数 (例如处理结果的大小)"""
+        self.args.update(args)
+
+
+def span(name, cat="", **args):
+    """计时一段代码；未启用追踪时返回空上下文"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, cat, args)
+
+
+def traced(name=None, cat=""):
+    """函数装饰器版本的 span"""
+
+    def decorator(fn):
+        span_name = name or f"{fn.__module__}.{fn.__name__}"
+
+        def wrapper(*a, **kw):
+            if not _enabled:
+                return fn(*a, **kw)
+            with _Span(span_name, cat, {}):
+                return fn(*a, **kw)
+
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        wrapper.__wrapped__ = fn
+        return wrapper
+
+    return decorator
+
+
+def counter(name, cat="", **values):
+    """记录计数器的当前值 (Chrome trace 中显示为折线)"""
+    if not _enabled:
+        return
+    _events.append(("C", name, cat, time.perf_counter_ns(), 0, _tid(), values))
+
+
+def instant(name, cat="", **args):
+    """记录一个时间点事件"""
+    if not _enabled:
+        return
+    _events.append(("i", name, cat, time.perf_counter_ns(), 0, _tid(), args))
+
+
+# ===========================
+# 开关
+# ===========================
+def enable(reset=True):
+    global _enabled, _t0_ns
+    if reset:
+        clear()
+        _t0_ns = time.perf_counter_ns()
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def clear():
+    with _lock:
+        del _events[:]
+
+
+# ===========================
+# 导出
+# ===========================
+def chrome_trace():
+    """返回 Chrome trace-event 格式的 dict"""
+    events = list(_events)
+    pid = os.getpid()
+    out = []
+    for ident, (tid, name) in list(_threads.items()):
+        out.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": name}})
+    for ph, name, cat, start, dur, tid, args in events:
+        event = {"ph": ph, "name": name, "cat": cat or "default", "pid": pid, "tid": tid,
+                 "ts": (start - _t0_ns) / 1000.0}
+        if ph == "X":
+            event["dur"] = dur / 1000.0
+        elif ph == "i":
+            event["s"] = "t"
+        if args:
+            event["args"] = args
+        out.append(event)
+    return {"traceEvents": out, "displayTimeUnit": "ms"}
+
+
+def export_chrome(path):
+    """写出 Chrome trace JSON，返回事件数"""
+    data = chrome_trace()
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    return len(data["traceEvents"])
+
+
+def summary():
+    """按 span 名称汇总: 次数 / 总耗时 / 平均 / 最大 (秒)，按总耗时降序"""
+    stats = {}
+    for ph, name, cat, start, dur, tid, args in list(_events):
+        if ph != "X":
+            continue
+        s = stats.get(name)
+        if s is None:
+            s = stats[name] = {"name": name, "cat": cat, "count": 0, "total": 0, "max": 0}
+        s["count"] += 1
+        s["total"] += dur
+        s["max"] = max(s["max"], dur)
+    rows = []
+    for s in stats.values():
+        rows.append({"name": s["name"], "cat": s["cat"], "count": s["count"], "total": s["total"] / 1e9,
+                     "mean": s["total"] / s["count"] / 1e9, "max": s["max"] / 1e9})
+    rows.sort(key=lambda r: r["total"], reverse=True)
+    return rows
+
+
+def format_summary(rows=None):
+    rows = summary() if rows is None else rows
+    lines = [f"{'span':<28}{'count':>8}{'total ms':>12}{'mean ms':>10}{'max ms':>10}"]
+    for r in rows:
+        lines.append(f"{r['name']:<28}{r['count']:>8}{r['total'] * 1000:>12.2f}{r['mean'] * 1000:>10.3f}"
+                     f"{r['max'] * 1000:>10.2f}")
+    return "\n".join(lines)
+
+
+def enable_to_file(path, print_summary=True):
+    """启用追踪并在进程退出时导出到 path (汇总表打印到 stderr)"""
+    import atexit
+    import sys
+
+    enable()
+
+    def _dump():
+        export_chrome(path)
+        if print_summary:
+            print(format_summary(), file=sys.stderr)
+
+    atexit.register(_dump)
+
+
+if os.environ.get("SMALLPOV_TRACE"):
+    enable_to_file(os.environ["SMALLPOV_TRACE"])
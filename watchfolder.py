@@ -0,0 +1,472 @@
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import os
+import select
+import signal
+import sqlite3
+import struct
+import sys
+import threading
+import time
+
+import imgio
+import jobs
+
+# ===========================
+# 监视文件夹 (投放目录自动处理)
+# ===========================
+# 投放到监视目录中的新图片 / 被修改的图片，静止 debounce 秒 (且大小与修改时间不再变化) 后
+# 交给工作线程按处理链 (chain) 处理。Linux 上用 inotify (ctypes 直接调用 libc)，
+# 其他系统或 inotify 不可用时退回定时扫描。
+# 处理记录保存在 SQLite 状态库：重启后 (路径, 大小, 修改时间, 处理链) 都一致的文件直接跳过。
+#
+# 配置文件 (JSON):
+# {
+#   "watch_dir": "D:/drop",
+#   "output_dir": "D:/drop/out",          省略则原地覆盖 (格式变化时删除原文件)
+#   "extensions": [".png", ".jpg", ".jpeg", ".bmp", ".tiff"],
+#   "debounce": 1.5,
+#   "workers": 2,
+#   "poll_interval": 1.0,                 仅扫描模式使用
+#   "chain": [
+#     {"op": "crop", "top": 10, "bottom": 10, "left": -20, "right": -20},
+#     {"op": "key", "color": "255,255,255", "tolerance": 10},
+#     {"op": "encode", "format": "png", "compression": 3}
+#   ]
+# }
+# 相对路径以配置文件所在目录为基准；state_db 默认为监视目录下的 .watch_state.sqlite3。
+
+CONFIG_DEFAULTS = {
+    "output_dir": None,
+    "extensions": [".png", ".jpg", ".jpeg", ".bmp", ".tiff"],
+    "debounce": 1.5,
+    "workers": 2,
+    "poll_interval": 1.0,
+    "chain": [{"op": "encode", "format": "png"}],
+    "state_db": None,
+}
+
+ENCODE_FORMATS = {
+    "png": (".png", "compression"),
+    "webp": (".webp", "quality"),
+    "jpg": (".jpg", "quality"),
+}
+
+STATE_DB_NAME = ".watch_state.sqlite3"
+
+
+def normalize_config(raw, base_dir=""):
+    """补全默认值并校验，返回标准化后的配置 dict"""
+    config = dict(CONFIG_DEFAULTS)
+    config.update(raw)
+    if not config.get("watch_dir"):
+        raise ValueError("配置缺少字段: watch_dir")
+
+    for key in ("watch_dir", "output_dir", "state_db"):
+        if config[key] and not os.path.isabs(config[key]):
+            config[key] = os.path.join(base_dir, config[key])
+        if config[key]:
+            config[key] = os.path.abspath(config[key])
+    if not os.path.isdir(config["watch_dir"]):
+        raise ValueError(f"监视目录不存在: {config['watch_dir']}")
+    config["state_db"] = config["state_db"] or os.path.join(config["watch_dir"], STATE_DB_NAME)
+    config["extensions"] = tuple(e.lower() for e in config["extensions"])
+    config["debounce"] = float(config["debounce"])
+    config["workers"] = max(1, int(config["workers"]))
+
+    chain = [dict(step) for step in config["chain"]]
+    for step in chain:
+        if step.get("op") not in ("crop", "key", "encode"):
+            raise ValueError(f"未知的处理步骤: {step.get('op')}")
+        if step["op"] == "encode" and step.get("format", "png") not in ENCODE_FORMATS:
+            raise ValueError(f"不支持的输出格式: {step.get('format')}\n可选: {', '.join(ENCODE_FORMATS)}")
+    if any(step["op"] == "encode" for step in chain[:-1]):
+        raise ValueError("encode 只能是处理链的最后一步")
+    if not chain or chain[-1]["op"] != "encode":
+        chain.append({"op": "encode", "format": "png"})
+    config["chain"] = chain
+    config["chain_key"] = hashlib.sha1(json.dumps(chain, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    return config
+
+
+def load_config(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+    return normalize_config(raw, os.path.dirname(os.path.abspath(path)))
+
+
+# ===========================
+# 处理链
+# ===========================
+def output_path_for(config, src_path):
+    encode = config["chain"][-1]
+    ext = ENCODE_FORMATS[encode.get("format", "png")][0]
+    name = os.path.splitext(os.path.basename(src_path))[0] + ext
+    return os.path.join(config["output_dir"] or os.path.dirname(src_path), name)
+
+
+def run_chain(config, src_path, cancel_token=None):
+    """按处理链处理一个文件，返回输出路径"""
+    import a2
+
+    img = imgio.read_bgra(src_path, cache=False)
+    for step in config["chain"][:-1]:
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        if step["op"] == "crop":
+            img = a2.crop_extend_image(img, int(step.get("top", 0)), int(step.get("bottom", 0)),
+                                       int(step.get("left", 0)), int(step.get("right", 0)))
+            if img is None:
+                raise ValueError("裁切量超过图片尺寸")
+        elif step["op"] == "key":
+            img = a2.remove_bg_image(img, a2.parse_rgb(step.get("color", "255,255,255")),
+                                     int(step.get("tolerance", 10)))
+
+    encode = config["chain"][-1]
+    ext, param_name = ENCODE_FORMATS[encode.get("format", "png")]
+    params = []
+    if param_name == "compression" and "compression" in encode:
+        params = [imgio.cv2.IMWRITE_PNG_COMPRESSION, int(encode["compression"])]
+    elif param_name == "quality" and "quality" in encode:
+        flag = imgio.cv2.IMWRITE_WEBP_QUALITY if ext == ".webp" else imgio.cv2.IMWRITE_JPEG_QUALITY
+        params = [flag, int(encode["quality"])]
+
+    out_path = output_path_for(config, src_path)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    imgio.write_image(out_path, img, params)
+    if config["output_dir"] is None and os.path.normcase(out_path) != os.path.normcase(src_path):
+        # 原地模式下格式变化：与 a2 批处理一致，删除原文件
+        os.remove(src_path)
+    return out_path
+
+
+# ===========================
+# 状态库
+# ===========================
+class StateStore:
+    """已处理文件记录；线程安全 (工作线程完成后直接写入)"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS processed (
+                path      TEXT PRIMARY KEY,
+                size      INTEGER NOT NULL,
+                mtime_ns  INTEGER NOT NULL,
+                chain     TEXT NOT NULL,
+                status    TEXT NOT NULL,
+                output    TEXT,
+                error     TEXT,
+                updated   REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def is_done(self, path, st, chain_key):
+        """同一内容 (大小 + 修改时间) 已用同一处理链处理过 (成功或确定失败) 时返回 True"""
+        with self._lock:
+            row = self.conn.execute("SELECT size, mtime_ns, chain FROM processed WHERE path = ?",
+                                    (path,)).fetchone()
+        return row is not None and row == (st.st_size, st.st_mtime_ns, chain_key)
+
+    def record(self, path, st, chain_key, status, output=None, error=None):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                              (path, st.st_size, st.st_mtime_ns, chain_key, status, output, error, time.time()))
+
+    def counts(self):
+        with self._lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM processed GROUP BY status").fetchall())
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+# ===========================
+# 文件变化来源
+# ===========================
+class PollingWatcher:
+    """定时扫描目录，对比 (大小, 修改时间) 找出新增 / 变化的文件"""
+
+    backend = "polling"
+
+    def __init__(self, directory, interval=1.0):
+        self.directory = directory
+        self.interval = interval
+        self._snapshot = {}
+        self._next_scan = 0.0
+
+    def _scan(self):
+        current = {}
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_file(follow_symlinks=False):
+                            st = entry.stat(follow_symlinks=False)
+                            current[entry.path] = (st.st_size, st.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError:
+            return []
+        changed = [path for path, sig in current.items() if self._snapshot.get(path) != sig]
+        self._snapshot = current
+        return changed
+
+    def poll(self, timeout):
+        now = time.monotonic()
+        if now < self._next_scan:
+            time.sleep(min(timeout, self._next_scan - now))
+            return []
+        self._next_scan = now + self.interval
+        return self._scan()
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify (ctypes 调用 libc)，只监视一层目录"""
+
+    backend = "inotify"
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, directory):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify 仅支持 Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.directory = directory
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch 失败: {directory}")
+        self.overflowed = False
+
+    def poll(self, timeout):
+        """等待最多 timeout 秒，返回发生变化的文件路径列表"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        changed = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & self.IN_Q_OVERFLOW:
+                    # 事件队列溢出：由调用方整目录重新扫描
+                    self.overflowed = True
+                elif mask & self.IN_DELETE_SELF:
+                    raise OSError("监视目录已被删除")
+                elif name and not mask & self.IN_ISDIR:
+                    changed.append(os.path.join(self.directory, os.fsdecode(name)))
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def make_watcher(directory, backend="auto", interval=1.0):
+    """backend: auto / inotify / polling；auto 时 inotify 不可用自动退回扫描"""
+    if backend in ("auto", "inotify"):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError):
+            if backend == "inotify":
+                raise
+    return PollingWatcher(directory, interval)
+
+
+# ===========================
+# 守护进程
+# ===========================
+class FolderWatcher:
+    """
+    监视 + 去抖 + 工作线程池。
+    on_event(dict) 接收 ready / done / failed / skipped 事件，回调在监视线程或工作线程中执行。
+    """
+
+    def __init__(self, config, backend="auto", on_event=None):
+        self.config = config
+        self.on_event = on_event
+        self.state = StateStore(config["state_db"])
+        self.manager = jobs.JobManager(max_workers=config["workers"])
+        self.watcher = make_watcher(config["watch_dir"], backend, config["poll_interval"])
+        self._pending = {}  # path -> (最后一次变化的时间, (size, mtime_ns))
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.stats = {"processed": 0, "failed": 0, "skipped": 0}
+
+    @property
+    def backend(self):
+        return self.watcher.backend
+
+    def _notify(self, **event):
+        if self.on_event:
+            self.on_event(event)
+
+    def _wanted(self, path):
+        name = os.path.basename(path)
+        if name.startswith(".") or not name.lower().endswith(self.config["extensions"]):
+            return False
+        out_dir = self.config["output_dir"]
+        if out_dir and os.path.normcase(os.path.dirname(os.path.abspath(path))) == os.path.normcase(out_dir):
+            return False
+        return True
+
+    def _touch(self, path, now):
+        """记录一次变化 (重新开始去抖计时)"""
+        if self._wanted(path):
+            self._pending[path] = (now, None)
+
+    def initial_scan(self):
+        """启动时把目录中尚未处理的文件全部加入待处理"""
+        now = time.monotonic()
+        with os.scandir(self.config["watch_dir"]) as it:
+            for entry in it:
+                if entry.is_file(follow_symlinks=False):
+                    self._touch(entry.path, now - self.config["debounce"])
+
+    def _check_pending(self, now):
+        debounce = self.config["debounce"]
+        for path, (t_changed, sig) in list(self._pending.items()):
+            if now - t_changed < debounce:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                # 已被移走 / 删除
+                del self._pending[path]
+                continue
+            current = (st.st_size, st.st_mtime_ns)
+            if current != sig:
+                # 大小或修改时间仍在变化 (写入未完成)：再等一个去抖周期
+                self._pending[path] = (now, current)
+                continue
+            with self._lock:
+                if path in self._inflight:
+                    continue
+            del self._pending[path]
+            if self.state.is_done(path, st, self.config["chain_key"]):
+                self.stats["skipped"] += 1
+                self._notify(event="skipped", path=path)
+                continue
+            self._submit(path, st)
+
+    def _submit(self, path, st):
+        with self._lock:
+            self._inflight.add(path)
+        self._notify(event="ready", path=path)
+        self.manager.submit(self._process, path, st, tool="watch", title=os.path.basename(path),
+                            on_done=lambda job, p=path, s=st: self._on_done(job, p, s))
+
+    def _process(self, path, st, progress=None, cancel_token=None):
+        return run_chain(self.config, path, cancel_token)
+
+    def _on_done(self, job, path, st):
+        chain_key = self.config["chain_key"]
+        if job.state == "done":
+            out_path = job.result
+            # 输出文件本身 (原地模式 / 输出目录在监视目录内) 也记为已处理，避免再次触发
+            try:
+                self.state.record(out_path, os.stat(out_path), chain_key, "output", output=out_path)
+            except OSError:
+                pass
+            if os.path.normcase(out_path) != os.path.normcase(path):
+                self.state.record(path, st, chain_key, "done", output=out_path)
+            self._notify(event="done", path=path, output=out_path)
+        elif job.state == "failed":
+            self.state.record(path, st, chain_key, "failed", error=job.error)
+            self._notify(event="failed", path=path, error=job.error)
+        with self._lock:
+            if job.state in ("done", "failed"):
+                self.stats["processed" if job.state == "done" else "failed"] += 1
+            self._inflight.discard(path)
+
+    def idle(self):
+        with self._lock:
+            return not self._pending and not self._inflight
+
+    def run(self, once=False, tick=0.2):
+        """主循环；once=True 时处理完启动时已有的文件后返回"""
+        self.initial_scan()
+        try:
+            while not self._stop.is_set():
+                for path in self.watcher.poll(tick):
+                    self._touch(path, time.monotonic())
+                if getattr(self.watcher, "overflowed", False):
+                    self.watcher.overflowed = False
+                    self.initial_scan()
+                self._check_pending(time.monotonic())
+                if once and self.idle():
+                    break
+        finally:
+            self.close()
+        return self.stats
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        self.manager.shutdown(wait=True)
+        self.watcher.close()
+        self.state.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="监视文件夹：新图片自动裁切 / 去底 / 转码")
+    parser.add_argument("config", help="配置文件 JSON")
+    parser.add_argument("--backend", choices=["auto", "inotify", "polling"], default="auto")
+    parser.add_argument("--once", action="store_true", help="处理完目录中已有的文件后退出")
+    args = parser.parse_args(argv)
+
+    try:
+        config = load_config(args.config)
+    except (OSError, ValueError) as e:
+        print(f"配置错误: {e}", file=sys.stderr)
+        return 2
+
+    def on_event(event):
+        print(json.dumps(event, ensure_ascii=False), flush=True)
+
+    daemon = FolderWatcher(config, args.backend, on_event)
+    signal.signal(signal.SIGINT, lambda *_: daemon.stop())
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    print(f"监视 {config['watch_dir']} ({daemon.backend})，Ctrl+C 退出", file=sys.stderr)
+    stats = daemon.run(once=args.once)
+    print(json.dumps(stats, ensure_ascii=False), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())